@@ -6,5 +6,8 @@ from .forms import (
     BaseBulkFormSet,
     BaseBulkModelFormSet,
 )
+from .fields import BulkModelChoiceField, resolve_choices
 from .serializers import CSVReader
+from .streaming import BaseStreamingBulkFormSet, StreamingBulkFormSetMixin
+from .unique import UniqueChecker
 from .utils import BulkMuxDict
@@ -0,0 +1,80 @@
+from django.core.exceptions import ValidationError
+from django.forms import ModelChoiceField
+
+
+def resolve_choices(queryset, values, to_field_name=None, batch_size=1000):
+    """Look up the objects of many values of a model field at once.
+
+    Arguments:
+        queryset: the QuerySet to look the values up in
+        values: an iterable of raw (e.g. CSV) values; invalid values are skipped
+        to_field_name (optional str): the field that holds the values [default=pk]
+        batch_size (optional int): the values looked up per query [default=1000]
+
+    Returns:
+        a dictionary of objects keyed by ``choice_key`` of their value, holding the
+        first object found for each value
+    """
+    field = get_key_field(queryset.model, to_field_name)
+    lookups = set()
+    for value in values:
+        try:
+            if value not in field.empty_values:
+                lookups.add(field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            continue
+    objects = {}
+    lookups = list(lookups)
+    for i in range(0, len(lookups), batch_size):
+        batch = queryset.filter(**{"%s__in" % field.name: lookups[i : i + batch_size]})
+        for obj in batch:
+            objects.setdefault(choice_key(field, field.value_from_object(obj)), obj)
+    return objects
+
+
+def get_key_field(model, to_field_name=None):
+    if to_field_name:
+        return model._meta.get_field(to_field_name)
+    return model._meta.pk
+
+
+def choice_key(field, value):
+    """The key of a value of a model field, matched case insensitively like the
+    database's collation matches it."""
+    if value in field.empty_values:
+        return None
+    value = field.to_python(value)
+    return value.lower() if isinstance(value, str) else value
+
+
+class BulkModelChoiceField(ModelChoiceField):
+    """A ModelChoiceField that can validate the rows of a bulk without a query each.
+
+    Bulk formsets resolve the values of the whole bulk file with ``preload`` and
+    share the resulting ``objects`` with the field of every row. Without
+    ``objects`` the field behaves like a ModelChoiceField.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = None
+
+    @property
+    def key_field(self):
+        return get_key_field(self.queryset.model, self.to_field_name)
+
+    def preload(self, values):
+        """Resolve the values of the bulk with as few queries as possible."""
+        return resolve_choices(self.queryset, values, self.to_field_name)
+
+    def to_python(self, value):
+        if self.objects is None or value in self.empty_values:
+            return super().to_python(value)
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, self.to_field_name or "pk")
+        try:
+            return self.objects[choice_key(self.key_field, value)]
+        except (KeyError, ValidationError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice"
+            )
@@ -10,6 +10,7 @@ from django.forms import (
 from django.forms.models import modelformset_factory
 from django.utils.functional import cached_property
 
+from .fields import BulkModelChoiceField
 from .utils import BulkMuxDict
 from .serializers import CSVReader
 
@@ -65,6 +66,36 @@ class InitBulkFormSet:
             )
         super().__init__(**inp)
 
+    def close(self):
+        """Release the resources held by the serializer, e.g. a CSVReader's map."""
+        close = getattr(getattr(self, "bulk", None), "close", None)
+        if close is not None:
+            close()
+
+    @cached_property
+    def bulk_choices(self):
+        """The objects of each BulkModelChoiceField, resolved for the whole bulk."""
+        fields = {
+            name: field
+            for name, field in self.form.base_fields.items()
+            if isinstance(field, BulkModelChoiceField)
+            and name not in self.header_fields
+        }
+        bulk = getattr(self, "bulk", None)
+        if not fields or bulk is None:
+            return {}
+        values = {name: [] for name in fields}
+        for row in bulk:
+            for name in fields:
+                values[name].append(row.get(name))
+        return {name: field.preload(values[name]) for name, field in fields.items()}
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for name, objects in self.bulk_choices.items():
+            form.fields[name].objects = objects
+        return form
+
     @property
     def header_data(self):
         """Return a dictionary of the cleaned header data.
@@ -132,11 +163,12 @@ def basebulkformset_factory(typename, basefactory, *args, **kwargs):
         if var in kwargs
     }
     django_type = basefactory(*args, **kwargs)
-    return type(
-        django_type.form.__name__ + typename,
-        (InitBulkFormSet, django_type),
-        bulk_kwargs,
-    )
+    if issubclass(django_type, InitBulkFormSet):
+        # e.g. formset=BaseStreamingBulkFormSet
+        bases = (django_type,)
+    else:
+        bases = (InitBulkFormSet, django_type)
+    return type(django_type.form.__name__ + typename, bases, bulk_kwargs)
 
 
 def bulkformset_factory(*args, **kwargs):
@@ -146,7 +178,7 @@ def bulkformset_factory(*args, **kwargs):
 
     The serializer function is responsible for rendering the bulk file in a Python friendly way. It is invoked internally by `bulk = serializer(f, *serializer_args, **serializer_kwargs)`. Here, `f` is the Django `UploadedFile`. `bulk` must be represented as a list of dictionaries where each dictionary has keys corresponding to the field names of the `form` provided.
 
-    It may be advantageous to return a more memory efficient immutable object from `serializer` as opposed to a list of dictionaries. An example of such an object can be seen with `bulkformsets.utils.CSVReader`.
+    It may be advantageous to return a more memory efficient immutable object from `serializer` as opposed to a list of dictionaries. An example of such an object can be seen with `bulkformsets.serializers.CSVReader`.
 
     Required args:
         `*args`, `**kwargs`: identical to the Django equivalent
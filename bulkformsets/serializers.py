@@ -1,73 +1,166 @@
+import codecs
 import csv
-import itertools as it
 import io
+import mmap
+import re
+from array import array
 
 from django.core.files.uploadedfile import TemporaryUploadedFile
 from django.forms import formsets
 
+# A line ends with "\r\n", "\r" or "\n", as with universal newlines
+LINE_RE = re.compile(r"[^\r\n]*(?:\r\n?|\n)|[^\r\n]+")
+BYTES_LINE_RE = re.compile(LINE_RE.pattern.encode())
+
 
 class CSVReader:
-    """Like csv.DictReader, except includes a low memory __getitem__ and __len__."""
+    """Like csv.DictReader, except includes a low memory __getitem__ and __len__.
+
+    The start and end offsets of every record are indexed while the length is
+    counted, so any row can be read without parsing the rows before it. Records
+    may span lines (e.g. quoted newlines) and blank lines are not counted as
+    rows. Uploads on disk are memory-mapped, unless `mmap` is False. Call
+    `close` (or use the reader as a context manager) to release the map.
+    """
 
     def __init__(self, f, *args, **kwargs):
         max_num = kwargs.pop("max_num", 2 * formsets.DEFAULT_MAX_NUM)
         skip = kwargs.pop("skip", 0)
         fieldnames = kwargs.pop("fieldnames", None)
+        use_mmap = kwargs.pop("mmap", True)
+        self.args = args
+        self.kwargs = kwargs
+        self.f = f.file
+        self.buffer = None
+        self.mmap = None
+        start = 0
         if type(f.file) is io.StringIO:
-            self.f = f
+            self.encoding = None
+            self.line_re = LINE_RE
+            self.buffer = f.file.getvalue()
         elif isinstance(f.file, io.BufferedIOBase) or isinstance(
             f, TemporaryUploadedFile
         ):
-            self.f = io.TextIOWrapper(f.file, encoding="utf-8-sig", newline="")
+            self.encoding = "utf-8"
+            self.line_re = BYTES_LINE_RE
+            if use_mmap:
+                try:
+                    self.mmap = mmap.mmap(f.file.fileno(), 0, access=mmap.ACCESS_READ)
+                except (AttributeError, OSError, ValueError):
+                    # not a real file (io.UnsupportedOperation) or an empty one
+                    pass
+                else:
+                    self.buffer = self.mmap
+            f.file.seek(0)
+            if f.file.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+                start = len(codecs.BOM_UTF8)
         else:
             raise ValueError("Unknown file type.")
-        self.reader = csv.reader(self.f, *args, **kwargs)
-        self.args = args
-        self.kwargs = kwargs
-        if skip:
-            next(it.islice(self.reader, skip, None))
+        # Parse the file once, indexing the non-blank records
+        end = start
+
+        def lines():
+            nonlocal end
+            for end, line in self.iter_lines(start):
+                yield line
+
+        reader = csv.reader(lines(), *args, **kwargs)
+        for _ in range(skip):
+            next(reader, None)
+        self.skip = skip
         if fieldnames:
             self.fieldnames = fieldnames
         else:
-            skip += 1
-            self.fieldnames = next(self.reader)
-        # If the length is greater than max_num, stop eval and set length to max_num + 1
-        self.length = sum(
-            1
-            for row in zip(self.reader, it.repeat(None, max_num + 1))
-            if row != (([], None))
-        )
-        self.skip = skip
-        # optimize sequential __getitem__ calls
+            self.skip += 1
+            self.fieldnames = next(reader, [])
+        self.starts = array("q")
+        self.ends = array("q")
+        record_start = end
+        for row in reader:
+            if row:
+                # If the length is greater than max_num, stop and set length to max_num + 1
+                if len(self.starts) > max_num:
+                    break
+                self.starts.append(record_start)
+                self.ends.append(end)
+            record_start = end
+        self.length = len(self.starts)
+        # optimize repeated __getitem__ calls for the same row
         self.last_get_line = None
         self.line_cache = None
 
     def __iter__(self):
-        self.seek_to_top()
-        yield from map(self.pack_dict, it.islice(self.reader, self.skip, self.length))
+        if not self.length:
+            return
+        lines = (line for _, line in self.iter_lines(self.starts[0]))
+        rows = (row for row in csv.reader(lines, *self.args, **self.kwargs) if row)
+        for _, row in zip(range(self.length), rows):
+            yield self.pack_dict(row)
 
     def __getitem__(self, i):
-        if i < self.length:
-            if self.last_get_line and i == self.last_get_line:
-                return self.line_cache
-            elif self.last_get_line and i == self.last_get_line + 1:
-                d = self.pack_dict(next(self.reader))
-            else:
-                self.seek_to_top()
-                d = self.pack_dict(next(it.islice(self.reader, i + self.skip, None)))
-        else:
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
             raise IndexError
-        self.last_get_line = i
-        self.line_cache = d
-        return d
+        if i != self.last_get_line:
+            text = self.read(self.starts[i], self.ends[i])
+            reader = csv.reader(
+                io.StringIO(text, newline=""), *self.args, **self.kwargs
+            )
+            self.line_cache = self.pack_dict(next(reader))
+            self.last_get_line = i
+        return self.line_cache
 
     def __len__(self):
         return self.length
 
-    def seek_to_top(self):
-        self.last_get_line = None
-        self.f.seek(0)
-        self.reader = csv.reader(self.f, *self.args, **self.kwargs)
+    def iter_lines(self, start):
+        """Yield the (end offset, line) of each line from the offset start."""
+        pos = start
+        if self.buffer is not None:
+            block, offset = self.buffer, 0
+        else:
+            block, offset = self.f.read(0), start
+        while True:
+            m = self.line_re.match(block, pos - offset)
+            if m is None:
+                if self.buffer is not None:
+                    return
+                # read on from pos, a line at a time
+                self.f.seek(pos)
+                block, offset = self.f.readline(), pos
+                if not block:
+                    return
+                continue
+            pos = offset + m.end()
+            line = m.group()
+            yield pos, line.decode(self.encoding) if self.encoding else line
+
+    def read(self, start, end):
+        """Read the text between two offsets."""
+        if self.buffer is not None:
+            data = self.buffer[start:end]
+        else:
+            self.f.seek(start)
+            data = self.f.read(end - start)
+        return data.decode(self.encoding) if self.encoding else data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the memory map of the file, if any.
+
+        The fieldnames and length are kept, but rows are read from the file
+        from then on.
+        """
+        if self.mmap is not None:
+            self.buffer = None
+            self.mmap.close()
+            self.mmap = None
 
     def pack_dict(self, row):
         return dict(zip(self.fieldnames, row))
@@ -0,0 +1,302 @@
+import pickle
+import tempfile
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.forms import BaseFormSet
+from django.forms.utils import ErrorDict, ErrorList
+from django.forms.widgets import Widget
+from django.utils.translation import ngettext
+
+from .forms import InitBulkFormSet
+
+
+def compile_converters(form):
+    """Compile the per-column converters of a form class.
+
+    Each converter is a tuple of the field name, the field, the widget's
+    ``value_from_datadict`` (None when the value is read straight from the row)
+    and the name of the form's ``clean_<field>`` hook (None if there is none).
+    """
+    converters = []
+    for name, field in form.base_fields.items():
+        if type(field.widget).value_from_datadict is Widget.value_from_datadict:
+            value_from_datadict = None
+        else:
+            value_from_datadict = field.widget.value_from_datadict
+        hook = "clean_%s" % name
+        converters.append(
+            (name, field, value_from_datadict, hook if hasattr(form, hook) else None)
+        )
+    return converters
+
+
+_row_form_classes = {}
+
+
+def row_form_factory(form):
+    """Create a subclass of form that cleans a single bulk row.
+
+    Row forms are not built with the form's ``__init__``. Instead each row copies
+    the state of a template instance of the form, so whatever its ``__init__``
+    sets up (querysets, initial values, extra attributes) applies to every row
+    and the template's fields are shared instead of deep copied per row. Row
+    forms have no prefix and read their values from the row dictionary with the
+    compiled converters. The form's ``clean`` and ``clean_<field>`` methods run
+    exactly as they would for a bound form.
+    """
+    if form not in _row_form_classes:
+
+        def __init__(self, data, template):
+            self.__dict__.update(template.__dict__)
+            self.is_bound = True
+            self.data = data
+            self.files = {}
+            self.prefix = None
+            self.empty_permitted = False
+            self._errors = None
+            self._bound_fields_cache = {}
+
+        def _clean_fields(self):
+            for name, _, value_from_datadict, hook in self.converters:
+                field = self.fields[name]
+                if value_from_datadict is None:
+                    value = self.data.get(name)
+                else:
+                    value = value_from_datadict(self.data, self.files, name)
+                try:
+                    self.cleaned_data[name] = field.clean(value)
+                    if hook:
+                        self.cleaned_data[name] = getattr(self, hook)()
+                except ValidationError as e:
+                    self.add_error(name, e)
+
+        _row_form_classes[form] = type(
+            form.__name__ + "Row",
+            (form,),
+            {
+                "__init__": __init__,
+                "_clean_fields": _clean_fields,
+                "converters": compile_converters(form),
+            },
+        )
+    return _row_form_classes[form]
+
+
+class RowErrors:
+    """The errors of a bulk upload, holding an ErrorDict for the invalid rows only."""
+
+    empty = ErrorDict()
+
+    def __init__(self):
+        self.rows = {}
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, index):
+        return index in self.rows
+
+    def __getitem__(self, index):
+        return self.rows.get(index, self.empty)
+
+    def add(self, index, field, error):
+        """Add a ValidationError (or message) to a field of a row."""
+        if not isinstance(error, ValidationError):
+            error = ValidationError(error)
+        if hasattr(error, "error_dict"):
+            for f, error_list in error.error_dict.items():
+                self.update(index, {f: error_list})
+        else:
+            self.update(index, {field or NON_FIELD_ERRORS: error.error_list})
+
+    def update(self, index, errors):
+        """Add the ErrorDict of a cleaned row form."""
+        row = self.rows.setdefault(index, ErrorDict())
+        for field, error_list in errors.items():
+            row.setdefault(field, ErrorList()).extend(error_list)
+
+    def as_list(self, total):
+        """The errors of every row, like the errors of a formset."""
+        return [self[i] for i in range(total)]
+
+
+class RowSpool:
+    """Batches of cleaned rows pickled to a temporary file.
+
+    The file is kept in memory until it grows beyond ``max_size`` bytes.
+
+    Arguments:
+        max_size (optional int): the bytes kept in memory [default=5MB]
+    """
+
+    def __init__(self, max_size=5 * 1024 * 1024):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.batches = 0
+        self.rows = 0
+
+    def write(self, batch):
+        pickle.dump(batch, self.file, pickle.HIGHEST_PROTOCOL)
+        self.batches += 1
+        self.rows += len(batch)
+
+    def __iter__(self):
+        self.file.seek(0)
+        for _ in range(self.batches):
+            yield pickle.load(self.file)
+        self.file.seek(0, 2)
+
+    def close(self):
+        self.file.close()
+
+
+class StreamingBulkFormSetMixin:
+    """Validate the rows of a bulk file without constructing a form per row.
+
+    The rows are read from the serializer in chunks of ``chunk_size`` and cleaned
+    by a row form (see ``row_form_factory``). Errors are collected in a
+    ``RowErrors`` and rows that cleaned without errors are spooled to a
+    temporary file, so memory use does not grow with the size of the upload.
+    Only rows from the bulk file are considered; rows posted as form data are
+    ignored.
+
+    Subclasses gather what they need from each row in ``clean_row``, validate
+    the upload as a whole in ``clean`` and write the rows returned by
+    ``iter_batches`` in ``save``. Rows which are entirely blank (after the first
+    ``min_num`` rows) are skipped, like the empty extra forms of a formset.
+
+    Properties:
+        errors: a list with the ErrorDict of every row
+        row_errors: the RowErrors of the invalid rows
+        row_count: the number of rows in the bulk file
+        header_data: a dictionary of the cleaned header data
+    """
+
+    chunk_size = 1000
+
+    @property
+    def errors(self):
+        return self.row_errors.as_list(self.row_count)
+
+    @property
+    def row_errors(self):
+        if self._errors is None:
+            self.full_clean()
+        return self._errors
+
+    @property
+    def header_data(self):
+        self.row_errors
+        return self._header_data
+
+    def is_valid(self):
+        if not self.is_bound:
+            return False
+        return not self.row_errors and not self.non_form_errors()
+
+    def add_row_error(self, index, field, error):
+        """Add an error to a row, as ``add_error`` would on the row's form."""
+        self._errors.add(index, field, error)
+
+    def get_header_row(self):
+        """The header field values that are added to every row."""
+        data = getattr(self.data, "data", self.data)
+        header = getattr(self.data, "header_dict", {})
+        return {f: data[k] for f, k in header.items()}
+
+    def full_clean(self):
+        self._errors = RowErrors()
+        self._non_form_errors = self.error_class()
+        self._header_data = None
+        self.row_count = 0
+        self.spool = RowSpool()
+        if not self.is_bound:
+            return
+        bulk = getattr(self, "bulk", ())
+        try:
+            if (self.validate_max and len(bulk) > self.max_num) or len(
+                bulk
+            ) > self.absolute_max:
+                raise ValidationError(
+                    ngettext(
+                        "Please submit %d or fewer forms.",
+                        "Please submit %d or fewer forms.",
+                        self.max_num,
+                    )
+                    % self.max_num,
+                    code="too_many_forms",
+                )
+            self.clean_rows(bulk)
+            if self.validate_min and self.row_count < self.min_num:
+                raise ValidationError(
+                    ngettext(
+                        "Please submit %d or more forms.",
+                        "Please submit %d or more forms.",
+                        self.min_num,
+                    )
+                    % self.min_num,
+                    code="too_few_forms",
+                )
+            self.clean()
+        except ValidationError as e:
+            self._non_form_errors = self.error_class(e.error_list)
+
+    def clean_rows(self, bulk):
+        RowForm = row_form_factory(self.form)
+        header = self.get_header_row()
+        # The form's __init__ runs once and every row copies the result
+        template = self.form(**self.get_form_kwargs(None))
+        # The BulkModelChoiceFields of the rows share the objects of the bulk
+        for name, objects in self.bulk_choices.items():
+            template.fields[name].objects = objects
+        batch = []
+        for index, row in enumerate(bulk):
+            self.row_count += 1
+            if index >= self.min_num and not any(row.values()):
+                continue
+            form = RowForm({**row, **header}, template)
+            form.full_clean()
+            if form._errors:
+                self._errors.update(index, form._errors)
+            if self._header_data is None:
+                self._header_data = {
+                    k: v
+                    for k, v in form.cleaned_data.items()
+                    if k in self.header_fields
+                }
+            self.clean_row(index, form.cleaned_data)
+            # once a row is invalid nothing is saved, so stop spooling
+            if not self._errors:
+                batch.append((index, form.cleaned_data))
+                if len(batch) >= self.chunk_size:
+                    self.spool.write(batch)
+                    batch = []
+        if batch and not self._errors:
+            self.spool.write(batch)
+
+    def clean_row(self, index, data):
+        """Hook for gathering what the upload-wide ``clean`` needs from a row.
+
+        This is called for every row, including rows with errors, whose
+        cleaned data only holds the fields that cleaned successfully.
+        """
+        pass
+
+    def iter_batches(self):
+        """Yield the cleaned rows of a valid upload as lists of (index, data)."""
+        yield from self.spool
+
+    def close(self):
+        """Close the bulk file and the spooled rows."""
+        super().close()
+        if hasattr(self, "spool"):
+            self.spool.close()
+
+
+BaseStreamingBulkFormSet = type(
+    "BaseStreamingBulkFormSet",
+    (StreamingBulkFormSetMixin, InitBulkFormSet, BaseFormSet),
+    {},
+)
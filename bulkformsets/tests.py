@@ -1,12 +1,15 @@
+import codecs
 import io
 import uuid
 import random
 
 from django import forms
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.validators import MaxValueValidator
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 from django.test import SimpleTestCase
 
 from .forms import bulkformset_factory
+from .streaming import BaseStreamingBulkFormSet
 from .utils import BulkMuxDict
 from .serializers import CSVReader
 
@@ -16,6 +19,39 @@ class SampleForm(forms.Form):
     number = forms.IntegerField()
 
 
+class SampleRowForm(SampleForm):
+    flag = forms.NullBooleanField()
+
+    def clean(self):
+        super().clean()
+        if self.cleaned_data.get("number") == 13:
+            raise forms.ValidationError("Unlucky number.")
+
+
+class LimitedRowForm(SampleRowForm):
+    def __init__(self, *args, limit=10, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit = limit
+        self.fields["number"].validators.append(MaxValueValidator(limit))
+
+    def clean_number(self):
+        return self.cleaned_data["number"] * self.limit
+
+
+def mk_bulk_files(csv_str, prefix="form"):
+    return {
+        "%s-bulkformsetfileupload"
+        % prefix: InMemoryUploadedFile(
+            io.StringIO(csv_str),
+            field_name="csv",
+            name="register_records.csv",
+            content_type="text/csv",
+            size=len(csv_str),
+            charset="utf-8",
+        )
+    }
+
+
 class BulkMuxDictTest(SimpleTestCase):
     def setUp(self):
         self.num_cols = 10
@@ -110,6 +146,7 @@ class CSVReaderTest(SimpleTestCase):
 
     def test_iter(self):
         s = CSVReader(self._mk_file())
+        self.assertEqual(len(s), len(list(s)))
         for i, d in enumerate(s):
             for ref, res in zip(zip(self.data[0], self.data[i + 1]), d.items()):
                 self.assertEqual(ref, res)
@@ -120,6 +157,46 @@ class CSVReaderTest(SimpleTestCase):
         max_num_s = CSVReader(self._mk_file(), max_num=3)
         self.assertEqual(4, len(max_num_s))
 
+    def test_multiline(self):
+        csv_str = 'name,note\r\na,"one\r\ntwo"\r\n\r\nb,"x, ""y"""\r\nc,\r\n'
+        rows = [
+            {"name": "a", "note": "one\r\ntwo"},
+            {"name": "b", "note": 'x, "y"'},
+            {"name": "c", "note": ""},
+        ]
+        content = codecs.BOM_UTF8 + csv_str.encode()
+        for f in (
+            InMemoryUploadedFile(
+                io.BytesIO(), "csv", "a.csv", "text/csv", len(content), "utf-8"
+            ),
+            TemporaryUploadedFile("a.csv", "text/csv", len(content), "utf-8"),
+        ):
+            f.write(content)
+            f.seek(0)
+            s = CSVReader(f)
+            self.assertEqual(["name", "note"], s.fieldnames)
+            self.assertEqual(rows, list(s))
+            for i in (2, 0, 1, -1):
+                self.assertEqual(rows[i], s[i])
+            self.assertRaises(IndexError, lambda: s[3])
+            s.close()
+            f.close()
+
+    def test_close(self):
+        content = self.csv_str.encode()
+        f = TemporaryUploadedFile("a.csv", "text/csv", len(content), "utf-8")
+        f.write(content)
+        f.seek(0)
+        with CSVReader(f) as s:
+            self.assertIsNotNone(s.mmap)
+            row = s[1]
+        self.assertIsNone(s.mmap)
+        # the rows are read from the file once the map is closed
+        self.assertEqual(self.num_rows - 1, len(s))
+        s[0]
+        self.assertEqual(row, s[1])
+        f.close()
+
 
 class BulkFormSetTest(SimpleTestCase):
     """Above we have tested that our BulkMuxDict works like an immutable dictionary.
@@ -149,3 +226,69 @@ class BulkFormSetTest(SimpleTestCase):
         s = SampleFormBulkFormSet(d, f)
         self.assertTrue(type(s.data) == BulkMuxDict)
         self.assertTrue("max_num" in s.serializer_kwargs)
+
+
+class StreamingBulkFormSetTest(SimpleTestCase):
+    def setUp(self):
+        self.data = {
+            "form-TOTAL_FORMS": "0",
+            "form-INITIAL_FORMS": "0",
+            "form-MAX_NUM_FORMS": "",
+            "form-gibberish": "header",
+        }
+        self.FormSet = bulkformset_factory(
+            SampleRowForm,
+            formset=BaseStreamingBulkFormSet,
+            serializer=CSVReader,
+            header_fields=["gibberish"],
+            min_num=1,
+            validate_min=True,
+        )
+        self.FormSet.chunk_size = 2
+
+    def test_valid(self):
+        csv_str = "number,flag\n1,true\n2,false\n,\n3,\n"
+        s = self.FormSet(self.data, mk_bulk_files(csv_str))
+        self.assertTrue(s.is_valid())
+        self.assertEqual(4, s.row_count)
+        self.assertEqual(4, len(s.errors))
+        self.assertEqual({"gibberish": "header"}, s.header_data)
+        batches = list(s.iter_batches())
+        # the blank row is skipped
+        self.assertEqual([[0, 1], [3]], [[i for i, _ in b] for b in batches])
+        self.assertEqual(
+            {"gibberish": "header", "number": 1, "flag": True}, batches[0][0][1]
+        )
+        self.assertIsNone(batches[1][0][1]["flag"])
+
+    def test_errors(self):
+        csv_str = "number,flag\nx,true\n2,false\n13,\n"
+        s = self.FormSet(self.data, mk_bulk_files(csv_str))
+        self.assertFalse(s.is_valid())
+        self.assertEqual([0, 2], sorted(s.row_errors.rows))
+        self.assertEqual([["number"], [], ["__all__"]], [list(e) for e in s.errors])
+        self.assertEqual(["Unlucky number."], s.errors[2]["__all__"])
+        # nothing is saved from an invalid upload
+        self.assertEqual([], list(s.iter_batches()))
+
+    def test_form_init(self):
+        FormSet = bulkformset_factory(
+            LimitedRowForm,
+            formset=BaseStreamingBulkFormSet,
+            serializer=CSVReader,
+            header_fields=["gibberish"],
+        )
+        csv_str = "number,flag\n5,\n6,\n"
+        s = FormSet(self.data, mk_bulk_files(csv_str), form_kwargs={"limit": 5})
+        self.assertFalse(s.is_valid())
+        self.assertEqual([1], list(s.row_errors.rows))
+        self.assertIn("number", s.errors[1])
+        s = FormSet(self.data, mk_bulk_files(csv_str), form_kwargs={"limit": 6})
+        self.assertTrue(s.is_valid())
+        rows = [row for batch in s.iter_batches() for _, row in batch]
+        self.assertEqual([30, 36], [row["number"] for row in rows])
+
+    def test_min_num(self):
+        s = self.FormSet(self.data, mk_bulk_files("number,flag\n"))
+        self.assertFalse(s.is_valid())
+        self.assertEqual(["Please submit 1 or more forms."], s.non_form_errors())
@@ -0,0 +1,92 @@
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import connection
+
+
+def normalize(value):
+    # Match the case insensitive, trailing space padded collation of the database
+    return value.rstrip().casefold() if isinstance(value, str) else value
+
+
+class UniqueChecker:
+    """Validate the unique constraints of many new model instances at once.
+
+    This does what ``Model.validate_unique`` does for each instance, but the
+    unique fields of all instances are looked up together with one ``IN`` query
+    per unique check (and ``batch_size`` values), and instances that repeat the
+    unique fields of an earlier instance are reported as well, comparing strings
+    like the case insensitive collation of the database does. Only the values
+    of the unique fields are kept, so instances can be added as they are read.
+
+    Arguments:
+        model: the model class of the instances
+        exclude (optional list): field names to skip, as in ``validate_unique``
+        batch_size (optional int): the values looked up per query [default=1000]
+    """
+
+    def __init__(self, model, exclude=None, batch_size=1000):
+        self.instance = model()
+        self.unique_checks, self.date_checks = self.instance._get_unique_checks(
+            exclude=exclude
+        )
+        self.batch_size = batch_size
+        # for each unique check, the first tuple of values added and the keys
+        # added with it, by the normalized tuple of values
+        self.values = [{} for _ in self.unique_checks]
+        self.errors = {}
+
+    def add(self, key, instance):
+        """Add an instance to check, identified by key (e.g. a row index)."""
+        for values, (model_class, unique_check) in zip(self.values, self.unique_checks):
+            lookup = []
+            for field_name in unique_check:
+                f = instance._meta.get_field(field_name)
+                value = getattr(instance, f.attname)
+                if value is None or (
+                    value == ""
+                    and connection.features.interprets_empty_strings_as_nulls
+                ):
+                    break
+                if f.primary_key and not instance._state.adding:
+                    break
+                lookup.append(value)
+            else:
+                normalized = tuple(map(normalize, lookup))
+                values.setdefault(normalized, (tuple(lookup), []))[1].append(key)
+        if self.date_checks:
+            self._add_errors(key, instance._perform_date_checks(self.date_checks))
+
+    def check(self):
+        """Look the unique fields up in the database.
+
+        Returns:
+            a dictionary of ValidationErrors keyed by the keys of the instances
+            that are not unique
+        """
+        for values, (model_class, unique_check) in zip(self.values, self.unique_checks):
+            if not values:
+                continue
+            fields = [model_class._meta.get_field(name) for name in unique_check]
+            lookups = [lookup for lookup, _ in values.values()]
+            existing = set()
+            for i in range(0, len(lookups), self.batch_size):
+                batch = lookups[i : i + self.batch_size]
+                qs = model_class._default_manager.filter(
+                    **{
+                        "%s__in" % f.name: {lookup[j] for lookup in batch}
+                        for j, f in enumerate(fields)
+                    }
+                ).values_list(*(f.attname for f in fields))
+                existing.update(tuple(map(normalize, row)) for row in qs)
+            field = unique_check[0] if len(unique_check) == 1 else NON_FIELD_ERRORS
+            message = self.instance.unique_error_message(model_class, unique_check)
+            for normalized, (_, keys) in values.items():
+                if normalized not in existing:
+                    # only the repeats of the first instance are not unique
+                    keys = keys[1:]
+                for key in keys:
+                    self._add_errors(key, {field: [message]})
+        return {key: ValidationError(errors) for key, errors in self.errors.items()}
+
+    def _add_errors(self, key, errors):
+        for field, messages in errors.items():
+            self.errors.setdefault(key, {}).setdefault(field, []).extend(messages)
@@ -64,17 +64,19 @@ class BulkMuxDict(Mapping):
         return len(self.data) + sum(len(d) for d in self.bulk)
 
     def items(self):
+        header_values = {f: self.data[k] for f, k in self.header_dict.items()}
         header_i = set()
         for k, v in self.data.items():
             i, f = self.parse_key(k)
             if f not in self.header_dict:
                 if i is not None and i not in header_i:
                     header_i.add(i)
-                    for hf, hv in self.header_dict:
+                    for hf, hv in header_values.items():
                         yield ("%s-%d-%s" % (self.prefix, i, hf), hv)
                 yield (k, v)
+        # A single pass over the bulk
         for i, d in enumerate(self.bulk, start=self.bulk_i_begin):
-            for f, v in it.chain(self.header_dict.items(), d.items()):
+            for f, v in it.chain(header_values.items(), d.items()):
                 yield ("%s-%d-%s" % (self.prefix, i, f), v)
 
     def parse_key(self, k):
@@ -1,20 +1,37 @@
 import copy
 from decimal import Decimal
 import datetime
+import time
 
 from celery_formtask.tasks import processform, PROGRESS_STATE
 
 
 class FormTaskMixin:
+    # The minimum seconds between two progress updates with the same description
+    formtask_progress_interval = 1
+
     def __init__(self, *args, task=None, ignored_kwargs=[], **kwargs):
         self._task = task
         self._args_bak = args
         self._kwargs_bak = copy.copy(kwargs)
+        self._progress_time = None
+        self._progress_description = None
         for kwarg in ignored_kwargs:
             kwargs.pop(kwarg)
         super().__init__(*args, **kwargs)
 
-    def set_progress(self, current=None, total=None, description=""):
+    @property
+    def task_id(self):
+        """The id of the task processing the form, or None outside of a task."""
+        return self._task.request.id if self._task else None
+
+    def set_progress(self, current=None, total=None, description="", force=False):
+        """Report the progress of the task.
+
+        Updates are throttled to one every ``formtask_progress_interval``
+        seconds, except when the description changes, the last step is reached
+        or ``force`` is True.
+        """
         if self._task:
             meta_total = total or getattr(self, "formtask_total_steps", None)
             meta_description = description or getattr(
@@ -30,6 +47,17 @@ class FormTaskMixin:
                 meta_percent = float(round(percent, 2))
             else:
                 meta_percent = None
+            now = time.monotonic()
+            if (
+                not force
+                and meta_description == self._progress_description
+                and (current is None or meta_total is None or current < meta_total)
+                and self._progress_time is not None
+                and now - self._progress_time < self.formtask_progress_interval
+            ):
+                return
+            self._progress_time = now
+            self._progress_description = meta_description
             self._task.update_state(
                 state=PROGRESS_STATE,
                 meta={
@@ -41,6 +69,14 @@ class FormTaskMixin:
                 },
             )
 
+    def iter_progress(self, iterable, total=None, description=""):
+        """Yield from iterable, reporting the progress after each item."""
+        if total is None and hasattr(iterable, "__len__"):
+            total = len(iterable)
+        for i, item in enumerate(iterable, start=1):
+            yield item
+            self.set_progress(current=i, total=total, description=description)
+
     def enqueue(self, name=None):
         opts = {"shadow": name} if name else {}
         async_result = processform.apply_async(
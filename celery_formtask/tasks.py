@@ -26,28 +26,33 @@ def processform(self, modulename, classname, *fargs, **fkwargs):
     formmodule = import_module(modulename)
     formclass = getattr(formmodule, classname)
     form = formclass(*fargs, task=self, **fkwargs)
-    form.set_progress(description="Validating...")
-    if form.is_valid():
-        form.set_progress(description="Saving...")
-        return form.save()
-    else:
-        meta = {
-            "current": None,
-            "total": None,
-            "percent": 100,
-            "exc_type": "ValidationError",
-            "exc_message": "Validation failed.",
-        }
-        # Regular form
-        if isinstance(form, BaseForm):
-            meta.update({"form_errors": form.errors.get_json_data()})
-        # Formset
-        elif isinstance(form, BaseFormSet):
-            meta.update(
-                {
-                    "form_errors": [error.get_json_data() for error in form.errors],
-                    "non_form_errors": form.non_form_errors().get_json_data(),
-                }
-            )
-        self.update_state(state=states.FAILURE, meta=meta)
-        raise Ignore()
+    try:
+        form.set_progress(description="Validating...")
+        if form.is_valid():
+            form.set_progress(description="Saving...")
+            return form.save()
+        else:
+            meta = {
+                "current": None,
+                "total": None,
+                "percent": 100,
+                "exc_type": "ValidationError",
+                "exc_message": "Validation failed.",
+            }
+            # Regular form
+            if isinstance(form, BaseForm):
+                meta.update({"form_errors": form.errors.get_json_data()})
+            # Formset
+            elif isinstance(form, BaseFormSet):
+                meta.update(
+                    {
+                        "form_errors": [error.get_json_data() for error in form.errors],
+                        "non_form_errors": form.non_form_errors().get_json_data(),
+                    }
+                )
+            self.update_state(state=states.FAILURE, meta=meta)
+            raise Ignore()
+    finally:
+        # e.g. bulk formsets release the files they read
+        if hasattr(form, "close"):
+            form.close()
@@ -1,7 +1,7 @@
 import json
 
 from django import forms
-from django.test import Client, override_settings
+from django.test import Client, SimpleTestCase, override_settings
 from celery_formtask.forms import FormTaskMixin
 from celery_djangotest.unit import TransactionTestCase
 
@@ -88,3 +88,26 @@ class TestFormTask(TransactionTestCase):
         self._test_invalid(asyncresult.id, data)
         self.assertTrue("form_errors" in data[asyncresult.id]["result"])
         self.assertTrue("non_form_errors" in data[asyncresult.id]["result"])
+
+
+class ProgressTask:
+    def __init__(self):
+        self.states = []
+        self.request = type("Request", (), {"id": None})
+
+    def update_state(self, state, meta):
+        self.states.append(meta)
+
+
+class TestFormTaskProgress(SimpleTestCase):
+    def test_set_progress_throttled(self):
+        task = ProgressTask()
+        form = SampleFormTask({"i": 1}, task=task)
+        for i in form.iter_progress(range(10), description="Counting"):
+            pass
+        # the first and the last steps
+        self.assertEqual([1, 10], [meta["current"] for meta in task.states])
+        form.set_progress(current=1, total=2, description="Saving")
+        form.set_progress(current=1, total=2, description="Saving")
+        form.set_progress(current=1, total=2, description="Saving", force=True)
+        self.assertEqual(4, len(task.states))
@@ -0,0 +1,522 @@
+import contextlib
+import csv
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+
+import zipstream
+from django.db.models import F, Max, Min, Q
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.text import get_valid_filename
+from django.utils.timezone import now
+
+from dashboard.models import (
+    ExtractedComposition,
+    ExtractedListPresence,
+    FunctionalUseToRawChem,
+    RawChem,
+)
+from dashboard.utils import GroupConcat
+from factotum.settings import DOWNLOADS_ROOT
+
+logger = logging.getLogger("django")
+
+EXPORT_CHUNK_SIZE = 10000
+EXPORT_PARTITION_SIZE = 250000
+EXPORT_PARTS_DIR = ".parts"
+# Older part directories of an export were left by failed builds
+EXPORT_PARTS_MAX_AGE = datetime.timedelta(days=1)
+
+
+def serialize_provisional(value):
+    return "Yes" if value else "No"
+
+
+class BulkExport:
+    """A public bulk download that is prebuilt into DOWNLOADS_ROOT.
+
+    The export is split into partitions, one per value of ``partition_field``
+    or one per ``EXPORT_PARTITION_SIZE`` primary key values when it is None.
+    Each partition can be written by a separate worker and the parts are
+    stitched into ``filename``, a zip archive holding ``arcname`` and a
+    ``manifest.json`` describing the parts.
+
+    Arguments:
+        name (str): the export key
+        filename (str): the zip archive in DOWNLOADS_ROOT
+        arcname (str): the CSV file inside the archive
+        get_queryset (callable): returns the values queryset to export
+        field_header_map (dict): column headers by field name, in column order
+        field_serializer_map (optional dict): value serializers by field name
+        partition_field (optional str): the field to partition the export by
+    """
+
+    def __init__(
+        self,
+        name,
+        filename,
+        arcname,
+        get_queryset,
+        field_header_map,
+        field_serializer_map={},
+        partition_field=None,
+    ):
+        self.name = name
+        self.filename = filename
+        self.arcname = arcname
+        self.get_queryset = get_queryset
+        self.field_header_map = field_header_map
+        self.field_serializer_map = field_serializer_map
+        self.partition_field = partition_field
+
+    @property
+    def path(self):
+        return os.path.join(DOWNLOADS_ROOT, self.filename)
+
+    def get_partitions(self):
+        """List the partitions of the export.
+
+        Returns:
+            a list of JSON serializable partition dictionaries
+        """
+        # read the partitions from the bare model, without the export's joins
+        queryset = self.get_queryset().model.objects.order_by()
+        if self.partition_field:
+            values = (
+                queryset.values_list(self.partition_field, flat=True)
+                .distinct()
+                .order_by(self.partition_field)
+            )
+            return [{"field": self.partition_field, "value": v} for v in values]
+        bounds = queryset.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return []
+        return [
+            {"field": "pk", "range": [start, start + EXPORT_PARTITION_SIZE]}
+            for start in range(bounds["low"], bounds["high"] + 1, EXPORT_PARTITION_SIZE)
+        ]
+
+    def get_partition_queryset(self, partition):
+        queryset = self.get_queryset()
+        if "range" in partition:
+            low, high = partition["range"]
+            return queryset.filter(pk__gte=low, pk__lt=high)
+        return queryset.filter(**{partition["field"]: partition["value"]})
+
+
+def get_export_fields(queryset):
+    """List the field names of a values queryset in column order."""
+    return list(queryset.query.values_select) + list(queryset.query.annotation_select)
+
+
+def iter_pk_ranges(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Split a queryset into querysets covering consecutive primary key ranges.
+
+    Every range spans ``chunk_size`` primary key values, so each query reads a
+    bounded slice of the table no matter how large the export is. The rows
+    of each range are ordered by primary key.
+
+    Arguments:
+        queryset (QuerySet): the queryset to split
+        chunk_size (optional int): the primary key values per range [default=10000]
+
+    Yields:
+        a QuerySet for each range
+    """
+    bounds = queryset.order_by().aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return
+    for start in range(bounds["low"], bounds["high"] + 1, chunk_size):
+        yield queryset.filter(pk__gte=start, pk__lt=start + chunk_size).order_by("pk")
+
+
+def serialize_record(record, fields, field_serializer_map={}):
+    """Turn a values() record into a CSV row, like djqscsv does."""
+    row = []
+    for field in fields:
+        value = record[field]
+        if value is None:
+            row.append("")
+        elif field in field_serializer_map:
+            row.append(str(field_serializer_map[field](value)))
+        elif isinstance(value, datetime.datetime):
+            row.append(value.isoformat())
+        else:
+            row.append(str(value))
+    return row
+
+
+def write_csv_rows(
+    stream, queryset, field_serializer_map={}, chunk_size=EXPORT_CHUNK_SIZE
+):
+    """Write the rows of a values queryset as CSV, one primary key range at a time.
+
+    Returns:
+        the number of rows and chunks written (tuple)
+    """
+    fields = get_export_fields(queryset)
+    writer = csv.writer(stream)
+    rows = chunks = 0
+    for chunk in iter_pk_ranges(queryset, chunk_size):
+        for record in chunk.iterator():
+            writer.writerow(serialize_record(record, fields, field_serializer_map))
+            rows += 1
+        chunks += 1
+    return rows, chunks
+
+
+def iter_csv_bytes(
+    queryset, field_header_map={}, field_serializer_map={}, chunk_size=EXPORT_CHUNK_SIZE
+):
+    """Yield a values queryset as UTF-8 CSV, one primary key range at a time.
+
+    The first chunk holds a BOM and the header, like the prebuilt archives.
+    """
+    fields = get_export_fields(queryset)
+    stream = io.StringIO()
+    writer = csv.writer(stream)
+    # add BOM to support CSVs in MS Excel
+    stream.write("\ufeff")
+    writer.writerow([field_header_map.get(field, field) for field in fields])
+    for chunk in iter_pk_ranges(queryset, chunk_size):
+        for record in chunk.iterator():
+            writer.writerow(serialize_record(record, fields, field_serializer_map))
+        yield stream.getvalue().encode("utf-8")
+        stream.seek(0)
+        stream.truncate()
+    if stream.tell():
+        yield stream.getvalue().encode("utf-8")
+
+
+@contextlib.contextmanager
+def atomic_archive(path):
+    """Write a zip archive to a temporary file and rename it to ``path``.
+
+    Readers never see a partial archive and concurrent writers don't collide.
+    The temporary file is removed if writing fails.
+
+    Yields:
+        a writable ZipFile
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            with zipfile.ZipFile(tmp_file, "w", compression=zipfile.ZIP_DEFLATED) as z:
+                yield z
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def open_csv_entry(zip_file, arcname, fields, field_header_map={}):
+    """Open a CSV text stream inside a zip archive and write its header."""
+    entry = zip_file.open(arcname, "w", force_zip64=True)
+    with io.TextIOWrapper(entry, encoding="utf-8", newline="") as stream:
+        # add BOM to support CSVs in MS Excel
+        stream.write("\ufeff")
+        csv.writer(stream).writerow(
+            [field_header_map.get(field, field) for field in fields]
+        )
+        yield stream
+
+
+def get_bulk_export(name):
+    return BULK_EXPORTS[name]
+
+
+def bulk_export_response(name):
+    """Serve a prebuilt bulk download.
+
+    Returns:
+        a FileResponse, or None if the download has not been built yet
+    """
+    export = get_bulk_export(name)
+    if os.path.exists(export.path):
+        return FileResponse(
+            open(export.path, "rb"), filename=export.filename, as_attachment=True
+        )
+    return None
+
+
+def live_export_response(name):
+    """Stream a bulk download that has not been built yet.
+
+    The rows are read live, a primary key range at a time, into the same zip
+    archive layout as the prebuilt download, without the manifest.
+
+    Returns:
+        a StreamingHttpResponse
+    """
+    export = get_bulk_export(name)
+    z = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_DEFLATED, allowZip64=True)
+    z.write_iter(
+        export.arcname,
+        iter_csv_bytes(
+            export.get_queryset(), export.field_header_map, export.field_serializer_map
+        ),
+    )
+    response = StreamingHttpResponse(z, content_type="application/zip")
+    response[
+        "Content-Disposition"
+    ] = f'attachment; filename="{get_valid_filename(export.filename)}"'
+    return response
+
+
+def create_parts_dir(export):
+    """Create a unique directory in DOWNLOADS_ROOT for the parts of a build.
+
+    The part directories of the export that are older than
+    EXPORT_PARTS_MAX_AGE, left by builds that failed, are removed first.
+    """
+    root = os.path.join(DOWNLOADS_ROOT, EXPORT_PARTS_DIR)
+    if os.path.isdir(root):
+        stale = time.time() - EXPORT_PARTS_MAX_AGE.total_seconds()
+        for entry in os.scandir(root):
+            if (
+                entry.is_dir()
+                and entry.name.startswith(f"{export.name}-")
+                and entry.stat().st_mtime < stale
+            ):
+                remove_export_parts(entry.path)
+    parts_dir = os.path.join(root, f"{export.name}-{uuid.uuid4().hex}")
+    os.makedirs(parts_dir)
+    return parts_dir
+
+
+def remove_export_parts(parts_dir):
+    """Remove the parts directory of a build."""
+    shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def write_export_part(export, partition, parts_dir, index):
+    """Write one partition of an export to a gzipped, headerless CSV part.
+
+    Returns:
+        a manifest entry for the part (dict)
+    """
+    started = time.monotonic()
+    queryset = export.get_partition_queryset(partition)
+    path = os.path.join(parts_dir, f"part-{index:05d}.csv.gz")
+    with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=1) as f:
+        rows, chunks = write_csv_rows(f, queryset, export.field_serializer_map)
+    return {
+        "index": index,
+        "partition": partition,
+        "path": path,
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def stitch_export_parts(export, parts, parts_dir):
+    """Concatenate the parts of an export into its archive, with a manifest.
+
+    The parts are removed afterwards, even if the stitch fails.
+
+    Returns:
+        the manifest (dict)
+    """
+    started = time.monotonic()
+    parts = sorted(parts, key=lambda part: part["index"])
+    fields = get_export_fields(export.get_queryset())
+    try:
+        with atomic_archive(export.path) as zip_file:
+            with open_csv_entry(
+                zip_file, export.arcname, fields, export.field_header_map
+            ) as stream:
+                for part in parts:
+                    with gzip.open(
+                        part["path"], "rt", encoding="utf-8", newline=""
+                    ) as f:
+                        shutil.copyfileobj(f, stream)
+            manifest = {
+                "name": export.name,
+                "file": export.arcname,
+                "generated_at": now().isoformat(),
+                "rows": sum(part["rows"] for part in parts),
+                "parts": [
+                    {k: v for k, v in part.items() if k != "path"} for part in parts
+                ],
+                "stitch_seconds": round(time.monotonic() - started, 3),
+            }
+            zip_file.writestr("manifest.json", json.dumps(manifest, indent=2))
+    finally:
+        remove_export_parts(parts_dir)
+    logger.info(
+        f"Wrote {manifest['rows']} rows in {len(parts)} parts to {export.path} "
+        f"({os.path.getsize(export.path)} bytes)"
+    )
+    return manifest
+
+
+def get_composition_queryset():
+    return ExtractedComposition.objects.values(*COMPOSITION_HEADERS)
+
+
+def get_functional_use_queryset():
+    return FunctionalUseToRawChem.objects.values(*FUNCTIONAL_USE_HEADERS)
+
+
+def get_list_presence_queryset():
+    return ExtractedListPresence.objects.annotate(
+        tag_names=GroupConcat("tags__name", separator="; ", distinct=True)
+    ).values(*LIST_PRESENCE_HEADERS)
+
+
+def get_lm_hh_queryset():
+    """The LM and HH records, read from their tables rather than their union view.
+
+    The union view is materialized as a whole by every query, so each
+    primary key range of the export would read every record. Like the view,
+    the HH records without a curated chemical are left out.
+    """
+    return (
+        RawChem.objects.filter(
+            Q(extractedlmrec__isnull=False)
+            | Q(extractedhhrec__isnull=False, dsstox__isnull=False)
+        )
+        .annotate(
+            medium=Coalesce("extractedlmrec__medium", "extractedhhrec__medium"),
+            harmonized_medium=Coalesce(
+                "extractedlmrec__harmonized_medium__name",
+                "extractedhhrec__harmonized_medium__name",
+            ),
+            num_measure=Coalesce(
+                "extractedlmrec__num_measure", "extractedhhrec__num_measure"
+            ),
+            chemical_detected=F("chem_detected_flag"),
+        )
+        .values(*LM_HH_HEADERS)
+    )
+
+
+COMPOSITION_HEADERS = {
+    "extracted_text__data_document__data_group__data_source__title": "Data Source",
+    "extracted_text__data_document__title": "Data Document Title",
+    "extracted_text__data_document__subtitle": "Data Document Subtitle",
+    "extracted_text__doc_date": "Document Date",
+    "extracted_text__data_document__product__title": "Product",
+    "extracted_text__data_document__product__product_uber_puc__puc__kind__name": "PUC Kind",
+    "extracted_text__data_document__product__product_uber_puc__puc__gen_cat": "PUC Gen Cat",
+    "extracted_text__data_document__product__product_uber_puc__puc__prod_fam": "PUC Prod Fam",
+    "extracted_text__data_document__product__product_uber_puc__puc__prod_type": "PUC Prod Type",
+    "extracted_text__data_document__product__product_uber_puc__classification_method__name": "PUC Classification Method",
+    "raw_chem_name": "Raw Chemical Name",
+    "raw_cas": "Raw CAS",
+    "dsstox__sid": "DTXSID",
+    "dsstox__true_chemname": "True Chemical Name",
+    "dsstox__true_cas": "True CAS",
+    "provisional": "Provisional",
+    "raw_min_comp": "Raw Min Comp",
+    "raw_max_comp": "Raw Max Comp",
+    "raw_central_comp": "Raw Central Comp",
+    "unit_type__title": "Unit Type",
+    "lower_wf_analysis": "Lower Weight Fraction",
+    "upper_wf_analysis": "Upper Weight Fraction",
+    "central_wf_analysis": "Central Weight Fraction",
+    "weight_fraction_type__title": "Weight Fraction Type",
+}
+
+FUNCTIONAL_USE_HEADERS = {
+    "chemical__extracted_text__data_document__data_group__data_source__title": "Data Source",
+    "chemical__extracted_text__data_document__data_group__group_type__title": "Data Type",
+    "chemical__extracted_text__data_document__title": "Data Document",
+    "chemical__extracted_text__doc_date": "Document Date",
+    "chemical__raw_chem_name": "Raw Chemical Name",
+    "chemical__raw_cas": "Raw CAS",
+    "chemical__dsstox__sid": "DTXSID",
+    "chemical__dsstox__true_chemname": "Curated Chemical Name",
+    "chemical__dsstox__true_cas": "Curated CAS",
+    "chemical__provisional": "Provisional",
+    "functional_use__report_funcuse": "Reported Functional Use",
+    "functional_use__category__title": "Harmonized Functional Use",
+}
+
+LIST_PRESENCE_HEADERS = {
+    "extracted_text__data_document__data_group__data_source__title": "Data Source",
+    "extracted_text__data_document__title": "Data Document Title",
+    "extracted_text__data_document__subtitle": "Data Document Subtitle",
+    "extracted_text__doc_date": "Document Date",
+    "extracted_text__data_document__organization": "Organization",
+    "raw_chem_name": "Raw Chemical Name",
+    "raw_cas": "Raw CAS",
+    "dsstox__sid": "DTXSID",
+    "dsstox__true_chemname": "True Chemical Name",
+    "dsstox__true_cas": "True CAS",
+    "provisional": "Provisional",
+    "functional_uses__report_funcuse": "Reported Functional Use",
+    "functional_uses__category__title": "Harmonized Functional Use",
+    "tag_names": "Tags",
+}
+
+LM_HH_HEADERS = {
+    "extracted_text__data_document__data_group__data_source__title": "Data Source",
+    "extracted_text__data_document__data_group__group_type__title": "Data Type",
+    "extracted_text__data_document__title": "Data Document Title",
+    "extracted_text__doc_date": "Document Date",
+    "raw_chem_name": "Raw Chemical Name",
+    "raw_cas": "Raw CAS",
+    "dsstox__sid": "DTXSID",
+    "dsstox__true_chemname": "True Chemical Name",
+    "dsstox__true_cas": "True CAS",
+    "provisional": "Provisional",
+    "medium": "Medium",
+    "harmonized_medium": "Harmonized Medium",
+    "num_measure": "Numeric Measure",
+    "chemical_detected": "Chemical Detected",
+}
+
+BULK_EXPORTS = {
+    export.name: export
+    for export in (
+        BulkExport(
+            "composition",
+            "composition_chemicals.zip",
+            "composition_chemicals.csv",
+            get_composition_queryset,
+            COMPOSITION_HEADERS,
+            {"provisional": serialize_provisional},
+            partition_field="extracted_text__data_document__data_group_id",
+        ),
+        BulkExport(
+            "functional_uses",
+            "functional_uses.zip",
+            "functional_uses.csv",
+            get_functional_use_queryset,
+            FUNCTIONAL_USE_HEADERS,
+            partition_field="chemical__extracted_text__data_document__data_group_id",
+        ),
+        BulkExport(
+            "list_presence",
+            "list_presence_chemicals.zip",
+            "list_presence_chemicals.csv",
+            get_list_presence_queryset,
+            LIST_PRESENCE_HEADERS,
+            {"provisional": serialize_provisional},
+            partition_field="extracted_text__data_document__data_group_id",
+        ),
+        BulkExport(
+            "lm_hh",
+            "lm_hh_chemicals.zip",
+            "lm_hh_chemicals.csv",
+            get_lm_hh_queryset,
+            LM_HH_HEADERS,
+            {"provisional": serialize_provisional},
+        ),
+    )
+}
@@ -1,10 +1,10 @@
 from django import forms
 from dashboard.models import DataDocument
-from bulkformsets import csvformset_factory
+from bulkformsets import BulkModelChoiceField, csvformset_factory
 
 
 class DocCSVForm(forms.Form):
-    id = forms.ModelChoiceField(DataDocument.objects.exclude(file=""))
+    id = BulkModelChoiceField(DataDocument.objects.exclude(file=""))
 
 
 DocBulkFormSet = csvformset_factory(
@@ -3,11 +3,12 @@ from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 
-from dashboard.utils import clean_dict
+from dashboard.stats import invalidate_site_stats
+from dashboard.utils import clean_dict, populate_user_fields
 from dashboard.forms.data_group import DGFormSet
 from dashboard.models.dsstox_lookup import validate_prefix, validate_blank_char
-from dashboard.models import DataGroup, RawChem, DSSToxLookup
-from bulkformsets import CSVReader
+from dashboard.models import ChemicalPucRollup, DataGroup, RawChem, DSSToxLookup
+from bulkformsets import BulkModelChoiceField, CSVReader
 
 
 class DGChoiceField(forms.ModelChoiceField):
@@ -34,7 +35,7 @@ class DataGroupSelector(forms.ModelForm):
 
 class ChemicalCurationForm(forms.Form):
 
-    external_id = forms.ModelChoiceField(queryset=RawChem.objects.all())
+    external_id = BulkModelChoiceField(queryset=RawChem.objects.all())
     rid = RawChem._meta.get_field("rid").formfield()
     sid = DSSToxLookup._meta.get_field("sid").formfield(required=False)
     true_chemical_name = DSSToxLookup._meta.get_field("true_chemname").formfield(
@@ -52,6 +53,7 @@ class ChemicalCurationForm(forms.Form):
 class ChemicalCurationFormSet(DGFormSet):
     prefix = "curate"
     serializer = CSVReader
+    batch_size = 1000
 
     def __init__(self, *args, **kwargs):
         fields = ["external_id", "rid", "sid", "true_chemical_name", "true_cas"]
@@ -65,52 +67,90 @@ class ChemicalCurationFormSet(DGFormSet):
             raise forms.ValidationError(f"CSV column titles should be {header_cols}")
 
     def save(self):
-        new_dsstox = []
-        made_dsstox = []
-        update_chems = []
+        """Curate the chemicals of every row with a few set-based queries.
+
+        The SIDs of the upload are looked up at once. A SID that already exists
+        gets the name and CAS of its last row that differs from it, while a new
+        SID is created from its first row. The chemicals are then updated with
+        batched bulk updates, which fire the audit log triggers of each row.
+        """
+        sids = {}
+        chems = {}
         for form in self.forms:
             form.cleaned_data["true_chemname"] = form.cleaned_data["true_chemical_name"]
             dss_dict = clean_dict(form.cleaned_data, DSSToxLookup)
-            # Option 1: If the sid is not set then don't attempt to match with a true chem.
-            if dss_dict.get("sid") is None:
-                dss = None
-            # Option 2: identical DSSToxLookup already exists; just get it
-            elif DSSToxLookup.objects.filter(**dss_dict).exists():
-                dss = DSSToxLookup.objects.get(**dss_dict)
-            else:
-                # Option 3: matching DSSToxLookup exists in the db; get it and update its attributes
-                if DSSToxLookup.objects.filter(sid=dss_dict["sid"]).exists():
-                    dss = DSSToxLookup.objects.get(sid=dss_dict["sid"])
-                    dss.true_chemname = dss_dict["true_chemname"]
-                    dss.true_cas = dss_dict["true_cas"]
-                    dss.updated_at = timezone.now()
-                    made_dsstox.append(dss)
-                # Option 4: matching DSSToxLookup exists in new_dsstox list but not yet in db; get it
-                elif any(
-                    dsstox for dsstox in new_dsstox if dsstox.sid == dss_dict["sid"]
-                ):
-                    dss = next(
-                        dsstox for dsstox in new_dsstox if dsstox.sid == dss_dict["sid"]
-                    )
-                # Option 5: no matching DSSToxLookup exists; create it
-                else:
-                    dss = DSSToxLookup(**dss_dict)
-                    new_dsstox.append(dss)
+            sid = dss_dict.get("sid")
+            if sid is not None:
+                sids.setdefault(sid, []).append(dss_dict)
             chem = form.cleaned_data["external_id"]
-            chem.rid = form.cleaned_data["rid"]
-            chem.dsstox = dss
-            chem.provisional = 0
-            update_chems.append(chem)
+            chems[chem.pk] = (chem, sid, form.cleaned_data["rid"])
+        dsstox_dict = self._get_dsstox(list(sids))
+        new_dsstox = []
+        made_dsstox = []
+        for sid, dss_dicts in sids.items():
+            dss = dsstox_dict.get(sid)
+            if dss is None:
+                # No matching DSSToxLookup exists; create it
+                new_dsstox.append(DSSToxLookup(**dss_dicts[0]))
+                continue
+            # A matching DSSToxLookup exists; update its attributes with the
+            # last row whose values differ from it
+            changed = [
+                d
+                for d in dss_dicts
+                if any(
+                    d[field].lower() != getattr(dss, field).lower()
+                    for field in ("true_chemname", "true_cas")
+                    if field in d
+                )
+            ]
+            if changed:
+                # a blank cell keeps the curated value
+                dss.true_chemname = changed[-1].get("true_chemname", dss.true_chemname)
+                dss.true_cas = changed[-1].get("true_cas", dss.true_cas)
+                dss.updated_at = timezone.now()
+                made_dsstox.append(dss)
+        # the bulk queries skip the signal that sets the user fields
+        populate_user_fields(new_dsstox, created=True)
+        populate_user_fields(made_dsstox)
         with transaction.atomic():
-            DSSToxLookup.objects.bulk_create(new_dsstox)
+            DSSToxLookup.objects.bulk_create(new_dsstox, batch_size=self.batch_size)
             DSSToxLookup.objects.bulk_update(
-                made_dsstox, ["true_chemname", "true_cas", "updated_at"]
+                made_dsstox,
+                ["true_chemname", "true_cas", "updated_at", "updated_by"],
+                batch_size=self.batch_size,
+            )
+            # bulk_create doesn't return id's if it's not pgsql
+            dsstox_dict.update(self._get_dsstox([d.sid for d in new_dsstox]))
+            update_chems = []
+            dsstox_ids = set()
+            updated_at = timezone.now()
+            for chem, sid, rid in chems.values():
+                dss = dsstox_dict.get(sid) if sid is not None else None
+                dsstox_ids.update((chem.dsstox_id, dss and dss.pk))
+                chem.rid = rid
+                chem.dsstox = dss
+                chem.provisional = 0
+                chem.updated_at = updated_at
+                update_chems.append(chem)
+            populate_user_fields(update_chems)
+            RawChem.objects.bulk_update(
+                update_chems,
+                ["dsstox", "rid", "provisional", "updated_at", "updated_by"],
+                batch_size=self.batch_size,
             )
-            # This is a costly way to find newly created matching DSSToxLookups
-            for chem in update_chems:
-                # If the dsstox model has been set but had not been saved at time of assignment
-                #  fetch the dsstox from the DB
-                if chem.dsstox and not chem.dsstox.pk:
-                    chem.dsstox = DSSToxLookup.objects.get(sid=chem.dsstox.sid)
-            RawChem.objects.bulk_update(update_chems, ["dsstox", "rid", "provisional"])
+            # The bulk update did not send the signals that keep these current
+            ChemicalPucRollup.objects.invalidate(dsstox_ids)
+            invalidate_site_stats()
         return len(self.forms)
+
+    def _get_dsstox(self, sids):
+        """Get the DSSToxLookups of a list of SIDs, keyed by SID."""
+        dsstox_dict = {}
+        for i in range(0, len(sids), self.batch_size):
+            dsstox_dict.update(
+                DSSToxLookup.objects.in_bulk(
+                    sids[i : i + self.batch_size], field_name="sid"
+                )
+            )
+        return dsstox_dict
@@ -1,20 +1,29 @@
 import ast
-import itertools
 import uuid
+from collections import Counter
 from datetime import datetime
 
 from django.utils import timezone
 
 from django import forms
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models import CharField, Value as V
 
 from django.db.models.functions import Cast, Concat
 
-from bulkformsets import BaseBulkFormSet, CSVReader
+from bulkformsets import (
+    BaseBulkFormSet,
+    BulkModelChoiceField,
+    CSVReader,
+    StreamingBulkFormSetMixin,
+    UniqueChecker,
+    resolve_choices,
+)
 from celery_formtask.forms import FormTaskMixin
 
 from dashboard.models import (
+    ChemicalPucRollup,
     DataDocument,
     Product,
     DuplicateProduct,
@@ -34,12 +43,14 @@ from dashboard.models import (
     ExtractedLMDoc,
     ExtractedLMRec,
     StatisticalValue,
+    QAProgress,
 )
 from dashboard.models.extracted_lmrec import HarmonizedMedium
 
 from dashboard.models.statistical_value import VALUE_TYPE_CHOICES
 
 from dashboard.models.functional_use import FunctionalUseToRawChem
+from dashboard.stats import invalidate_site_stats
 
 from dashboard.utils import (
     clean_dict,
@@ -47,6 +58,7 @@ from dashboard.utils import (
     field_for_model,
     get_missing_ids,
     inheritance_bulk_create,
+    populate_user_fields,
 )
 from factotum.environment import env
 
@@ -99,7 +111,9 @@ class ProductCSVForm(forms.Form):
     data_document_filename fields
     """
 
-    data_document_id = field_for_model(ProductDocument, "document_id")
+    data_document_id = field_for_model(
+        ProductDocument, "document_id", form_class=BulkModelChoiceField
+    )
     data_document_filename = field_for_model(DataDocument, "filename")
     title = field_for_model(Product, "title")
     upc = field_for_model(Product, "upc", required=False)
@@ -120,7 +134,7 @@ class ProductCSVForm(forms.Form):
     image_name = forms.CharField(required=False)
 
 
-class ProductBulkCSVFormSet(DGFormSet):
+class ProductBulkCSVFormSet(StreamingBulkFormSetMixin, DGFormSet):
     """
     Multiple products can be created for a single document.
     If user attempts to upload product data for a document
@@ -140,8 +154,26 @@ class ProductBulkCSVFormSet(DGFormSet):
         "data_document_filename",
     ] + DataGroup().get_product_template_fieldnames()
 
+    def full_clean(self):
+        self.image_dict = {
+            f.name: f for f in self.files.getlist("products-bulkformsetimageupload")
+        }
+        self.missing_images = []
+        self.upc_counts = Counter()
+        super().full_clean()
+
+    def clean_row(self, index, data):
+        image_name = data.get("image_name")
+        if (
+            image_name
+            and image_name not in self.image_dict
+            and data.get("data_document_id")
+        ):
+            self.missing_images.append(str(data["data_document_id"].pk))
+        if data.get("upc"):
+            self.upc_counts[data["upc"]] += 1
+
     def clean(self, *args, **kwargs):
-        missing_images = []
         oversize_images = []
         directory_size = 0
         # Directory Max file count error
@@ -154,9 +186,6 @@ class ProductBulkCSVFormSet(DGFormSet):
                 "Please reduce the number of document upload at one time to < %d."
                 % env.PRODUCT_IMAGE_DIRECTORY_MAX_FILE_COUNT
             )
-        self.image_dict = {
-            f.name: f for f in self.files.getlist("products-bulkformsetimageupload")
-        }
         # Image Upload is too large
         for file_name in self.image_dict:
             directory_size += self.image_dict[file_name].size
@@ -178,16 +207,12 @@ class ProductBulkCSVFormSet(DGFormSet):
                 + ", ".join([image for image in oversize_images])
             )
         # No Image match error
-        for f in self.forms:
-            image_name = f.cleaned_data["image_name"]
-            if image_name and not image_name in self.image_dict.keys():
-                missing_images.append(str(f.cleaned_data["data_document_id"].pk))
-        if missing_images:
+        if self.missing_images:
             report = (
                 "The following record images could not be matched.  "
                 "Please correct or remove their image_names and retry the upload: "
             )
-            report += ", ".join(missing_images)
+            report += ", ".join(self.missing_images)
             raise forms.ValidationError(report)
         header = list(self.bulk.fieldnames)
         if header != self.header_cols:
@@ -195,71 +220,66 @@ class ProductBulkCSVFormSet(DGFormSet):
                 f"CSV column titles should be {self.header_cols}"
             )
 
-        # Iterate over the formset to accumulate the UPCs and check for duplicates
-        upcs = [f.cleaned_data["upc"] for f in self.forms if f.cleaned_data.get("upc")]
-
-        seen = {}
-        # The original list of duplicated UPCs should include all the ones
-        # already in the database that appear in the uploaded file. All the
-        # new UPCs are added as well in order to check for in-file duplication
-        self.dupe_upcs = list(
-            Product.objects.filter(upc__in=upcs)
-            .values_list("upc", flat=True)
-            .distinct()
+        # The duplicated UPCs include all the ones already in the database
+        # that appear in the uploaded file, as well as the ones repeated
+        # within the file
+        self.dupe_upcs = set(
+            Product.objects.filter(upc__in=list(self.upc_counts)).values_list(
+                "upc", flat=True
+            )
         )
-        for x in upcs:
-            if x not in seen:
-                seen[x] = 1
-            else:
-                if seen[x] == 1:
-                    self.dupe_upcs.append(x)
-                seen[x] += 1
+        self.dupe_upcs.update(upc for upc, n in self.upc_counts.items() if n > 1)
 
     def save(self):
         rejected_docids = []
         reports = []
         added_products = 0
-
-        for f in self.forms:
-            f.cleaned_data["created_at"] = datetime.now()
-            image_name = f.cleaned_data.pop("image_name")
-            product_dict = clean_dict(f.cleaned_data, Product)
-            # if the UPC is already in the database, add the product
-            # to the DuplicateProduct model and report it.
-            # It does not invalidate the formset
-            if product_dict.get("upc") in self.dupe_upcs:
-                # Move the source file's duplicate UPC to the source_upc field
-                product_dict.update(source_upc=product_dict.get("upc"))
-                # replace the incoming UPC with a UUID
-                product_dict.update(upc=uuid.uuid4())
-                # Create the new record
-                product = DuplicateProduct(**product_dict)
+        document_ids = set()
+
+        for batch in self.iter_batches():
+            products = []
+            duplicates = []
+            product_documents = []
+            for _, data in batch:
+                data["created_at"] = datetime.now()
+                image_name = data.pop("image_name")
+                product_dict = clean_dict(data, Product)
+                # if the UPC is already in the database, add the product
+                # to the DuplicateProduct model and report it.
+                # It does not invalidate the formset
+                if product_dict.get("upc") in self.dupe_upcs:
+                    # Move the source file's duplicate UPC to the source_upc field
+                    product_dict.update(source_upc=product_dict.get("upc"))
+                    # replace the incoming UPC with a UUID
+                    product_dict.update(upc=uuid.uuid4())
+                    product = DuplicateProduct(**product_dict)
+                    duplicates.append(product)
+                    rejected_docids.append(data["data_document_id"].pk)
+                else:
+                    product = Product(**product_dict)
+                    products.append(product)
                 # attach the image if there is one
                 if image_name:
                     product.image = self.image_dict[image_name]
-                product.save()
-                # once the product is created, it can be linked to
-                # a DataDocument via the ProductDocument table
-                productdocument = ProductDocument(
-                    product=product, document=f.cleaned_data["data_document_id"]
-                )
-                productdocument.save()
+                product_documents.append((product, data["data_document_id"]))
+            with transaction.atomic():
+                Product.objects.bulk_create_products(products)
+                DuplicateProduct.objects.bulk_create_products(duplicates)
+                # once the products are created, they can be linked to
+                # their DataDocuments via the ProductDocument table
+                links = [
+                    ProductDocument(product=product, document=document)
+                    for product, document in product_documents
+                ]
+                populate_user_fields(links, created=True)
+                ProductDocument.objects.bulk_create(links)
+            added_products += len(products)
+            document_ids.update(document.pk for _, document in product_documents)
 
-                rejected_docids.append(f.cleaned_data["data_document_id"].pk)
-            else:
-                # add the new product to the database
-                product = Product(**product_dict)
-                # attach the image if there is one
-                if image_name:
-                    product.image = self.image_dict[image_name]
-                product.save()
-                # once the product is created, it can be linked to
-                # a DataDocument via the ProductDocument table
-                productdocument = ProductDocument(
-                    product=product, document=f.cleaned_data["data_document_id"]
-                )
-                productdocument.save()
-                added_products += 1
+        # The bulk inserts did not send the signals that keep these current
+        if document_ids:
+            ChemicalPucRollup.objects.invalidate_documents(document_ids)
+            invalidate_site_stats()
 
         if len(rejected_docids) > 0:
             report = f"The following data documents had existing or duplicated UPCs and their new products were added as duplicates: "
@@ -269,6 +289,9 @@ class ProductBulkCSVFormSet(DGFormSet):
 
 
 class BaseExtractFileForm(forms.Form):
+    # The models whose unique constraints ExtractFileFormSet checks for the upload
+    unique_models = []
+
     extraction_script = forms.IntegerField(required=True)
     data_document_id = forms.IntegerField(required=True)
     doc_date = field_for_model(ExtractedText, "doc_date")
@@ -289,6 +312,7 @@ class BaseExtractFileForm(forms.Form):
 
 
 class FunctionalUseExtractFileForm(BaseExtractFileForm):
+    unique_models = [ExtractedFunctionalUse]
     prod_name = field_for_model(ExtractedText, "prod_name")
     rev_num = field_for_model(ExtractedText, "rev_num")
 
@@ -297,10 +321,10 @@ class FunctionalUseExtractFileForm(BaseExtractFileForm):
         params = clean_dict(self.cleaned_data, ExtractedFunctionalUse)
         obj = ExtractedFunctionalUse(**params)
         obj.clean()
-        obj.validate_unique()
 
 
 class CompositionExtractFileForm(BaseExtractFileForm):
+    unique_models = [ExtractedComposition]
     prod_name = field_for_model(ExtractedText, "prod_name")
     rev_num = field_for_model(ExtractedText, "rev_num")
     raw_min_comp = field_for_model(ExtractedComposition, "raw_min_comp")
@@ -319,10 +343,10 @@ class CompositionExtractFileForm(BaseExtractFileForm):
         params = clean_dict(self.cleaned_data, ExtractedComposition)
         obj = ExtractedComposition(**params)
         obj.clean()
-        obj.validate_unique()
 
 
 class ChemicalPresenceExtractFileForm(BaseExtractFileForm):
+    unique_models = [ExtractedCPCat, ExtractedListPresence]
     cat_code = field_for_model(ExtractedCPCat, "cat_code")
     description_cpcat = field_for_model(ExtractedCPCat, "description_cpcat")
     cpcat_code = field_for_model(ExtractedCPCat, "cpcat_code")
@@ -336,14 +360,13 @@ class ChemicalPresenceExtractFileForm(BaseExtractFileForm):
         params = clean_dict(data, ExtractedCPCat)
         obj = ExtractedCPCat(**params)
         obj.clean()
-        obj.validate_unique()
         params = clean_dict(data, ExtractedListPresence)
         obj = ExtractedListPresence(**params)
         obj.clean()
-        obj.validate_unique()
 
 
 class LiteratureMonitorExtractFileForm(BaseExtractFileForm):
+    unique_models = [ExtractedLMDoc, ExtractedLMRec]
     prod_name = field_for_model(ExtractedText, "prod_name")
     rev_num = field_for_model(ExtractedText, "rev_num")
     study_type = field_for_model(ExtractedLMDoc, "study_type")
@@ -376,7 +399,6 @@ class LiteratureMonitorExtractFileForm(BaseExtractFileForm):
         params = clean_dict(data, ExtractedLMDoc)
         obj = ExtractedLMDoc(**params)
         obj.clean()
-        obj.validate_unique()
 
         # set harmonized medium from name string
         hm = data.pop("harmonized_medium", None)
@@ -445,10 +467,14 @@ class LiteratureMonitorExtractFileForm(BaseExtractFileForm):
         params = clean_dict(data, ExtractedLMRec)
         obj = ExtractedLMRec(**params)
         obj.clean()
-        obj.validate_unique()
 
 
-class ExtractFileFormSet(FormTaskMixin, DGFormSet):
+# The journals of the extract uploads being saved, by task id
+EXTRACT_UPLOAD_JOURNAL_KEY = "extract_upload_journal:%s"
+EXTRACT_UPLOAD_JOURNAL_TIMEOUT = 60 * 60 * 24 * 7
+
+
+class ExtractFileFormSet(FormTaskMixin, StreamingBulkFormSetMixin, DGFormSet):
     prefix = "extfile"
     header_fields = ["extraction_script"]
     serializer = CSVReader
@@ -466,6 +492,14 @@ class ExtractFileFormSet(FormTaskMixin, DGFormSet):
             self.form = ChemicalPresenceExtractFileForm
         elif dg.type == "LM":
             self.form = LiteratureMonitorExtractFileForm
+        self.Parent, self.Child = get_extracted_models(dg.type)
+        # Parent fields that must be 1:1 with the data document
+        if hasattr(self.Parent, "cat_code"):
+            self.oto_field = "cat_code"
+        elif hasattr(self.Parent, "prod_name"):
+            self.oto_field = "prod_name"
+        else:
+            self.oto_field = None
         # For the template render
         self.extraction_script_choices = [
             (str(s.pk), str(s))
@@ -473,25 +507,103 @@ class ExtractFileFormSet(FormTaskMixin, DGFormSet):
         ]
         super().__init__(*args, dgpk=dgpk, ignored_kwargs=["dgpk"], **kwargs)
 
+    def full_clean(self):
+        self.extraction_script_id = None
+        self.unit_type_ids = set()
+        # The Parent fields and raw_category from the first row of each document
+        self.parent_params = {}
+        self.raw_categories = {}
+        self.parent_oto_fields = set()
+        self.updated_datadocuments = []
+        # The raw_category of the updated documents before the upload
+        self.old_raw_categories = {}
+        # The lowercased functional uses of the whole upload
+        self.report_funcuses = set()
+        self.unique_checkers = [
+            (model, UniqueChecker(model))
+            for model in getattr(self.form, "unique_models", [])
+        ]
+        super().full_clean()
+
+    def has_child(self, data):
+        """Whether a row holds chemical data, beyond its document."""
+        return bool(clean_dict(data, self.Child).keys() - {"extracted_text_id"})
+
+    @staticmethod
+    def split_uses(report_funcuse):
+        """Split a reported functional use string into its distinct lowercased uses."""
+        uses = []
+        for use in (report_funcuse or "").split(";"):
+            use = use.strip().lower()
+            if use and use not in uses:
+                uses.append(use)
+        return uses
+
+    def clean_row(self, index, data):
+        if index % self.chunk_size == 0:
+            self.set_progress(
+                current=index, total=len(self.bulk), description="Validating rows"
+            )
+        pk = data.get("data_document_id")
+        if self.extraction_script_id is None:
+            self.extraction_script_id = data.get("extraction_script_id")
+        if data.get("unit_type_id") is not None:
+            self.unit_type_ids.add(data["unit_type_id"])
+        first_row = pk is not None and pk not in self.parent_params
+        if pk is not None:
+            if first_row:
+                self.parent_params[pk] = clean_dict(data, self.Parent)
+                self.raw_categories[pk] = data.get("raw_category")
+            if self.oto_field:
+                self.parent_oto_fields.add((pk, data.get(self.oto_field)))
+        if index not in self.row_errors:
+            for model, checker in self.unique_checkers:
+                # The rows of a document share its Parent, so it is checked once
+                if model is self.Parent and not first_row:
+                    continue
+                checker.add(index, model(**clean_dict(data, model)))
+        # Only children carry functional uses
+        if not self.has_child(data):
+            return
+        uses = self.split_uses(data.get("report_funcuse"))
+        if any(len(use) > 255 for use in uses):
+            self.add_row_error(
+                index,
+                "report_funcuse",
+                forms.ValidationError("The reported functional use string is too long"),
+            )
+        elif len(uses) > 1 and not self.dg.can_have_multiple_funcuse:
+            self.add_row_error(
+                index,
+                "report_funcuse",
+                forms.ValidationError(
+                    "No more than one functional use is acceptable."
+                    f" Reported uses: {uses}"
+                ),
+            )
+        else:
+            self.report_funcuses.update(uses)
+
     def clean(self):
         validation_errors = []
-        # We're now CPU bound on this call, not SQL bound. Make for a more fun problem.
-        Parent, Child = get_extracted_models(self.dg.type)
-        unique_parent_ids = set(f.cleaned_data["data_document_id"] for f in self.forms)
+        unique_parent_ids = set(self.parent_params)
+        # Check the unique constraints of the upload with a few queries
+        for model, checker in self.unique_checkers:
+            for index, error in checker.check().items():
+                for field, errors in error.error_dict.items():
+                    if field + "_id" in self.form.base_fields:
+                        field = field + "_id"
+                    elif field not in self.form.base_fields:
+                        field = None
+                    self.add_row_error(index, field, forms.ValidationError(errors))
         # Check that extraction_script is valid
-        extraction_script_id = self.forms[0].cleaned_data["extraction_script_id"]
         if not Script.objects.filter(
-            script_type="EX", pk=extraction_script_id
+            script_type="EX", pk=self.extraction_script_id
         ).exists():
             err = forms.ValidationError("Invalid extraction script selection.")
             validation_errors.append(err)
         # Check that unit_type is valid
-        unit_type_ids = (
-            f.cleaned_data["unit_type_id"]
-            for f in self.forms
-            if f.cleaned_data.get("unit_type_id") is not None
-        )
-        bad_ids = get_missing_ids(UnitType, unit_type_ids)
+        bad_ids = get_missing_ids(UnitType, self.unit_type_ids)
         if bad_ids:
             err_str = 'The following "unit_type"s were not found: '
             err_str += ", ".join("%d" % i for i in bad_ids)
@@ -510,243 +622,243 @@ class ExtractFileFormSet(FormTaskMixin, DGFormSet):
             err = forms.ValidationError(err_str)
             validation_errors.append(err)
         # Check that parent fields do not conflict (OneToOne check)
-        if hasattr(Parent, "cat_code"):
-            oto_field = "cat_code"
-        elif hasattr(Parent, "prod_name"):
-            oto_field = "prod_name"
-        else:
-            oto_field = None
-        if oto_field:
-            unique_parent_oto_fields = set(
-                (f.cleaned_data["data_document_id"], f.cleaned_data[oto_field])
-                for f in self.forms
+        if self.oto_field and len(unique_parent_ids) != len(self.parent_oto_fields):
+            unseen_parents = set(unique_parent_ids)
+            bad_ids = []
+            for i, _ in self.parent_oto_fields:
+                if i in unseen_parents:
+                    unseen_parents.remove(i)
+                else:
+                    bad_ids.append(i)
+            err_str = (
+                'The following "data_document_id"s got unexpected "%s"s (must be 1:1): '
+                % self.oto_field
             )
-            if len(unique_parent_ids) != len(unique_parent_oto_fields):
-                unseen_parents = set(unique_parent_ids)
-                bad_ids = []
-                for i, _ in unique_parent_oto_fields:
-                    if i in unseen_parents:
-                        unseen_parents.remove(i)
-                    else:
-                        bad_ids.append(i)
-                err_str = (
-                    'The following "data_document_id"s got unexpected "%s"s (must be 1:1): '
-                    % oto_field
-                )
-                err_str += ", ".join("%d" % i for i in bad_ids)
-                err = forms.ValidationError(err_str)
-                validation_errors.append(err)
+            err_str += ", ".join("%d" % i for i in bad_ids)
+            err = forms.ValidationError(err_str)
+            validation_errors.append(err)
         if validation_errors:
             raise forms.ValidationError(validation_errors)
-        # Make the DataDocument, Parent, and Child objects and validate them
-        parent_dict = Parent.objects.in_bulk(unique_parent_ids)
-        unseen_parents = set(unique_parent_ids)
-        for form in self.forms:
-            data = form.cleaned_data
-            pk = data["data_document_id"]
-            # Parent and DataDocument
-            if pk in unseen_parents:
-                # DataDocument updates
-                datadocument = datadocument_dict[pk]
-                new_raw_category = data["raw_category"]
-                old_raw_category = datadocument.raw_category
-                if new_raw_category != old_raw_category:
-                    datadocument.raw_category = new_raw_category
-                    datadocument.clean(skip_type_check=True)
-                    datadocument._meta.created_fields = {}
-                    datadocument._meta.updated_fields = {
-                        "raw_category": {
-                            "old": old_raw_category,
-                            "new": new_raw_category,
-                        }
-                    }
-                else:
-                    datadocument._meta.created_fields = {}
-                    datadocument._meta.updated_fields = {}
-                # Parent creates
-                parent_params = clean_dict(data, Parent)
-                if pk not in parent_dict:
-                    parent = Parent(**parent_params)
-                    parent._meta.created_fields = parent_params
-                    parent._meta.updated_fields = {}
-                # Parent updates
-                else:
-                    parent = parent_dict[pk]
-                    parent._meta.created_fields = {}
-                    parent._meta.updated_fields = {}
-                    for field, new_value in parent_params.items():
-                        old_value = getattr(parent, field)
-                        if new_value != old_value:
-                            setattr(parent, field, new_value)
-                            parent._meta.updated_fields[field] = {
-                                "old_value": old_value,
-                                "new_value": new_value,
-                            }
-                # Mark this parent as seen
-                unseen_parents.remove(pk)
-            else:
-                parent = None
-                datadocument = None
-            # Child creates
-            child_params = clean_dict(data, Child)
-            if form["report_funcuse"].value():
-                use_vals = [
-                    u.strip() for u in form["report_funcuse"].value().split(";")
-                ]
-            else:
-                use_vals = []
-            existing_uses = None
-            new_uses = None
-            # Only include children if relevant data is attached
-            if child_params.keys() - {"extracted_text_id"}:
-                child = Child(**child_params)
-                child._meta.created_fields = child_params
-                child._meta.updated_fields = {}
-                uses = []
-                for use in use_vals:
-                    if not use:  # filter out empty strings
-                        continue
-                    elif len(use) > 255:
-                        form.add_error(
-                            "report_funcuse",
-                            forms.ValidationError(
-                                "The reported functional use string is too long"
-                            ),
-                        )
-                    else:
-                        uses.append(use.lower())
+        # DataDocument updates
+        for pk, new_raw_category in self.raw_categories.items():
+            datadocument = datadocument_dict[pk]
+            if new_raw_category != datadocument.raw_category:
+                self.old_raw_categories[pk] = datadocument.raw_category
+                datadocument.raw_category = new_raw_category
+                datadocument.clean(skip_type_check=True)
+                self.updated_datadocuments.append(datadocument)
 
-                # Get existing functional uses
-                existing_uses = list(
-                    FunctionalUse.objects.filter(report_funcuse__in=uses)
+    def save(self):
+        """Save the upload a batch of rows at a time.
+
+        The documents and Parents are saved in one transaction, then each batch
+        of children in its own, so a large upload does not lock
+        ``dashboard_rawchem`` until it is done. What each transaction saves is
+        recorded in a journal before it commits (kept in the cache with the
+        task id), and a save that fails rolls back the rows it saved. The
+        journal of a task whose worker was lost is rolled back with the
+        ``rollback_extract_upload`` command.
+        """
+        journal = {
+            "data_group_id": self.dg.pk,
+            "extraction_script_id": self.extraction_script_id,
+            # the raw_category and updated_at of the updated documents
+            "documents": {},
+            # the changed fields of the updated Parents, with their old values
+            "parents": {},
+            "created_parents": [],
+            # the first and last primary key of each batch of children
+            "children": [],
+        }
+        try:
+            self.set_progress(description="Saving documents")
+            with transaction.atomic():
+                for datadocument in self.updated_datadocuments:
+                    journal["documents"][datadocument.pk] = (
+                        self.old_raw_categories[datadocument.pk],
+                        datadocument.updated_at,
+                    )
+                    datadocument.updated_at = timezone.now()
+                if self.updated_datadocuments:
+                    DataDocument.objects.bulk_update(
+                        self.updated_datadocuments, ["raw_category", "updated_at"]
+                    )
+                self._save_parents(journal)
+                self._write_journal(journal)
+            funcuses = self._create_new_functional_uses(self.report_funcuses)
+            for batch in self.iter_batches():
+                with transaction.atomic():
+                    children = self._save_children(
+                        (data for _, data in batch), funcuses
+                    )
+                    if children:
+                        journal["children"].append((children[0].pk, children[-1].pk))
+                        self._write_journal(journal)
+                self.set_progress(
+                    current=batch[-1][0] + 1,
+                    total=self.row_count,
+                    description="Saving rows",
                 )
+        except Exception:
+            self.rollback_upload(journal)
+            self._delete_journal()
+            raise
+        self._delete_journal()
+        return self.row_count
+
+    def _write_journal(self, journal):
+        if self.task_id:
+            cache.set(
+                EXTRACT_UPLOAD_JOURNAL_KEY % self.task_id,
+                journal,
+                EXTRACT_UPLOAD_JOURNAL_TIMEOUT,
+            )
 
-                # Get new (to be created) functional uses
-                new_uses = set(uses)
-                new_uses = new_uses.difference(
-                    set(map(lambda o: o.report_funcuse.lower(), existing_uses))
-                )
-            else:
-                child = None
-            if (
-                (existing_uses or new_uses)
-                and not self.dg.can_have_multiple_funcuse
-                and (len(existing_uses) + len(new_uses)) > 1
-            ):
-                # Get a list of all uses
-                uses = existing_uses
-                uses.extend(new_uses)
-
-                form.add_error(
-                    "report_funcuse",
-                    forms.ValidationError(
-                        "No more than one functional use is acceptable."
-                        f" Reported uses: {[str(u) for u in uses]}"
-                    ),
-                )
-            # Store in dictionary
-            data["datadocument"] = datadocument
-            data["parent"] = parent
-            data["child"] = child
-            data["uses"] = existing_uses
-            data["new_uses"] = new_uses
+    def _delete_journal(self):
+        if self.task_id:
+            cache.delete(EXTRACT_UPLOAD_JOURNAL_KEY % self.task_id)
 
-    def save(self):
-        datadocuments = [
-            f.cleaned_data["datadocument"]
-            for f in self.forms
-            if f.cleaned_data["datadocument"]
-        ]
-        parents = [
-            f.cleaned_data["parent"] for f in self.forms if f.cleaned_data["parent"]
-        ]
-        children = [
-            f.cleaned_data["child"] for f in self.forms if f.cleaned_data["child"]
-        ]
-        # Functional Uses are organized as a list of lists.
-        # The external list is the document list (parent).
-        # The internal lists are the content for the chemical (child).
-        # Set of existing FunctionalUses that are already added to the database.
-        funcuses = [
-            f.cleaned_data["uses"] for f in self.forms if f.cleaned_data["child"]
-        ]
-        # Set of new rawchem terms to be added to the database.
-        new_funcuses = [
-            f.cleaned_data["new_uses"] for f in self.forms if f.cleaned_data["child"]
-        ]
-
-        # Set of statistical values for lm record
-        statistical_values = []
-        for f in self.forms:
-            if "statistical_values" in f.cleaned_data.keys():
-                statistical_values.append(f.cleaned_data["statistical_values"])
+    @staticmethod
+    def rollback_upload(journal):
+        """Undo what the save of an upload recorded in its journal.
 
+        The children and Parents it created are deleted and the Parents and
+        documents it updated get their old values back.
+        """
+        dg = DataGroup.objects.get(pk=journal["data_group_id"])
+        Parent, Child = get_extracted_models(dg.type)
         with transaction.atomic():
-            # Abstract some of the funcuse info out of the save.
-            # Creates FunctionalUses for all new_funcuses report_funcuse strings
-            # and combines them with the corresponding set of FunctionalUses in
-            # funcuses.
-            funcuses = self._create_new_functional_uses(funcuses, new_funcuses)
-
-            # Update DataDocument and Parent
-            for objs in (datadocuments, parents):
-                updated_objs = [o for o in objs if o._meta.updated_fields]
-                updated_fields = {"updated_at"}
-                for obj in updated_objs:
-                    updated_fields |= set(obj._meta.updated_fields.keys())
-                    obj.updated_at = timezone.now()
-                if updated_objs:
-                    model = updated_objs[0]._meta.model
-                    model.objects.bulk_update(updated_objs, updated_fields)
-            # Create Parent and Child
-            for objs in (parents, children):
-                created_objs = [o for o in objs if o._meta.created_fields]
-                if created_objs:
-                    chems = inheritance_bulk_create(created_objs)
-            # Bulk add functional uses to each chemical.
-            reported_uses = []
-            for chem, uses in zip(chems, funcuses):
-                for use in uses:
-                    reported_uses.append(
-                        FunctionalUseToRawChem(functional_use=use, chemical_id=chem.pk)
-                    )
-            # Add all new connections at once.
-            FunctionalUseToRawChem.objects.bulk_create(reported_uses)
-
-            # create all statistic values
-            statistics = []
-            for chem, stats in zip(chems, statistical_values):
-                for stat in stats:
-                    stat.rawchem_id = chem.rawchem_ptr_id
-                    statistics.append(stat)
-            StatisticalValue.objects.bulk_create(statistics)
-        return len(self.forms)
-
-    def _create_new_functional_uses(self, funcuses, new_funcuses):
-        """Creates functional uses for strings in new_funcuses and adds them to
-        funcuses.  Returns list of lists containing all funcuses"""
+            for first, last in journal["children"]:
+                Child.objects.filter(pk__range=(first, last)).delete()
+            Parent.objects.filter(pk__in=journal["created_parents"]).delete()
+            parents = Parent.objects.in_bulk(list(journal["parents"]))
+            fields = set()
+            for pk, old_values in journal["parents"].items():
+                for field, value in old_values.items():
+                    setattr(parents[pk], field, value)
+                fields.update(old_values)
+            if parents:
+                Parent.objects.bulk_update(parents.values(), fields)
+            documents = DataDocument.objects.in_bulk(list(journal["documents"]))
+            for pk, (raw_category, updated_at) in journal["documents"].items():
+                documents[pk].raw_category = raw_category
+                documents[pk].updated_at = updated_at
+            if documents:
+                DataDocument.objects.bulk_update(
+                    documents.values(), ["raw_category", "updated_at"]
+                )
+        QAProgress.objects.refresh_documents(
+            list(journal["parents"]) + journal["created_parents"],
+            {journal["extraction_script_id"]},
+        )
 
-        # Save the new functional uses.
-        # Flattened with itertools then bulk create all rows. (one sql operation)
-        flat_report_funcuses = set(itertools.chain(*new_funcuses))
-        FunctionalUse.objects.bulk_create(
-            [FunctionalUse(report_funcuse=use) for use in flat_report_funcuses]
+    def _save_parents(self, journal):
+        """Create or update the Parent of each document in the upload."""
+        parent_dict = self.Parent.objects.in_bulk(list(self.parent_params))
+        created_parents = []
+        updated_parents = []
+        updated_fields = {"updated_at"}
+        for pk, parent_params in self.parent_params.items():
+            if pk not in parent_dict:
+                created_parents.append(self.Parent(**parent_params))
+                continue
+            parent = parent_dict[pk]
+            changed_fields = {
+                field
+                for field, new_value in parent_params.items()
+                if getattr(parent, field) != new_value
+            }
+            if changed_fields:
+                journal["parents"][pk] = {
+                    field: getattr(parent, field)
+                    for field in changed_fields | {"updated_at"}
+                }
+                for field in changed_fields:
+                    setattr(parent, field, parent_params[field])
+                parent.updated_at = timezone.now()
+                updated_parents.append(parent)
+                updated_fields |= changed_fields
+        if updated_parents:
+            self.Parent.objects.bulk_update(updated_parents, updated_fields)
+        if created_parents:
+            inheritance_bulk_create(created_parents)
+            journal["created_parents"] = [parent.pk for parent in created_parents]
+        # bulk operations skip the signals that recount the QA progress
+        QAProgress.objects.refresh_documents(
+            list(self.parent_params),
+            {parent.extraction_script_id for parent in parent_dict.values()},
         )
-        # Get all newly created FunctionalUses
-        # bulk_create doesn't return id's if it's not pgsql
-        created_funcuse = FunctionalUse.objects.filter(
-            report_funcuse__in=flat_report_funcuses
+
+    def _save_children(self, rows, funcuses):
+        """Create the Child records of a batch of rows with their functional uses
+        and statistical values.
+
+        Arguments:
+            rows: the cleaned data of the rows
+            funcuses: a dictionary of FunctionalUses keyed by lowercased report_funcuse
+
+        Returns:
+            the created Child records
+        """
+        children = []
+        child_uses = []
+        child_statistics = []
+        for data in rows:
+            child_params = clean_dict(data, self.Child)
+            # Only include children if relevant data is attached
+            if child_params.keys() - {"extracted_text_id"}:
+                children.append(self.Child(**child_params))
+                child_uses.append(self.split_uses(data.get("report_funcuse")))
+                child_statistics.append(data.get("statistical_values", []))
+        if not children:
+            return children
+        inheritance_bulk_create(children)
+        # Bulk add functional uses to each chemical.
+        FunctionalUseToRawChem.objects.bulk_create(
+            FunctionalUseToRawChem(functional_use=funcuses[use], chemical_id=chem.pk)
+            for chem, uses in zip(children, child_uses)
+            for use in uses
         )
-        # Add the new functional uses to the existing functional uses
-        # After this loop all functional uses will be in funcuse_entry
-        # corresponding to the form.
-        for funcuse_entry, new_uses in zip(funcuses, new_funcuses):
-            uses = []
-            for use in new_uses:
-                # Find first matching report_funcuse from newly created functional uses
-                uses.append(next(i for i in created_funcuse if i.report_funcuse == use))
-            uses = FunctionalUse.objects.filter(report_funcuse__in=new_uses)
-            funcuse_entry.extend(uses)
+        # create all statistic values
+        statistics = []
+        for chem, stats in zip(children, child_statistics):
+            for stat in stats:
+                stat.rawchem_id = chem.pk
+                statistics.append(stat)
+        StatisticalValue.objects.bulk_create(statistics)
+        return children
+
+    def _create_new_functional_uses(self, uses):
+        """Get the FunctionalUses of the lowercased report_funcuse strings in
+        uses, creating the ones that do not exist yet.
+
+        The uses are looked up in chunks of ``chunk_size`` and the missing ones
+        are created with a single ``bulk_create``.
+
+        Returns:
+            a dictionary of FunctionalUses keyed by lowercased report_funcuse
+        """
+        funcuses = {}
+        if not uses:
+            return funcuses
+
+        def lookup(uses):
+            uses = list(uses)
+            for i in range(0, len(uses), self.chunk_size):
+                for funcuse in FunctionalUse.objects.filter(
+                    report_funcuse__in=uses[i : i + self.chunk_size]
+                ):
+                    funcuses.setdefault(funcuse.report_funcuse.lower(), funcuse)
+
+        lookup(uses)
+        new_uses = uses - funcuses.keys()
+        if new_uses:
+            FunctionalUse.objects.bulk_create(
+                [FunctionalUse(report_funcuse=use) for use in new_uses],
+                batch_size=self.chunk_size,
+            )
+            # bulk_create doesn't return id's if it's not pgsql
+            lookup(new_uses)
         return funcuses
 
 
@@ -1026,12 +1138,16 @@ class FunctionalUseBulkCSVFormSet(DGFormSet):
         if header != header_cols:
             raise forms.ValidationError(f"CSV column titles should be {header_cols}")
 
+        # Look the category titles of every row up at once
+        categories = resolve_choices(
+            FunctionalUseCategory.objects.all(),
+            (f.cleaned_data.get("category_title") for f in self.forms),
+            to_field_name="title",
+        )
         for f in self.forms:
             # Convert category title string to an existing functional use category object
             category_title = f.cleaned_data.get("category_title")
-            category = FunctionalUseCategory.objects.filter(
-                title=category_title
-            ).first()
+            category = categories.get((category_title or "").lower())
             if not category:
                 raise forms.ValidationError(
                     f"'{category_title}' is not a valid category title"
@@ -5,10 +5,12 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.forms import BaseInlineFormSet
 
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 from dashboard.forms.puc_forms import BasePUCForm
 from dashboard.models import (
+    ChemicalPucRollup,
     DataDocument,
     DataGroup,
     DataSource,
@@ -217,7 +219,8 @@ class BulkProductToPUCDeleteForm(forms.Form):
 
     def save(self):
         p2p_ids = self.cleaned_data["p2p_ids"].split(",")
-        ProductToPUC.objects.filter(pk__in=p2p_ids).delete()
+        with ProductToPUC.objects.deferred_uber_pucs():
+            ProductToPUC.objects.filter(pk__in=p2p_ids).delete()
         return self.SUCCESS_MESSAGE % len(p2p_ids)
 
 
@@ -791,7 +794,12 @@ class RemoveCuratedChemicalLinkageForm(forms.Form):
         raw_chem_name = self.cleaned_data["raw_chem_name"]
         raw_cas = self.cleaned_data["raw_cas"]
         sid = self.cleaned_data["sid"]
-        RawChem.objects.filter(
+        rawchems = RawChem.objects.filter(
             raw_chem_name=raw_chem_name, raw_cas=raw_cas, dsstox__sid=sid
-        ).update(dsstox_id=None, provisional=False)
+        )
+        ChemicalPucRollup.objects.invalidate(
+            rawchems.values_list("dsstox_id", flat=True).distinct()
+        )
+        # bump updated_at so provisional assignment reconsiders the pair
+        rawchems.update(dsstox_id=None, provisional=False, updated_at=now())
         return f"Raw chemical {raw_chem_name}/{raw_cas} linkages to curated chemical {sid} have been removed"
@@ -1,7 +1,7 @@
 from dal import autocomplete
 
 from django import forms
-from bulkformsets import BaseBulkFormSet, CSVReader
+from bulkformsets import BaseBulkFormSet, BulkModelChoiceField, CSVReader
 from dashboard.models import Script, PUC, ProductToPUC, ExtractedHabitsAndPracticesToPUC
 from django.contrib.auth.models import User
 from celery_formtask.forms import FormTaskMixin
@@ -78,6 +78,7 @@ class ProductToPucForm(forms.ModelForm):
             "puc_assigned_script",
             "puc_assigned_usr",
         ]
+        field_classes = {"product": BulkModelChoiceField, "puc": BulkModelChoiceField}
 
     def __init__(
         self, puc_assigned_script=None, puc_assigned_usr=None, *args, **kwargs
@@ -122,27 +123,28 @@ class PredictedPucCsvFormSet(FormTaskMixin, BaseBulkFormSet):
         self.set_progress(
             current=2, total=len(self.forms), description="Saving predicted PUCs"
         )
-        for form in self.forms:
-            # if the product has already been assigned a PUC via the AU method,
-            # update the existing record with the new PUC
-            p2p, created = ProductToPUC.objects.update_or_create(
-                classification_method_id="AU",
-                product=form.cleaned_data["product"],
-                defaults={
-                    "classification_method_id": "AU",
-                    "puc": form.cleaned_data["puc"],
-                    "puc_assigned_script_id": puc_assigned_script,
-                    "puc_assigned_usr_id": puc_assigned_usr,
-                    "classification_confidence": form.cleaned_data[
-                        "classification_confidence"
-                    ],
-                },
-            )
-            p2p.update_uber_puc()
-
-            if created:
-                created_recs += 1
-            else:
-                updated_recs += 1
+        # the uber PUCs of all the products are updated together at the end
+        with ProductToPUC.objects.deferred_uber_pucs():
+            for form in self.forms:
+                # if the product has already been assigned a PUC via the AU method,
+                # update the existing record with the new PUC
+                p2p, created = ProductToPUC.objects.update_or_create(
+                    classification_method_id="AU",
+                    product=form.cleaned_data["product"],
+                    defaults={
+                        "classification_method_id": "AU",
+                        "puc": form.cleaned_data["puc"],
+                        "puc_assigned_script_id": puc_assigned_script,
+                        "puc_assigned_usr_id": puc_assigned_usr,
+                        "classification_confidence": form.cleaned_data[
+                            "classification_confidence"
+                        ],
+                    },
+                )
+
+                if created:
+                    created_recs += 1
+                else:
+                    updated_recs += 1
 
         return created_recs, updated_recs
@@ -1,7 +1,13 @@
 from django import forms
 from django.db.models import Prefetch
 
-from dashboard.models import PUC, DataGroup, DataDocument, ProductToPUC
+from dashboard.models import (
+    PUC,
+    ChemicalPucRollup,
+    DataGroup,
+    DataDocument,
+    ProductToPUC,
+)
 
 
 class RawCategoryToPUCForm(forms.Form):
@@ -73,6 +79,11 @@ class RawCategoryToPUCForm(forms.Form):
 
         ProductToPUC.objects.bulk_create(product_to_puc_requires_create)
         ProductToPUC.objects.bulk_update(product_to_puc_requires_update, ["puc"])
+        # bulk operations skip the signals that update the uber PUCs and drop
+        # stale chemical rollups
+        product_ids = [product.pk for product in self.products_as_set]
+        ProductToPUC.objects.recompute_uber_pucs(product_ids)
+        ChemicalPucRollup.objects.invalidate_products(product_ids)
 
         return {
             "products": self.products_as_set,
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.20 on 2021-11-18 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("dashboard", "0214_chem_form_help_text")]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChemicalPucRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("puc_level", models.PositiveSmallIntegerField()),
+                ("product_count", models.PositiveIntegerField(default=0)),
+                ("cumulative_product_count", models.PositiveIntegerField(default=0)),
+                (
+                    "dsstox",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="puc_rollups",
+                        to="dashboard.DSSToxLookup",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="dashboard.PUCKind",
+                    ),
+                ),
+                (
+                    "puc",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="dashboard.PUC",
+                    ),
+                ),
+            ],
+            options={"unique_together": {("dsstox", "puc")}},
+        ),
+        migrations.AddIndex(
+            model_name="chemicalpucrollup",
+            index=models.Index(
+                fields=["dsstox", "kind"], name="dashboard_c_dsstox__efce0b_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.20 on 2021-11-22 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("dashboard", "0215_chemical_puc_rollup")]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="rawchem",
+            index=models.Index(
+                fields=["updated_at"], name="dashboard_r_updated_a3aa59_idx"
+            ),
+        )
+    ]
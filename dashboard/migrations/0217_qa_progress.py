@@ -0,0 +1,46 @@
+# Generated by Django 2.2.20 on 2021-11-24 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("dashboard", "0216_rawchem_updated_at_index")]
+
+    operations = [
+        migrations.CreateModel(
+            name="QAProgress",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("extractedtext_count", models.PositiveIntegerField(default=0)),
+                ("qa_group_count", models.PositiveIntegerField(default=0)),
+                ("qa_checked_count", models.PositiveIntegerField(default=0)),
+                (
+                    "data_group",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="qa_progress",
+                        to="dashboard.DataGroup",
+                    ),
+                ),
+                (
+                    "extraction_script",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="qa_progress",
+                        to="dashboard.Script",
+                    ),
+                ),
+            ],
+            options={"unique_together": {("extraction_script", "data_group")}},
+        )
+    ]
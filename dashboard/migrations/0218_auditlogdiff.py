@@ -0,0 +1,32 @@
+# Generated by Django 2.2.20 on 2021-11-26 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("dashboard", "0217_qa_progress")]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditLogDiff",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("extracted_text_id", models.PositiveIntegerField(null=True)),
+                ("object_key", models.PositiveIntegerField(null=True)),
+                ("model_name", models.CharField(max_length=128)),
+                ("action", models.CharField(max_length=1)),
+                ("changes", models.TextField()),
+                ("date_created", models.DateTimeField()),
+                ("user_id", models.IntegerField(null=True)),
+            ],
+        )
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.20 on 2021-11-29 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("dashboard", "0218_auditlogdiff")]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditlogdiff",
+            index=models.Index(
+                fields=["extracted_text_id"], name="dashboard_a_extract_0a1329_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlogdiff",
+            index=models.Index(
+                fields=["object_key"], name="dashboard_a_object__70b9ba_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.20 on 2021-12-02 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("dashboard", "0219_auditlogdiff_indexes")]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditLogArchive",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("before", models.DateTimeField()),
+                ("exported", models.PositiveIntegerField(default=0)),
+                ("deleted", models.PositiveIntegerField(default=0)),
+                ("date_created", models.DateTimeField(auto_now_add=True)),
+            ],
+        )
+    ]
@@ -44,10 +44,12 @@ from .raw_chem import RawChem
 from .taxonomy import Taxonomy
 from .taxonomy_source import TaxonomySource
 from .taxonomy_to_PUC import TaxonomyToPUC
-from .audit_log import AuditLog
+from .audit_log import AuditLog, AuditLogArchive, AuditLogDiff
 from .functional_use import FunctionalUse, FunctionalUseToRawChem
 from .functional_use_category import FunctionalUseCategory
 from .product_uber_puc import ProductUberPuc, ProductsPerPuc, CumulativeProductsPerPuc
+from .chemical_puc_rollup import ChemicalPucRollup
+from .qa_progress import QAProgress
 from .duplicate_chemicals import DuplicateChemicals
 from .data_group_curation_workflow import CurationStep, DataGroupCurationWorkflow
 from .news import News
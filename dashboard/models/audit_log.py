@@ -1,7 +1,87 @@
+import csv
+import json
+
 from django.apps import apps
 from django.conf import settings
-from django.db import connection
+from django.db import connection, transaction
 from django.db import models
+from django.db.models import Max, Min
+
+# Deletes the archived entries that have a later archived entry for the same
+# object, field and action, a range of primary keys at a time
+AUDITLOG_COMPACT_SQL = """
+    DELETE
+        old
+    FROM
+        dashboard_auditlog old
+    INNER JOIN dashboard_auditlog newer ON
+        newer.id > old.id
+        AND newer.date_created < %(before)s
+        AND newer.rawchem_id <=> old.rawchem_id
+        AND newer.object_key <=> old.object_key
+        AND newer.extracted_text_id <=> old.extracted_text_id
+        AND newer.model_name = old.model_name
+        AND newer.field_name = old.field_name
+        AND newer.action = old.action
+    WHERE
+        old.id BETWEEN %(start)s AND %(end)s
+        AND old.date_created < %(before)s
+    """
+
+
+class AuditLogManager(models.Manager):
+    def archive(self, before, file, batch_size=10000):
+        """Export the entries created before a date and compact them.
+
+        Every entry older than ``before`` that an earlier run has not exported
+        is written to the file as CSV, then only the latest of the entries
+        older than ``before`` is kept for each object, field and action. The
+        QA views still find every edited document and the chemical views the
+        date of the latest SID change, while the table stays small. Each run
+        that exports entries is recorded as an AuditLogArchive, whose cutoff
+        the next run exports from, so the archives do not overlap.
+
+        Arguments:
+            before (datetime): entries created before this date are archived
+            file: a text file to write the CSV to
+            batch_size (optional int): the entries read or compacted per query
+                [default=10000]
+
+        Returns:
+            a tuple of the number of entries exported and deleted
+        """
+        entries = self.filter(date_created__lt=before)
+        # the entries kept by earlier runs are in their archives already
+        previous = AuditLogArchive.objects.aggregate(before=Max("before"))["before"]
+        new_entries = entries
+        if previous is not None:
+            new_entries = entries.filter(date_created__gte=previous)
+        fields = [field.attname for field in self.model._meta.concrete_fields]
+        writer = csv.writer(file)
+        writer.writerow(fields)
+        exported = 0
+        rows = new_entries.order_by("pk").values_list(*fields)
+        for row in rows.iterator(chunk_size=batch_size):
+            writer.writerow(row)
+            exported += 1
+        bounds = entries.aggregate(start=Min("pk"), end=Max("pk"))
+        deleted = 0
+        if exported:
+            with connection.cursor() as cursor:
+                for start in range(bounds["start"], bounds["end"] + 1, batch_size):
+                    cursor.execute(
+                        AUDITLOG_COMPACT_SQL,
+                        {
+                            "before": before,
+                            "start": start,
+                            "end": start + batch_size - 1,
+                        },
+                    )
+                    deleted += cursor.rowcount
+            AuditLogArchive.objects.create(
+                before=before, exported=exported, deleted=deleted
+            )
+        return exported, deleted
 
 
 class AuditLog(models.Model):
@@ -25,6 +105,8 @@ class AuditLog(models.Model):
         settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.SET_NULL
     )
 
+    objects = AuditLogManager()
+
     def __str__(self):
         return f"{self.old_value} -> {self.new_value}, {self.action} on {self.model_name}|{self.field_name}"
 
@@ -74,6 +156,11 @@ class AuditLog(models.Model):
 
         # Build SQL trigger string by model and auditable fields
         for model in auditlog_fields:
+            if model in settings.AUDITLOG_DIFF_MODELS:
+                trigger_sql += AuditLogDiff.get_trigger_sql(
+                    model, auditlog_fields[model]
+                )
+                continue
             table_name = app_label + "_" + model
             id = apps.get_model(app_label, model_name=model)._meta.pk.attname
             rawchem_audit_field = cls.get_extracted_text_audit_field(model, False)
@@ -353,3 +440,201 @@ class AuditLog(models.Model):
             self.old_value,
             self.new_value,
         )
+
+
+AUDITLOG_COLUMNS = (
+    "extracted_text_id",
+    "rawchem_id",
+    "object_key",
+    "model_name",
+    "field_name",
+    "date_created",
+    "old_value",
+    "new_value",
+    "action",
+    "user_id",
+)
+
+
+class AuditLogDiffManager(models.Manager):
+    def expand(self, batch_size=1000, skip_locked=False, **filters):
+        """Move the recorded diffs into the audit log, a batch at a time.
+
+        Each changed field of a diff becomes an AuditLog row, as the column
+        triggers would have written it. The rows are inserted with one statement
+        per batch and keep the date the change was recorded. The SIDs of curated
+        raw chemicals are looked up once per batch.
+
+        Arguments:
+            batch_size (optional int): the diffs moved per transaction [default=1000]
+            skip_locked (optional bool): skip the diffs another expansion is
+                moving instead of waiting for it [default=False]
+            **filters: only move the matching diffs, e.g. the diffs of one
+                object before its audit log is read
+
+        Returns:
+            the number of diffs moved
+        """
+        diffs_qs = self.filter(**filters).select_for_update(skip_locked=skip_locked)
+        count = 0
+        while True:
+            with transaction.atomic():
+                diffs = list(diffs_qs.order_by("pk")[:batch_size])
+                if not diffs:
+                    return count
+                rows = self._get_rows(diffs)
+                if rows:
+                    placeholders = ", ".join(["%s"] * len(AUDITLOG_COLUMNS))
+                    with connection.cursor() as cursor:
+                        cursor.executemany(
+                            f"INSERT INTO {AuditLog._meta.db_table} "
+                            f"({', '.join(AUDITLOG_COLUMNS)}) VALUES ({placeholders})",
+                            rows,
+                        )
+                self.filter(pk__in=[diff.pk for diff in diffs]).delete()
+            count += len(diffs)
+
+    def _get_rows(self, diffs):
+        changes = [(diff, diff.get_changes()) for diff in diffs]
+        dsstox_ids = {
+            value
+            for diff, fields in changes
+            if diff.model_name == "rawchem" and "dsstox_id" in fields
+            for value in fields["dsstox_id"]
+            if value is not None
+        }
+        DSSToxLookup = apps.get_model("dashboard", "DSSToxLookup")
+        sids = dict(
+            DSSToxLookup.objects.filter(pk__in=dsstox_ids).values_list("pk", "sid")
+        )
+        rows = []
+        for diff, fields in changes:
+            for field, (old_value, new_value) in fields.items():
+                if diff.model_name == "rawchem" and field == "dsstox_id":
+                    # the audit log shows the SID of a curated raw chemical
+                    field = "sid"
+                    old_value = sids.get(old_value and int(old_value))
+                    new_value = sids.get(new_value and int(new_value))
+                rows.append(
+                    (
+                        diff.extracted_text_id,
+                        diff.object_key,
+                        diff.object_key,
+                        diff.model_name,
+                        field,
+                        diff.date_created,
+                        old_value,
+                        new_value,
+                        diff.action,
+                        diff.user_id,
+                    )
+                )
+        return rows
+
+
+class AuditLogDiff(models.Model):
+    """
+    The changes made to a row of an audited table, recorded as a single JSON
+    object of ``{field: [old value, new value]}`` by the triggers of the models
+    listed in ``settings.AUDITLOG_DIFF_MODELS``. Their triggers insert one row
+    per changed row instead of one AuditLog row per changed field, each with
+    its own subselects, which keeps bulk updates of those tables cheap. The
+    diffs are expanded into AuditLog rows by ``AuditLogDiff.objects.expand``,
+    periodically and for a single object before its audit log is read.
+    """
+
+    extracted_text_id = models.PositiveIntegerField(null=True)
+    object_key = models.PositiveIntegerField(null=True)
+    model_name = models.CharField(max_length=128)
+    action = models.CharField(max_length=1)
+    changes = models.TextField()
+    date_created = models.DateTimeField()
+    user_id = models.IntegerField(null=True)
+
+    objects = AuditLogDiffManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["extracted_text_id"]),
+            models.Index(fields=["object_key"]),
+        ]
+
+    def __str__(self):
+        return f"{self.action} on {self.model_name}: {self.changes}"
+
+    def get_changes(self):
+        """The changed fields, with their old and new values as text."""
+        return {
+            field: [None if v is None else str(v) for v in values]
+            for field, values in json.loads(
+                self.changes, parse_float=str, parse_int=str
+            ).items()
+        }
+
+    @classmethod
+    def get_trigger_sql(cls, model, fields):
+        """Build the SQL of the triggers that record the diffs of a model's rows.
+
+        Arguments:
+            model (str): the lowercase model name
+            fields (list): the names of the audited fields
+
+        Returns:
+            string -- a valid SQL string defining the update, insert and delete
+            triggers
+        """
+        table_name = "dashboard_" + model
+        id = apps.get_model("dashboard", model_name=model)._meta.pk.attname
+        actions = [
+            ("update", "U", "NEW", "IFNULL(NEW.{0}, '') <> IFNULL(OLD.{0}, '')"),
+            ("insert", "I", "NEW", "IFNULL(NEW.{0}, '') <> ''"),
+            ("delete", "D", "OLD", "IFNULL(OLD.{0}, '') <> ''"),
+        ]
+        trigger_sql = ""
+        for event, action, row, condition in actions:
+            extracted_text_field = AuditLog.get_extracted_text_audit_field(
+                model, action == "I"
+            )
+            trigger_sql += f"""
+                CREATE TRIGGER  {table_name}_{event}_auditlog_trigger
+                AFTER {event.upper()} ON {table_name}
+                FOR EACH ROW
+                BEGIN
+                    DECLARE changes JSON DEFAULT JSON_OBJECT();
+            """
+            for field in fields:
+                old_value = "null" if action == "I" else f"OLD.{field}"
+                new_value = "null" if action == "D" else f"NEW.{field}"
+                trigger_sql += f"""
+                    IF {condition.format(field)} THEN
+                        SET changes = JSON_SET(changes, '$.{field}',
+                            JSON_ARRAY({old_value}, {new_value}));
+                    END IF;
+                """
+            trigger_sql += f"""
+                    IF JSON_LENGTH(changes) > 0 THEN
+                        insert into {cls._meta.db_table} (extracted_text_id,
+                            object_key, model_name, action, changes,
+                            date_created, user_id)
+                        values ({extracted_text_field}, {row}.{id}, '{model}',
+                            '{action}', changes, now(), @current_user);
+                    END IF;
+                END;
+            """
+        return trigger_sql
+
+
+class AuditLogArchive(models.Model):
+    """
+    A run of ``AuditLog.objects.archive`` that exported entries: the entries
+    created before ``before`` have been archived, and the next run only
+    exports the entries created since.
+    """
+
+    before = models.DateTimeField()
+    exported = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.exported} entries before {self.before:%Y-%m-%d}"
@@ -0,0 +1,200 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+
+from .dsstox_lookup import DSSToxLookup
+from .PUC import PUC, PUCKind
+from .product_document import ProductDocument
+from .raw_chem import RawChem
+
+ROLLUP_CACHE_PREFIX = "chemical_puc_rollup"
+
+
+def get_rollup_cache_key(dsstox_id):
+    return f"{ROLLUP_CACHE_PREFIX}:{dsstox_id}"
+
+
+class ChemicalPucRollupManager(models.Manager):
+    def for_chemical(self, dsstox_id):
+        """Retrieve the rollups of a chemical, building them if necessary.
+
+        The rollups are read from the cache, then from the rollup table. A
+        chemical without rollup rows is rebuilt from the product counts. The
+        result is only cached once the surrounding transaction commits so
+        uncommitted counts are never shared with other requests.
+
+        Arguments:
+            dsstox_id (int): the DSSToxLookup primary key
+
+        Returns:
+            a list of ChemicalPucRollup objects ordered by PUC
+        """
+        key = get_rollup_cache_key(dsstox_id)
+        rollups = cache.get(key)
+        if rollups is None:
+            rollups = self._fetch(dsstox_id)
+            if not rollups:
+                self.build([dsstox_id])
+                rollups = self._fetch(dsstox_id)
+            transaction.on_commit(
+                lambda: cache.set(key, rollups, settings.PUC_ROLLUP_CACHE_TIMEOUT)
+            )
+        return rollups
+
+    def _fetch(self, dsstox_id):
+        return list(
+            self.filter(dsstox_id=dsstox_id)
+            .select_related("puc", "kind")
+            .order_by("puc__gen_cat", "puc__prod_fam", "puc__prod_type")
+        )
+
+    def build(self, dsstox_ids):
+        """Rebuild the rollup rows of the given chemicals.
+
+        The uberpuc product counts of every chemical are read with a single
+        grouped query and rolled up the PUC hierarchy in Python: a general
+        category counts the products of all of its PUCs, a product family the
+        products of its product types and a product type its own products.
+
+        Arguments:
+            dsstox_ids (iterable): DSSToxLookup primary keys
+        """
+        dsstox_ids = sorted({i for i in dsstox_ids if i is not None})
+        if not dsstox_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT chem.dsstox_id, ptp.puc_id, COUNT(ptp.product_id)
+                FROM dashboard_producttopuc ptp
+                JOIN dashboard_productdocument doc ON ptp.product_id = doc.product_id
+                JOIN dashboard_rawchem chem ON doc.document_id = chem.extracted_text_id
+                WHERE ptp.is_uber_puc = true
+                    AND chem.dsstox_id IN ({", ".join(["%s"] * len(dsstox_ids))})
+                GROUP BY chem.dsstox_id, ptp.puc_id
+                """,
+                dsstox_ids,
+            )
+            counts = cursor.fetchall()
+
+        pucs = {}
+        puc_ids = {}
+        for puc_id, kind_id, gen_cat, prod_fam, prod_type in PUC.objects.values_list(
+            "id", "kind_id", "gen_cat", "prod_fam", "prod_type"
+        ):
+            pucs[puc_id] = (kind_id, gen_cat, prod_fam, prod_type)
+            puc_ids[kind_id, gen_cat, prod_fam, prod_type] = puc_id
+
+        rollups = {}
+
+        def get_rollup(dsstox_id, puc_id, level):
+            if (dsstox_id, puc_id) not in rollups:
+                rollups[dsstox_id, puc_id] = self.model(
+                    dsstox_id=dsstox_id,
+                    puc_id=puc_id,
+                    kind_id=pucs[puc_id][0],
+                    puc_level=level,
+                    product_count=0,
+                    cumulative_product_count=0,
+                )
+            return rollups[dsstox_id, puc_id]
+
+        for dsstox_id, puc_id, product_count in counts:
+            kind_id, gen_cat, prod_fam, prod_type = pucs[puc_id]
+            ancestors = [(1, puc_ids.get((kind_id, gen_cat, "", "")))]
+            if prod_fam:
+                ancestors.append((2, puc_ids.get((kind_id, gen_cat, prod_fam, ""))))
+            if prod_type:
+                ancestors.append((3, puc_id))
+            for level, ancestor_id in ancestors:
+                if ancestor_id is not None:
+                    rollup = get_rollup(dsstox_id, ancestor_id, level)
+                    rollup.cumulative_product_count += product_count
+            if (dsstox_id, puc_id) in rollups:
+                rollups[dsstox_id, puc_id].product_count = product_count
+
+        with transaction.atomic():
+            self.filter(dsstox_id__in=dsstox_ids).delete()
+            self.bulk_create(rollups.values(), ignore_conflicts=True)
+
+    def invalidate(self, dsstox_ids=None):
+        """Drop the rollups of the given chemicals, or of every chemical.
+
+        The rows are deleted right away and again when the transaction commits,
+        in case another request rebuilt them from the uncommitted state.
+
+        Arguments:
+            dsstox_ids (optional iterable): DSSToxLookup primary keys
+        """
+        if dsstox_ids is not None:
+            dsstox_ids = {i for i in dsstox_ids if i is not None}
+            if not dsstox_ids:
+                return
+
+        def drop():
+            if dsstox_ids is None:
+                self.all().delete()
+                cache.delete_pattern(f"{ROLLUP_CACHE_PREFIX}:*")
+            else:
+                self.filter(dsstox_id__in=dsstox_ids).delete()
+                cache.delete_many([get_rollup_cache_key(i) for i in dsstox_ids])
+
+        drop()
+        if connection.in_atomic_block:
+            transaction.on_commit(drop)
+
+    def invalidate_documents(self, document_ids):
+        """Drop the rollups of the chemicals extracted from the documents."""
+        self.invalidate(
+            RawChem.objects.filter(extracted_text_id__in=document_ids)
+            .exclude(dsstox_id=None)
+            .values_list("dsstox_id", flat=True)
+            .distinct()
+        )
+
+    def invalidate_products(self, product_ids):
+        """Drop the rollups of the chemicals in the products' documents."""
+        self.invalidate_documents(
+            ProductDocument.objects.filter(product_id__in=product_ids).values(
+                "document_id"
+            )
+        )
+
+
+class ChemicalPucRollup(models.Model):
+    """
+    A materialized rollup of the products containing a chemical, counted for
+    each PUC the products are (cumulatively) assigned to. The rows mirror the
+    chemical detail PUC trees and are rebuilt on demand after the chemical's
+    curation, product documents or uberpucs change.
+    """
+
+    dsstox = models.ForeignKey(
+        DSSToxLookup, on_delete=models.CASCADE, related_name="puc_rollups"
+    )
+    puc = models.ForeignKey(PUC, on_delete=models.CASCADE, related_name="+")
+    kind = models.ForeignKey(PUCKind, on_delete=models.CASCADE, related_name="+")
+    puc_level = models.PositiveSmallIntegerField()
+    product_count = models.PositiveIntegerField(default=0)
+    cumulative_product_count = models.PositiveIntegerField(default=0)
+
+    objects = ChemicalPucRollupManager()
+
+    class Meta:
+        unique_together = ("dsstox", "puc")
+        indexes = [models.Index(fields=["dsstox", "kind"])]
+
+    def __str__(self):
+        return f"{self.dsstox_id} --> {self.puc_id}"
+
+    @property
+    def gen_cat(self):
+        return self.puc.gen_cat
+
+    @property
+    def prod_fam(self):
+        return self.puc.prod_fam
+
+    @property
+    def prod_type(self):
+        return self.puc.prod_type
@@ -1,4 +1,6 @@
 from django.db import models
+
+from dashboard.utils import sample_pks
 from .extracted_text import ExtractedText
 from .extracted_list_presence import ExtractedListPresence, ExtractedListPresenceTag
 
@@ -54,16 +56,11 @@ class ExtractedCPCat(ExtractedText):
         flagged = elps.filter(extractedlistpresence__qa_flag=True).count()
         # if less than 30 records not flagged for QA, count of ALL may be < 30
         if flagged < QA_RECORDS_PER_DOCUMENT and flagged < elps.count():
-            x = QA_RECORDS_PER_DOCUMENT - flagged
-            unflagged = list(
-                elps.filter(extractedlistpresence__qa_flag=False)
-                .order_by("?")  # this makes the selection random
-                .values_list("pk", flat=True)
+            unflagged = ExtractedListPresence.objects.filter(
+                extracted_text=self, qa_flag=False
             )
-            lps = ExtractedListPresence.objects.filter(pk__in=unflagged[:x])
-            for lp in lps:
-                lp.qa_flag = True
-                lp.save()
+            pks = sample_pks(unflagged, QA_RECORDS_PER_DOCUMENT - flagged, seed=self.pk)
+            ExtractedListPresence.objects.filter(pk__in=pks).update(qa_flag=True)
         return self.rawchem.select_subclasses().filter(
             extractedlistpresence__qa_flag=True
         )
@@ -1,8 +1,11 @@
+from model_utils import FieldTracker
 from model_utils.managers import InheritanceManager
 
 from django.db import models
 from django.urls import reverse
 
+from dashboard.utils import sample_pks
+
 from .extracted_functional_use import ExtractedFunctionalUse
 from .common_info import CommonInfo
 
@@ -89,6 +92,7 @@ class ExtractedText(CommonInfo):
         related_name="cleaned_documents",
     )
     objects = InheritanceManager()
+    tracker = FieldTracker(fields=["extraction_script_id"])
 
     def __str__(self):
         return str(self.data_document)
@@ -262,16 +266,12 @@ class ExtractedText(CommonInfo):
             flagged = chems.filter(qa_flag=True).count()
             # if less than 100 records not flagged for QA, count of ALL may be < 100
             if flagged < QA_RECORDS_PER_DOCUMENT and flagged < chems.count():
-                x = QA_RECORDS_PER_DOCUMENT - flagged
-                unflagged = list(
-                    chems.filter(qa_flag=False)
-                    .order_by("?")  # this makes the selection random
-                    .values_list("pk", flat=True)
+                pks = sample_pks(
+                    chems.filter(qa_flag=False),
+                    QA_RECORDS_PER_DOCUMENT - flagged,
+                    seed=self.pk,
                 )
-                fus = ExtractedFunctionalUse.objects.filter(pk__in=unflagged[:x])
-                for fu in fus:
-                    fu.qa_flag = True
-                    fu.save()
+                ExtractedFunctionalUse.objects.filter(pk__in=pks).update(qa_flag=True)
             return ExtractedFunctionalUse.objects.filter(
                 extracted_text=self, qa_flag=True
             )
@@ -282,24 +282,28 @@ class ExtractedText(CommonInfo):
 def get_next_or_prev(models, item, direction):
     """
     Returns the next or previous item of
-    a query-set for 'item'.
+    a query-set for 'item', in primary key order.
+    After the last item it wraps around to the first.
 
     'models' is a query-set containing all
     items of which 'item' is a part of.
 
     direction is 'next' or 'prev'
 
+    The neighbor is found with a keyset query on the primary key
+    (WHERE pk >= item.pk ORDER BY pk LIMIT 2), so it costs one indexed
+    query whatever the size of the query-set. False is returned if 'item'
+    is not part of the query-set.
     """
-    getit = False
     if direction == "prev":
-        models = models.reverse()
-    for m in models:
-        if getit:
-            return m
-        if item == m:
-            getit = True
-    if getit:
-        # This would happen when the last
-        # item made getit True
-        return models[0]
-    return False
+        models = models.order_by("-pk")
+        neighbors = list(models.filter(pk__lte=item.pk)[:2])
+    else:
+        models = models.order_by("pk")
+        neighbors = list(models.filter(pk__gte=item.pk)[:2])
+    if not neighbors or neighbors[0] != item:
+        return False
+    if len(neighbors) == 2:
+        return neighbors[1]
+    # This would happen when 'item' is the last item
+    return models.first()
@@ -1,9 +1,12 @@
+import uuid
+
 from taggit.managers import TaggableManager
 
 from django.apps import apps
 from django.db import models
 from django.urls import reverse
-from django.db.models import Max, Prefetch
+from django.db.models import CharField, F, Max, Prefetch, Value
+from django.db.models.functions import Cast, Concat
 from django.core.exceptions import ValidationError
 
 from factotum.environment import env
@@ -11,7 +14,12 @@ from .common_info import CommonInfo
 from .extracted_text import ExtractedText
 from .data_source import DataSource
 from .source_category import SourceCategory
-from dashboard.utils import uuid_file, get_model_next_pk
+from dashboard.utils import (
+    uuid_file,
+    get_model_next_pk,
+    inheritance_bulk_create,
+    populate_user_fields,
+)
 
 
 def validate_product_image_size(image):
@@ -35,6 +43,39 @@ class ProductQuerySet(models.QuerySet):
             )
         )
 
+    def bulk_create_products(self, products):
+        """Insert many Products (or many DuplicateProducts) at once.
+
+        Their images are stored first, then the products are inserted with one
+        statement per table. Products without a UPC get a "stub_<id>" UPC, like
+        Product.save gives them, with a single UPDATE once their ids are known.
+        Signals are not sent, so the user fields are set here instead.
+
+        Arguments:
+            products: a list of unsaved instances of the same model
+
+        Returns:
+            the products, with their primary keys set
+        """
+        if not products:
+            return products
+        for product in products:
+            if product.image and not product.image._committed:
+                product.image.save(product.image.name, product.image.file, save=False)
+        stubs = [product for product in products if not product.upc]
+        for product in stubs:
+            # a unique placeholder until the id is known
+            product.upc = "stub_%s" % uuid.uuid4().hex
+        populate_user_fields(products, created=True)
+        inheritance_bulk_create(products)
+        if stubs:
+            Product.objects.filter(pk__in=[product.pk for product in stubs]).update(
+                upc=Concat(Value("stub_"), Cast(F("id"), CharField()))
+            )
+            for product in stubs:
+                product.upc = "stub_%d" % product.pk
+        return products
+
 
 class Product(CommonInfo):
     """
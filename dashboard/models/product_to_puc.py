@@ -1,6 +1,10 @@
+import threading
+from contextlib import contextmanager
+
 from django.db import models
 from django.db import connection
 
+from dashboard.utils import populate_user_fields
 from .PUC import PUC
 from .common_info import CommonInfo
 from .product import Product
@@ -8,6 +12,115 @@ from django.utils.translation import ugettext_lazy as _
 
 DEFAULT_CLASSIFICATION_METHOD_CODE = "MA"
 
+# Each ProductToPUC is the uber PUC of its product if no other ProductToPUC of the
+# product has a classification method with a lower rank
+UBERPUC_UPDATE_SQL = """
+    UPDATE
+        dashboard_producttopuc ptp
+    INNER JOIN
+        dashboard_producttopucclassificationmethod cm ON cm.id = ptp.classification_method_id
+    INNER JOIN (
+        SELECT
+            ptp.product_id AS product_id,
+            MIN(cm.rank) AS top_rank
+        FROM
+            dashboard_producttopuc ptp
+        INNER JOIN dashboard_producttopucclassificationmethod cm ON cm.id = ptp.classification_method_id
+        WHERE ptp.product_id IN ({product_ids})
+        GROUP BY ptp.product_id
+    ) ptp_rank ON ptp.product_id = ptp_rank.product_id
+    SET ptp.is_uber_puc = (cm.rank = ptp_rank.top_rank)
+    WHERE ptp.product_id IN ({product_ids})
+    """
+
+# The products collected by the deferred_uber_pucs blocks of each thread
+_deferred = threading.local()
+
+
+class ProductToPUCManager(models.Manager):
+    def recompute_uber_pucs(self, product_ids, batch_size=1000):
+        """Set is_uber_puc on all the ProductToPUCs of the products.
+
+        Each batch of products is updated with a single grouped UPDATE.
+
+        Arguments:
+            product_ids: an iterable of Product primary keys
+            batch_size (optional int): the products updated per query [default=1000]
+        """
+        product_ids = sorted({int(pk) for pk in product_ids})
+        with connection.cursor() as cursor:
+            for i in range(0, len(product_ids), batch_size):
+                batch = product_ids[i : i + batch_size]
+                placeholders = ", ".join(["%s"] * len(batch))
+                cursor.execute(
+                    UBERPUC_UPDATE_SQL.format(product_ids=placeholders), batch * 2
+                )
+
+    @contextmanager
+    def deferred_uber_pucs(self):
+        """Recompute the uber PUCs of the products changed in the block at its end.
+
+        Within the block, the ProductToPUC signals collect the products whose
+        ProductToPUCs are saved or deleted instead of updating them one at a
+        time. Their uber PUCs are recomputed together when the block exits
+        without an error, within the same transaction, so they are current for
+        the rest of it. Blocks can be nested.
+
+        Yields:
+            the set of collected product ids
+        """
+        stack = _deferred.__dict__.setdefault("stack", [])
+        product_ids = set()
+        stack.append(product_ids)
+        try:
+            yield product_ids
+        finally:
+            stack.pop()
+        self.recompute_uber_pucs(product_ids)
+
+    def schedule_uber_pucs(self, product_ids):
+        """Recompute the uber PUCs of the products, at the end of the innermost
+        deferred_uber_pucs block if there is one or right away otherwise."""
+        stack = getattr(_deferred, "stack", None)
+        if stack:
+            stack[-1].update(product_ids)
+        else:
+            self.recompute_uber_pucs(product_ids)
+
+    def assign(self, product_ids, puc, batch_size=1000, **kwargs):
+        """Assign a PUC to many products at once.
+
+        The ProductToPUCs are inserted with one statement per batch, skipping
+        the products that already have the PUC with the classification method.
+        The uber PUCs of the products are then updated together. Like other bulk
+        writes, this does not send the ProductToPUC signals, so the user fields
+        are set and the PUC rollups and site statistics are invalidated here.
+
+        Arguments:
+            product_ids: an iterable of Product primary keys
+            puc: the PUC to assign
+            batch_size (optional int): the rows inserted per query [default=1000]
+            **kwargs: other ProductToPUC fields, e.g. classification_method_id
+
+        Returns:
+            a list of the product ids
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return product_ids
+        product_to_pucs = [
+            self.model(product_id=pk, puc=puc, **kwargs) for pk in product_ids
+        ]
+        populate_user_fields(product_to_pucs, created=True)
+        self.bulk_create(product_to_pucs, batch_size=batch_size, ignore_conflicts=True)
+        self.recompute_uber_pucs(product_ids, batch_size=batch_size)
+        from dashboard.models import ChemicalPucRollup
+        from dashboard.stats import invalidate_site_stats
+
+        ChemicalPucRollup.objects.invalidate_products(product_ids)
+        invalidate_site_stats()
+        return product_ids
+
 
 class ProductToPUC(CommonInfo):
     """
@@ -38,6 +151,8 @@ class ProductToPUC(CommonInfo):
     )
     is_uber_puc = models.BooleanField(default=False, db_index=True)
 
+    objects = ProductToPUCManager()
+
     def __str__(self):
         return f"{self.product} --> {self.puc}"
 
@@ -47,27 +162,7 @@ class ProductToPUC(CommonInfo):
         that share this one's product_id. 
         """
 
-        uberpuc_update_sql = """
-            UPDATE
-                dashboard_producttopuc ptp
-            LEFT JOIN
-                dashboard_producttopucclassificationmethod cm ON cm.id = ptp.classification_method_id
-            LEFT JOIN (
-                SELECT 
-                    ptp.product_id AS product_id,
-                    ptp.puc_id AS puc_id,
-                    ptp.classification_method_id AS classification_method_id,
-                    cm.rank AS rank
-                FROM
-                    dashboard_producttopuc ptp
-                LEFT JOIN dashboard_producttopucclassificationmethod cm ON cm.id = ptp.classification_method_id
-            ) ptp_rank ON ptp.product_id = ptp_rank.product_id AND cm.rank > ptp_rank.rank
-            SET is_uber_puc = ptp_rank.rank IS NULL
-            """
-        with connection.cursor() as cursor:
-            cursor.execute(
-                uberpuc_update_sql + f" WHERE ptp.product_id = {self.product_id}"
-            )
+        ProductToPUC.objects.recompute_uber_pucs([self.product_id])
 
     class Meta:
         unique_together = ("product", "puc", "classification_method")
@@ -0,0 +1,126 @@
+from django.db import models, transaction
+from django.db.models import Count, Q
+
+from .data_document import DataDocument
+from .extracted_text import ExtractedText
+
+
+class QAProgressManager(models.Manager):
+    def ensure_built(self):
+        """Build the summary rows if the table is empty."""
+        if not self.exists():
+            self.build()
+
+    def build(self):
+        """Recount the summary rows of every extraction script and data group.
+
+        Concurrent builds (e.g. two first reads of an empty table) may insert
+        the same rows, so the rows of the other build are kept.
+        """
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                self._count(ExtractedText.objects.all()), ignore_conflicts=True
+            )
+
+    def refresh(self, extraction_script_ids, data_group_ids=None):
+        """Recount the summary rows of the given scripts in the given data groups.
+
+        Nothing is done until the table has been built, so the first read counts
+        every row at once.
+
+        Arguments:
+            extraction_script_ids (iterable): Script primary keys
+            data_group_ids (optional iterable or QuerySet): DataGroup primary
+                keys; every data group of the scripts if omitted
+        """
+        if self.exists():
+            self._refresh(extraction_script_ids, data_group_ids)
+
+    def refresh_documents(self, document_ids, extraction_script_ids=()):
+        """Recount the summary rows of the documents' scripts and data groups.
+
+        Arguments:
+            document_ids (iterable or QuerySet): DataDocument primary keys
+            extraction_script_ids (optional iterable): other Script primary keys to
+                recount, e.g. the scripts the documents were extracted with before
+        """
+        if not self.exists():
+            return
+        extraction_script_ids = set(extraction_script_ids)
+        extraction_script_ids.update(
+            ExtractedText.objects.filter(data_document_id__in=document_ids)
+            .values_list("extraction_script_id", flat=True)
+            .distinct()
+        )
+        self._refresh(
+            extraction_script_ids,
+            DataDocument.objects.filter(pk__in=document_ids)
+            .values_list("data_group_id", flat=True)
+            .distinct(),
+        )
+
+    def _refresh(self, extraction_script_ids, data_group_ids):
+        extraction_script_ids = {i for i in extraction_script_ids if i is not None}
+        if not extraction_script_ids:
+            return
+        texts = ExtractedText.objects.filter(
+            extraction_script_id__in=extraction_script_ids
+        )
+        rows = self.filter(extraction_script_id__in=extraction_script_ids)
+        if data_group_ids is not None:
+            data_group_ids = list(data_group_ids)
+            texts = texts.filter(data_document__data_group_id__in=data_group_ids)
+            rows = rows.filter(data_group_id__in=data_group_ids)
+        with transaction.atomic():
+            rows.delete()
+            self.bulk_create(self._count(texts), ignore_conflicts=True)
+
+    def _count(self, texts):
+        counts = (
+            texts.order_by()
+            .values("extraction_script_id", "data_document__data_group_id")
+            .annotate(
+                extractedtext_count=Count("pk"),
+                qa_group_count=Count("qa_group"),
+                qa_checked_count=Count("pk", filter=Q(qa_checked=True)),
+            )
+        )
+        return [
+            self.model(
+                extraction_script_id=row["extraction_script_id"],
+                data_group_id=row["data_document__data_group_id"],
+                extractedtext_count=row["extractedtext_count"],
+                qa_group_count=row["qa_group_count"],
+                qa_checked_count=row["qa_checked_count"],
+            )
+            for row in counts
+        ]
+
+
+class QAProgress(models.Model):
+    """
+    A materialized count of the extracted documents of an extraction script in
+    a data group: all of them, the ones in a QA group and the approved ones.
+    The QA index pages sum these rows instead of counting the extracted texts.
+    The rows of a script and data group are recounted whenever one of their
+    extracted texts is saved or deleted.
+    """
+
+    extraction_script = models.ForeignKey(
+        "Script", on_delete=models.CASCADE, related_name="qa_progress"
+    )
+    data_group = models.ForeignKey(
+        "DataGroup", on_delete=models.CASCADE, related_name="qa_progress"
+    )
+    extractedtext_count = models.PositiveIntegerField(default=0)
+    qa_group_count = models.PositiveIntegerField(default=0)
+    qa_checked_count = models.PositiveIntegerField(default=0)
+
+    objects = QAProgressManager()
+
+    class Meta:
+        unique_together = ("extraction_script", "data_group")
+
+    def __str__(self):
+        return f"{self.extraction_script_id} --> {self.data_group_id}"
@@ -73,6 +73,7 @@ class RawChem(CommonInfo):
     class Meta:
         indexes = [
             models.Index(fields=["extracted_text", "dsstox", "component"]),
+            models.Index(fields=["updated_at"]),
             # Manually added indexes in dashboard 0190.  Django does not support MySQL prefix index
             # https://dev.mysql.com/doc/refman/8.0/en/column-indexes.html#column-indexes-prefix
             #
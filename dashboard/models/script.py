@@ -1,10 +1,14 @@
+import math
+
 from django.db import models
 from django.urls import reverse
 from django.core.validators import URLValidator, MaxValueValidator, MinValueValidator
 from django.apps import apps
+from dashboard.utils import sample_pks
 from .common_info import CommonInfo
 from .data_document import DataDocument
 from .extracted_text import ExtractedText
+from .qa_progress import QAProgress
 from .qa_notes import QASummaryNote
 
 
@@ -123,22 +127,24 @@ class Script(CommonInfo, QASummaryNote):
                 extraction_script=self, qa_checked=False
             )
 
+        qa_group_field = "cleaning_qa_group" if self.script_type == "DC" else "qa_group"
+        count = texts.count()
         # If fewer than 100 related records, they make up the entire QA Group
-        if len(texts) >= 100:
-            import math
-
-            # Otherwise sample X% of them
-            random_sample = math.ceil(len(texts) * QA_COMPLETE_PERCENTAGE)
-            pks = list(
-                texts.values_list("pk", flat=True).order_by("?")[:random_sample]
-            )  # ? used for random selection
-            texts = ExtractedText.objects.filter(pk__in=pks)
-
-        if texts:
-            if self.script_type == "DC":
-                texts.update(cleaning_qa_group=qa_group)
-            else:
-                texts.update(qa_group=qa_group)
+        if count < 100:
+            texts.update(**{qa_group_field: qa_group})
+        else:
+            # Otherwise sample X% of them, seeded by the QA Group so the
+            # sample can be drawn again
+            pks = sample_pks(
+                texts, math.ceil(count * QA_COMPLETE_PERCENTAGE), seed=qa_group.pk
+            )
+            for i in range(0, len(pks), 1000):
+                ExtractedText.objects.filter(pk__in=pks[i : i + 1000]).update(
+                    **{qa_group_field: qa_group}
+                )
+        # update() skips the signals that recount the QA progress
+        if self.script_type != "DC":
+            QAProgress.objects.refresh([self.pk])
 
         return qa_group
 
@@ -13,12 +13,21 @@ from dashboard.models import (
     ExtractedComposition,
     ExtractedListPresence,
     ExtractedFunctionalUse,
+    ExtractedText,
+    ExtractedCPCat,
+    ExtractedHHDoc,
+    ExtractedHPDoc,
+    ExtractedLMDoc,
     DataDocument,
     DocumentTypeGroupTypeCompatibilty,
     Product,
     ProductDocument,
     CommonInfo,
+    ChemicalPucRollup,
+    PUC,
+    QAProgress,
 )
+from dashboard.stats import invalidate_site_stats
 
 
 # When dissociating a product from a PUC, delete it's (PUC-dependent) tags
@@ -29,16 +38,17 @@ def delete_product_puc_tags(sender, **kwargs):
 
 
 # When dissociating a product from a PUC, update the uberpuc for that product ID
+# (at the end of a ProductToPUC.objects.deferred_uber_pucs() block, if in one)
 @receiver(post_delete, sender=ProductToPUC)
 def update_uber_puc_on_delete(sender, **kwargs):
     instance = kwargs["instance"]
-    instance.update_uber_puc()
+    ProductToPUC.objects.schedule_uber_pucs([instance.product_id])
 
 
 @receiver(post_save, sender=ProductToPUC)
 def update_uber_puc_on_save(sender, **kwargs):
     instance = kwargs["instance"]
-    instance.update_uber_puc()
+    ProductToPUC.objects.schedule_uber_pucs([instance.product_id])
 
 
 # When dissociating a puc from a tag, also disocciate any puc-related products from that tag
@@ -66,6 +76,106 @@ def uncurate(sender, **kwargs):
         instance.rid = ""
 
 
+# Drop the PUC rollups of chemicals whose curation, documents or uberpucs change.
+# The rollups are rebuilt the next time the chemical is viewed.
+@receiver(pre_save, sender=RawChem)
+@receiver(pre_save, sender=ExtractedComposition)
+@receiver(pre_save, sender=ExtractedListPresence)
+@receiver(pre_save, sender=ExtractedFunctionalUse)
+def invalidate_puc_rollups_on_curation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance._state.adding:
+        dsstox_ids = {instance.dsstox_id}
+    elif instance.tracker.has_changed("dsstox_id"):
+        dsstox_ids = {instance.tracker.previous("dsstox_id"), instance.dsstox_id}
+    else:
+        return
+    ChemicalPucRollup.objects.invalidate(dsstox_ids)
+
+
+@receiver(post_delete, sender=RawChem)
+@receiver(post_delete, sender=ExtractedComposition)
+@receiver(post_delete, sender=ExtractedListPresence)
+@receiver(post_delete, sender=ExtractedFunctionalUse)
+def invalidate_puc_rollups_on_chemical_delete(sender, instance, **kwargs):
+    ChemicalPucRollup.objects.invalidate([instance.dsstox_id])
+
+
+@receiver(post_save, sender=ProductDocument)
+@receiver(post_delete, sender=ProductDocument)
+def invalidate_puc_rollups_on_product_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ChemicalPucRollup.objects.invalidate_documents([instance.document_id])
+
+
+@receiver(post_save, sender=ProductToPUC)
+@receiver(post_delete, sender=ProductToPUC)
+def invalidate_puc_rollups_on_product_puc(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ChemicalPucRollup.objects.invalidate_products([instance.product_id])
+
+
+@receiver(post_save, sender=PUC)
+@receiver(post_delete, sender=PUC)
+def invalidate_puc_rollups_on_puc(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ChemicalPucRollup.objects.invalidate()
+
+
+# Drop the cached site statistics when the counted rows are added, deleted or
+# curated, if SITE_STATS_INVALIDATE_ON_SAVE is set. Bulk writes skip these and
+# invalidate the statistics themselves.
+@receiver(post_save, sender=DataDocument)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductToPUC)
+def invalidate_site_stats_on_create(sender, created=False, **kwargs):
+    if created:
+        invalidate_site_stats()
+
+
+@receiver(pre_save, sender=RawChem)
+@receiver(pre_save, sender=ExtractedComposition)
+@receiver(pre_save, sender=ExtractedListPresence)
+@receiver(pre_save, sender=ExtractedFunctionalUse)
+def invalidate_site_stats_on_curation(sender, instance, **kwargs):
+    if instance._state.adding or instance.tracker.has_changed("dsstox_id"):
+        invalidate_site_stats()
+
+
+@receiver(post_delete, sender=DataDocument)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductToPUC)
+@receiver(post_delete, sender=RawChem)
+@receiver(post_delete, sender=ExtractedComposition)
+@receiver(post_delete, sender=ExtractedListPresence)
+@receiver(post_delete, sender=ExtractedFunctionalUse)
+def invalidate_site_stats_on_delete(sender, **kwargs):
+    invalidate_site_stats()
+
+
+# Recount the QA progress of the extraction script and data group of a document
+@receiver(post_save, sender=ExtractedText)
+@receiver(post_save, sender=ExtractedCPCat)
+@receiver(post_save, sender=ExtractedHHDoc)
+@receiver(post_save, sender=ExtractedHPDoc)
+@receiver(post_save, sender=ExtractedLMDoc)
+def refresh_qa_progress_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    extraction_script_ids = []
+    if instance.tracker.has_changed("extraction_script_id"):
+        extraction_script_ids.append(instance.tracker.previous("extraction_script_id"))
+    QAProgress.objects.refresh_documents([instance.pk], extraction_script_ids)
+
+
+@receiver(post_delete, sender=ExtractedText)
+def refresh_qa_progress_on_delete(sender, instance, **kwargs):
+    QAProgress.objects.refresh_documents(
+        [instance.data_document_id], [instance.extraction_script_id]
+    )
+
+
 @receiver(post_delete, sender=DocumentTypeGroupTypeCompatibilty)
 def rm_invalid_doctypes(sender, **kwargs):
     """When a DocumentTypeGroupTypeCompatibilty is dropped, the newly invalid DocumentType
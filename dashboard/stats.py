@@ -0,0 +1,167 @@
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, DateField, DateTimeField, Q
+from django.db.models.functions import Trunc
+from django.utils.timezone import now
+
+from dashboard.models import DataDocument, GroupType, Product, ProductToPUC, RawChem
+
+SITE_STATS_CACHE_KEY = "site_stats"
+SITE_STATS_LOCK_KEY = "site_stats:lock"
+# the seconds a lock on counting the site statistics is held at most
+SITE_STATS_LOCK_TIMEOUT = 60 * 10
+
+
+def get_counts():
+    stats = {}
+    stats["datadocument_count"] = DataDocument.objects.count()
+    stats["product_count"] = Product.objects.count()
+    stats["chemical_count"] = RawChem.objects.count()
+    stats["product_with_puc_count"] = (
+        ProductToPUC.objects.values("product_id").distinct().count()
+    )
+    stats["curated_chemical_count"] = RawChem.objects.filter(
+        dsstox__isnull=False
+    ).count()
+    stats["dsstox_sid_count"] = RawChem.objects.values("dsstox__sid").distinct().count()
+    return stats
+
+
+def get_grouptype_counts():
+    """Count the documents, raw chemicals and curated chemicals of each GroupType.
+
+    Returns:
+        a list of (title, documentcount, rawchemcount, curatedchemcount) tuples
+        ordered by descending document count
+    """
+    return list(
+        GroupType.objects.annotate(
+            documentcount=Count("datagroup__datadocument", distinct=True),
+            rawchemcount=Count(
+                "datagroup__datadocument__extractedtext__rawchem", distinct=True
+            ),
+            curatedchemcount=Count(
+                "datagroup__datadocument__extractedtext__rawchem",
+                distinct=True,
+                filter=Q(
+                    datagroup__datadocument__extractedtext__rawchem__dsstox_id__isnull=False
+                ),
+            ),
+        )
+        .order_by("-documentcount")
+        .values_list("title", "documentcount", "rawchemcount", "curatedchemcount")
+    )
+
+
+def get_chart_start():
+    """The first day of the month eleven months ago."""
+    today = datetime.datetime.now()
+    return datetime.datetime(today.year - 1, min(12, today.month + 1), 1)
+
+
+def datadocument_count_by_month():
+    # GROUP BY issue solved with https://stackoverflow.com/questions/8746014/django-group-by-date-day-month-year
+    chart_start_datetime = get_chart_start()
+    document_stats = list(
+        DataDocument.objects.filter(created_at__gte=chart_start_datetime)
+        .annotate(
+            upload_month=(Trunc("created_at", "month", output_field=DateTimeField()))
+        )
+        .values("upload_month")
+        .annotate(document_count=(Count("id")))
+        .values("document_count", "upload_month")
+        .order_by("upload_month")
+    )
+    if len(document_stats) < 12:
+        for i in range(0, 12):
+            chart_month = chart_start_datetime + relativedelta(months=i)
+            if (
+                i + 1 > len(document_stats)
+                or document_stats[i]["upload_month"] != chart_month
+            ):
+                document_stats.insert(
+                    i, {"document_count": "0", "upload_month": chart_month}
+                )
+    return document_stats
+
+
+def product_with_puc_count_by_month():
+    # GROUP BY issue solved with https://stackoverflow.com/questions/8746014/django-group-by-date-day-month-year
+    chart_start_datetime = get_chart_start()
+    product_stats = list(
+        ProductToPUC.objects.filter(created_at__gte=chart_start_datetime)
+        .annotate(
+            puc_assigned_month=(Trunc("created_at", "month", output_field=DateField()))
+        )
+        .values("puc_assigned_month")
+        .annotate(product_count=Count("product", distinct=True))
+        .order_by("puc_assigned_month")
+    )
+
+    if len(product_stats) < 12:
+        for i in range(0, 12):
+            chart_month = chart_start_datetime + relativedelta(months=i)
+            if (
+                i + 1 > len(product_stats)
+                or product_stats[i]["puc_assigned_month"] != chart_month
+            ):
+                product_stats.insert(
+                    i, {"product_count": "0", "puc_assigned_month": chart_month}
+                )
+    return product_stats
+
+
+def refresh_site_stats():
+    """Count the site statistics and cache the snapshot.
+
+    The snapshot holds the headline counts, the GroupType counts and the monthly
+    chart series, so every statistics view is served by the same aggregate
+    queries. It is cached for ``SITE_STATS_CACHE_TIMEOUT`` seconds and rebuilt
+    by the ``refresh_site_stats`` periodic task before it expires.
+
+    Returns:
+        the snapshot (dict)
+    """
+    stats = {
+        "generated_at": now(),
+        "counts": get_counts(),
+        "grouptypes": get_grouptype_counts(),
+        "datadocument_count_by_month": datadocument_count_by_month(),
+        "product_with_puc_count_by_month": product_with_puc_count_by_month(),
+    }
+    cache.set(SITE_STATS_CACHE_KEY, stats, settings.SITE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def get_site_stats():
+    """Retrieve the cached site statistics, counting them on a cache miss.
+
+    Concurrent misses wait on a lock while a single request counts, then read
+    the snapshot it cached.
+    """
+    stats = cache.get(SITE_STATS_CACHE_KEY)
+    if stats is None:
+        with cache.lock(SITE_STATS_LOCK_KEY, timeout=SITE_STATS_LOCK_TIMEOUT):
+            stats = cache.get(SITE_STATS_CACHE_KEY)
+            if stats is None:
+                stats = refresh_site_stats()
+    return stats
+
+
+def invalidate_site_stats():
+    """Drop the cached site statistics so the next read counts them again.
+
+    Nothing is done unless ``SITE_STATS_INVALIDATE_ON_SAVE`` is set; the
+    periodic refresh keeps the snapshot current otherwise. The snapshot is
+    dropped right away and again when the transaction commits, in case another
+    request counted the uncommitted state in between.
+    """
+    if not settings.SITE_STATS_INVALIDATE_ON_SAVE:
+        return
+    cache.delete(SITE_STATS_CACHE_KEY)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(SITE_STATS_CACHE_KEY))
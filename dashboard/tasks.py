@@ -1,15 +1,24 @@
 import logging
 import os
-import zipfile
-from zipfile import ZipFile
+from datetime import timedelta
 
+from celery import chord
 from celery.schedules import crontab
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.utils.timezone import now
-from djqscsv import write_csv
 
-from dashboard.models import ExtractedComposition
+from dashboard.exports import (
+    BULK_EXPORTS,
+    create_parts_dir,
+    get_bulk_export,
+    remove_export_parts,
+    stitch_export_parts,
+    write_export_part,
+)
+from dashboard.stats import refresh_site_stats as refresh_site_stats_cache
 from factotum.celery import app
 from factotum.settings import DOWNLOADS_ROOT
 
@@ -28,6 +37,16 @@ def setup_periodic_tasks(sender, **kwargs):
         generate_bulk_download_file.s(),
         name="generate_bulk_download_csv",
     )
+    sender.add_periodic_task(
+        crontab(*settings.SITE_STATS_SCHEDULE.split(" ")),
+        refresh_site_stats.s(),
+        name="refresh_site_stats",
+    )
+    sender.add_periodic_task(
+        crontab(*settings.AUDITLOG_DIFF_SCHEDULE.split(" ")),
+        expand_audit_log_diffs.s(),
+        name="expand_audit_log_diffs",
+    )
 
 
 @app.task
@@ -36,136 +55,193 @@ def test(args):
     logger.info(args)
 
 
+PROVISIONAL_ASSIGNMENT_MARK_KEY = "provisional_sid_assignment:high_water_mark"
+# reconsider rows saved shortly before the previous run, in case their
+# transactions had not yet committed when it read the mappings
+PROVISIONAL_ASSIGNMENT_OVERLAP = timedelta(hours=1)
+
+
 @app.task()
-def provisional_sid_assignment():
+def provisional_sid_assignment(full=False, batch_size=500):
     """Takes any 'uncurated' raw chemicals and assigns them provisional dsstox ids.
 
-    Sorts through all raw chemicals that have not been assigned a 'true chemical'
-    and assigns them the same dsstox id as other chemicals with the same name and cas"""
+    Uncurated raw chemicals are assigned the dsstox id of the other chemicals with
+    the same name and cas, as long as all of those share a single dsstox id.
+
+    The name/cas mappings are resolved with one grouped query and applied with
+    batched UPDATE ... JOIN statements. Only the name/cas pairs of raw chemicals
+    modified since the previous run are reconsidered, unless ``full`` is set or
+    no previous run was recorded. Bulk writes skip ``auto_now``, so every path
+    that curates or unlinks raw chemicals in bulk must set ``updated_at`` itself.
+
+    Arguments:
+        full (optional bool): reconsider every name/cas pair [default=False]
+        batch_size (optional int): the name/cas pairs per UPDATE [default=500]
+    """
     logger.info("Provisional curation starting")
-    RawChem = apps.get_model("dashboard", "RawChem")
+    ChemicalPucRollup = apps.get_model("dashboard", "ChemicalPucRollup")
 
-    initial_count = RawChem.objects.filter(dsstox__isnull=False).count()
     initial_time = now()
-
-    for provision_kwargs in (
-        RawChem.objects.filter(dsstox__isnull=True)
-        .values("raw_chem_name", "raw_cas")
-        .distinct()
-    ):
-        raw_chem_name = provision_kwargs.get("raw_chem_name", "")
-        raw_cas = provision_kwargs.get("raw_cas", "")
-        logger.debug(f"Provisioning Name {raw_chem_name} and CAS {raw_cas}")
-
-        provision_dsstox_id = (
-            RawChem.objects.filter(
-                raw_chem_name=raw_chem_name, raw_cas=raw_cas, dsstox__isnull=False
+    high_water_mark = None if full else cache.get(PROVISIONAL_ASSIGNMENT_MARK_KEY)
+    if high_water_mark is None:
+        changed_pairs = ""
+        params = []
+    else:
+        logger.info(f"Reconsidering chemicals modified since {high_water_mark}")
+        changed_pairs = """
+            JOIN (
+                SELECT DISTINCT raw_chem_name, raw_cas
+                FROM dashboard_rawchem
+                WHERE updated_at >= %s
+            ) changed ON changed.raw_chem_name = chem.raw_chem_name
+                     AND changed.raw_cas = chem.raw_cas
+        """
+        params = [
+            connection.ops.adapt_datetimefield_value(
+                high_water_mark - PROVISIONAL_ASSIGNMENT_OVERLAP
             )
-            .distinct()
-            .values_list("dsstox_id", flat=True)
+        ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT chem.raw_chem_name, chem.raw_cas, MIN(chem.dsstox_id)
+            FROM dashboard_rawchem chem
+            {changed_pairs}
+            GROUP BY chem.raw_chem_name, chem.raw_cas
+            HAVING COUNT(DISTINCT chem.dsstox_id) = 1
+               AND SUM(chem.dsstox_id IS NULL) > 0
+            """,
+            params,
         )
-
-        if len(provision_dsstox_id) == 1:
-            provision_dsstox_id = provision_dsstox_id.first()
-            try:
-                RawChem.objects.filter(
-                    raw_chem_name=raw_chem_name, raw_cas=raw_cas, dsstox__isnull=True
-                ).update(dsstox_id=provision_dsstox_id, provisional=True)
-            except Exception as e:
-                logger.error(
-                    f"{type(e).__name__} for {raw_chem_name} - {raw_cas}.",
-                    exc_info=True,
+        mappings = cursor.fetchall()
+
+    associations = 0
+    failed = False
+    for i in range(0, len(mappings), batch_size):
+        batch = mappings[i : i + batch_size]
+        mapping_rows = " UNION ALL ".join(
+            ["SELECT %s AS raw_chem_name, %s AS raw_cas, %s AS dsstox_id"] * len(batch)
+        )
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE dashboard_rawchem chem
+                    JOIN ({mapping_rows}) mapping
+                        ON mapping.raw_chem_name = chem.raw_chem_name
+                       AND mapping.raw_cas = chem.raw_cas
+                    SET chem.dsstox_id = mapping.dsstox_id, chem.provisional = true
+                    WHERE chem.dsstox_id IS NULL
+                    """,
+                    [value for mapping in batch for value in mapping],
                 )
+                associations += cursor.rowcount
+                # queryset updates skip the signals that drop stale rollups
+                ChemicalPucRollup.objects.invalidate(
+                    dsstox_id for _, _, dsstox_id in batch
+                )
+        except Exception as e:
+            failed = True
+            logger.error(
+                f"{type(e).__name__} for name/cas pairs {i} to {i + len(batch)}.",
+                exc_info=True,
+            )
 
-    final_count = RawChem.objects.filter(dsstox__isnull=False).count()
-
+    # failed pairs keep the previous mark so the next run retries them
+    if not failed:
+        cache.set(PROVISIONAL_ASSIGNMENT_MARK_KEY, initial_time, None)
     logger.info(
-        f"Provisional curation completed in {now() - initial_time}. {final_count - initial_count} associations made."
+        f"Provisional curation completed in {now() - initial_time}. "
+        f"{len(mappings)} name/cas pairs resolved, {associations} associations made."
     )
 
 
-@app.task()
-def generate_bulk_download_file():
-    logger.info("Generate composition bulk download task starting")
-    # generate csv and zip file for user to download later
-    chemicals = (
-        ExtractedComposition.objects.all()
-        .prefetch_related("weight_fraction_type", "unit_type", "product_uber_puc")
-        .values(
-            "extracted_text__data_document__data_group__data_source__title",
-            "extracted_text__data_document__title",
-            "extracted_text__data_document__subtitle",
-            "extracted_text__doc_date",
-            "extracted_text__data_document__product__title",
-            "extracted_text__data_document__product__product_uber_puc__puc__kind__name",
-            "extracted_text__data_document__product__product_uber_puc__puc__gen_cat",
-            "extracted_text__data_document__product__product_uber_puc__puc__prod_fam",
-            "extracted_text__data_document__product__product_uber_puc__puc__prod_type",
-            "extracted_text__data_document__product__product_uber_puc__classification_method__name",
-            "raw_chem_name",
-            "raw_cas",
-            "dsstox__sid",
-            "dsstox__true_chemname",
-            "dsstox__true_cas",
-            "provisional",
-            "raw_min_comp",
-            "raw_max_comp",
-            "raw_central_comp",
-            "unit_type__title",
-            "lower_wf_analysis",
-            "upper_wf_analysis",
-            "central_wf_analysis",
-            "weight_fraction_type__title",
-        )
-        .order_by(
-            "extracted_text__data_document__data_group__data_source",
-            "extracted_text__data_document__title",
-            "raw_chem_name",
-        )
-    )
+@app.task(bind=True)
+def generate_bulk_download_file(self):
+    """Rebuild every public bulk download in DOWNLOADS_ROOT.
+
+    Returns:
+        the result of each export build by export name, or None if
+        DOWNLOADS_ROOT is missing
+    """
+    logger.info("Generate bulk download task starting")
     # the DOWNLOADS_ROOT folder should have been created by docker
-    path = DOWNLOADS_ROOT
-    if os.path.exists(path):
-        os.chdir(path)
-        # generate the csv file and compress it
-        filename = "composition_chemicals.csv"
-        zip_filename = "composition_chemicals.zip"
-        with open(filename, "wb") as chem_file:
-            write_csv(
-                chemicals,
-                chem_file,
-                field_header_map={
-                    "extracted_text__data_document__data_group__data_source__title": "Data Source",
-                    "extracted_text__data_document__title": "Data Document Title",
-                    "extracted_text__data_document__subtitle": "Data Document Subtitle",
-                    "extracted_text__doc_date": "Document Date",
-                    "extracted_text__data_document__product__title": "Product",
-                    "extracted_text__data_document__product__product_uber_puc__puc__kind__name": "PUC Kind",
-                    "extracted_text__data_document__product__product_uber_puc__puc__gen_cat": "PUC Gen Cat",
-                    "extracted_text__data_document__product__product_uber_puc__puc__prod_fam": "PUC Prod Fam",
-                    "extracted_text__data_document__product__product_uber_puc__puc__prod_type": "PUC Prod Type",
-                    "extracted_text__data_document__product__product_uber_puc__classification_method__name": "PUC Classification Method",
-                    "raw_chem_name": "Raw Chemical Name",
-                    "raw_cas": "Raw CAS",
-                    "dsstox__sid": "DTXSID",
-                    "dsstox__true_chemname": "True Chemical Name",
-                    "dsstox__true_cas": "True CAS",
-                    "provisional": "Provisional",
-                    "raw_min_comp": "Raw Min Comp",
-                    "raw_max_comp": "Raw Max Comp",
-                    "raw_central_comp": "Raw Central Comp",
-                    "unit_type__title": "Unit Type",
-                    "lower_wf_analysis": "Lower Weight Fraction",
-                    "upper_wf_analysis": "Upper Weight Fraction",
-                    "central_wf_analysis": "Central Weight Fraction",
-                    "weight_fraction_type__title": "Weight Fraction Type",
-                },
-                field_serializer_map={
-                    "provisional": (lambda f: ("Yes" if f == "1" else "No"))
-                },
-            )
-        with ZipFile(zip_filename, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
-            zip_file.write(filename)
-        logger.info("Generate composition bulk download task done")
-    else:
+    if not os.path.exists(DOWNLOADS_ROOT):
         logger.error(f"No directory found at {DOWNLOADS_ROOT}")
+        return None
+    results = {}
+    for name in BULK_EXPORTS:
+        if self.request.is_eager:
+            results[name] = generate_bulk_export.apply(args=[name]).get()
+        else:
+            results[name] = generate_bulk_export.delay(name).id
+    logger.info("Generate bulk download task done")
+    return results
+
+
+@app.task(bind=True)
+def generate_bulk_export(self, name):
+    """Build one bulk download from parts written in parallel.
+
+    Every partition of the export is written by a ``write_bulk_export_part``
+    subtask and a chord stitches the parts into the archive once they are
+    all done. When run eagerly the parts are written one after another.
+
+    Arguments:
+        name (str): a key of dashboard.exports.BULK_EXPORTS
+
+    Returns:
+        the manifest of the archive when run eagerly, otherwise the id of the
+        stitching task
+    """
+    export = get_bulk_export(name)
+    parts_dir = create_parts_dir(export)
+    partitions = export.get_partitions()
+    logger.info(f"Building the {name} bulk download from {len(partitions)} parts")
+    subtasks = [
+        write_bulk_export_part.s(name, partition, parts_dir, index)
+        for index, partition in enumerate(partitions)
+    ]
+    if self.request.is_eager or not subtasks:
+        try:
+            parts = [subtask.apply().get() for subtask in subtasks]
+        except Exception:
+            remove_export_parts(parts_dir)
+            raise
+        return stitch_export_parts(export, parts, parts_dir)
+    # a failed part stops the chord, so its errback removes the parts
+    stitch = stitch_bulk_export.s(name, parts_dir)
+    stitch.link_error(remove_bulk_export_parts.s(parts_dir))
+    result = chord(subtasks)(stitch)
+    return result.id
+
+
+@app.task()
+def write_bulk_export_part(name, partition, parts_dir, index):
+    return write_export_part(get_bulk_export(name), partition, parts_dir, index)
+
+
+@app.task()
+def stitch_bulk_export(parts, name, parts_dir):
+    return stitch_export_parts(get_bulk_export(name), parts, parts_dir)
+
+
+@app.task()
+def remove_bulk_export_parts(request, exc, traceback, parts_dir):
+    """Remove the parts of a bulk download build that failed."""
+    logger.error(f"Bulk download build {request.id} failed: {exc}")
+    remove_export_parts(parts_dir)
+
+
+@app.task()
+def refresh_site_stats():
+    """Recount the site statistics shown on the home and statistics pages."""
+    refresh_site_stats_cache()
+
+
+@app.task()
+def expand_audit_log_diffs():
+    """Move the audit diffs recorded by the JSON diff triggers into the audit log."""
+    AuditLogDiff = apps.get_model("dashboard", "AuditLogDiff")
+    return AuditLogDiff.objects.expand()
@@ -1,5 +1,7 @@
 import crum
 import io
+import json
+from datetime import datetime
 from urllib import parse
 
 from django.test import RequestFactory, Client, tag
@@ -17,6 +19,7 @@ from dashboard.models import (
     ExtractedListPresence,
     ExtractedFunctionalUse,
     AuditLog,
+    AuditLogDiff,
     FunctionalUse,
     FunctionalUseCategory,
     RawChem,
@@ -510,3 +513,82 @@ class AuditLogTest(TempFileMixin, TransactionTestCase):
         self.assertIsNotNone(sid_entry)
         self.assertEquals(sid_entry.old_value, dsstox2.sid)
         self.assertEquals(sid_entry.action, "D")
+
+    def test_audit_log_diff(self):
+        dsstox1 = DSSToxLookup.objects.filter(true_chemname="water").first()
+        dsstox2 = DSSToxLookup.objects.filter(true_chemname="ethanol").first()
+        date = datetime(2021, 1, 1, 12)
+        AuditLog.objects.all().delete()
+        AuditLogDiff.objects.create(
+            extracted_text_id=1,
+            object_key=2,
+            model_name="rawchem",
+            action="U",
+            changes=json.dumps(
+                {"raw_cas": ["old", "new"], "dsstox_id": [dsstox1.pk, dsstox2.pk]}
+            ),
+            date_created=date,
+        )
+        other = AuditLogDiff.objects.create(
+            extracted_text_id=1,
+            object_key=3,
+            model_name="rawchem",
+            action="U",
+            changes=json.dumps({"raw_cas": ["a", "b"]}),
+            date_created=date,
+        )
+        # the diffs of a single object can be moved before reading its log
+        self.assertEqual(1, AuditLogDiff.objects.expand(object_key=3, skip_locked=True))
+        self.assertEqual(3, AuditLog.objects.get().rawchem_id)
+        self.assertFalse(AuditLogDiff.objects.filter(pk=other.pk).exists())
+        AuditLog.objects.all().delete()
+        self.assertEqual(1, AuditLogDiff.objects.expand())
+        self.assertFalse(AuditLogDiff.objects.exists())
+        cas_entry = AuditLog.objects.get(field_name="raw_cas")
+        self.assertEqual(("old", "new"), (cas_entry.old_value, cas_entry.new_value))
+        self.assertEqual(date, cas_entry.date_created)
+        self.assertEqual(2, cas_entry.rawchem_id)
+        sid_entry = AuditLog.objects.get(field_name="sid")
+        self.assertEqual(dsstox1.sid, sid_entry.old_value)
+        self.assertEqual(dsstox2.sid, sid_entry.new_value)
+        self.assertEqual("U", sid_entry.action)
+
+    def test_archive(self):
+        def create_entry(rawchem_id, value):
+            return AuditLog.objects.create(
+                rawchem_id=rawchem_id,
+                object_key=rawchem_id,
+                model_name="rawchem",
+                field_name="raw_cas",
+                new_value=value,
+                action="U",
+            )
+
+        AuditLog.objects.all().delete()
+        for value in ("a", "b", "c"):
+            create_entry(1, value)
+        create_entry(2, "d")
+        AuditLog.objects.update(date_created=datetime(2020, 1, 1))
+        recent = create_entry(1, "e")
+        f = io.StringIO()
+        exported, deleted = AuditLog.objects.archive(datetime(2021, 1, 1), f)
+        self.assertEqual((4, 2), (exported, deleted))
+        self.assertEqual(5, len(f.getvalue().splitlines()))
+        # the latest archived entry of each chemical is kept
+        self.assertEqual(
+            ["c", "d", "e"],
+            sorted(AuditLog.objects.values_list("new_value", flat=True)),
+        )
+        self.assertTrue(AuditLog.objects.filter(pk=recent.pk).exists())
+        # the next run only exports the entries that aged since
+        f = io.StringIO()
+        exported, deleted = AuditLog.objects.archive(datetime(2099, 1, 1), f)
+        self.assertEqual((1, 1), (exported, deleted))
+        self.assertEqual(2, len(f.getvalue().splitlines()))
+        self.assertIn(f"{recent.pk},", f.getvalue())
+        self.assertEqual(
+            ["d", "e"], sorted(AuditLog.objects.values_list("new_value", flat=True))
+        )
+        # nothing is left to export
+        f = io.StringIO()
+        self.assertEqual((0, 0), AuditLog.objects.archive(datetime(2099, 1, 1), f))
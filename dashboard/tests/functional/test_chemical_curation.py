@@ -1,6 +1,9 @@
 import csv
+import io
 
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile
 from django.test import TestCase
+from django.utils import timezone
 from django.urls import resolve
 
 from dashboard.tests.loader import fixtures_standard
@@ -65,6 +68,7 @@ class ChemicalCurationTests(TestCase):
             rows = [row for row in reader]
         self.assertIsNotNone(rows, "CSV failed to read")
 
+        start = timezone.now()
         with open("./sample_files/chemical_curation_upload.csv") as csv_file:
             self.client.post(
                 "/chemical_curation/", {"curate-bulkformsetfileupload": csv_file}
@@ -74,6 +78,9 @@ class ChemicalCurationTests(TestCase):
             rawchem = RawChem.objects.select_related("dsstox").get(
                 pk=row["external_id"]
             )
+            # The bulk update keeps the modification fields current
+            self.assertGreaterEqual(rawchem.updated_at, start)
+            self.assertEqual("Karyn", rawchem.updated_by.username)
             # Row 5 is a rid reassign and not a true chemical curation.
             if row["external_id"] != "5":
                 # All true chemicals in the CSV should exist
@@ -172,3 +179,45 @@ class ChemicalCurationTests(TestCase):
             response,
             "true_cas: Ensure this value has at most 50 characters (it has 111)",
         )
+
+    def test_chemical_curation_blank_cell(self):
+        dss = DSSToxLookup.objects.exclude(true_chemname="").exclude(true_cas="")[0]
+        rc = RawChem.objects.first()
+        csv_str = "external_id,rid,sid,true_chemical_name,true_cas\n"
+        csv_str += f"{rc.pk},,{dss.sid},,1234-56-7\n"
+        csv_file = SimpleUploadedFile("curation.csv", csv_str.encode())
+        self.client.post(
+            "/chemical_curation/", {"curate-bulkformsetfileupload": csv_file}
+        )
+        curated = DSSToxLookup.objects.get(pk=dss.pk)
+        # The blank name cell keeps the curated name
+        self.assertEqual(dss.true_chemname, curated.true_chemname)
+        self.assertEqual("1234-56-7", curated.true_cas)
+        self.assertEqual(dss.pk, RawChem.objects.get(pk=rc.pk).dsstox_id)
+
+    def test_chemical_curation_formset_queries(self):
+        pks = list(RawChem.objects.values_list("pk", flat=True)[:3])
+        csv_str = "external_id,rid,sid,true_chemical_name,true_cas\n"
+        csv_str += "".join(f"{pk},,,,\n" for pk in pks + [0])
+        files = {
+            "curate-bulkformsetfileupload": InMemoryUploadedFile(
+                io.StringIO(csv_str),
+                field_name="csv",
+                name="curation.csv",
+                content_type="text/csv",
+                size=len(csv_str),
+                charset="utf-8",
+            )
+        }
+        form_data = {
+            "curate-TOTAL_FORMS": 0,
+            "curate-INITIAL_FORMS": 0,
+            "curate-MAX_NUM_FORMS": "",
+        }
+        formset = ChemicalCurationFormSet(form_data, files)
+        # The external_ids of every row are looked up at once
+        with self.assertNumQueries(1):
+            self.assertFalse(formset.is_valid())
+        for form, pk in zip(formset.forms, pks):
+            self.assertEqual(pk, form.cleaned_data["external_id"].pk)
+        self.assertIn("external_id", formset.forms[3].errors)
@@ -5,7 +5,14 @@ from lxml import html
 
 from django.test import TestCase, tag, TransactionTestCase
 
-from dashboard.models import DSSToxLookup, ProductDocument, PUC, ProductToPUC
+from dashboard.models import (
+    ChemicalPucRollup,
+    DSSToxLookup,
+    ProductDocument,
+    PUC,
+    ProductToPUC,
+    RawChem,
+)
 from dashboard.tests.loader import fixtures_standard
 
 from django.test import override_settings
@@ -246,3 +253,64 @@ class ChemicalDetail(TestCase):
         data = json.loads(response.content)
         self.assertEqual(data["recordsTotal"], 3)
         self.assertEqual(data["recordsFiltered"], 0)
+
+
+@tag("puc")
+class ChemicalPucRollupTest(TestCase):
+
+    fixtures = fixtures_standard
+
+    def setUp(self):
+        self.dss = DSSToxLookup.objects.get(sid="DTXSID9022528")
+        uber_products = ProductToPUC.objects.filter(is_uber_puc=True).values(
+            "product_id"
+        )
+        self.rawchem = RawChem.objects.filter(
+            dsstox=self.dss,
+            extracted_text_id__in=ProductDocument.objects.filter(
+                product_id__in=uber_products
+            ).values("document_id"),
+        ).first()
+
+    def _subtree_count(self, tree):
+        return sum(value["product_count"] for value in tree.values())
+
+    def test_cumulative_counts(self):
+        tree = self.dss.get_cumulative_puc_products_tree("FO", data_format="dict")
+        self.assertTrue(len(tree), "The chemical should have FO PUCs")
+        for child in tree.children:
+            if child.value is None:
+                continue
+            self.assertEqual(
+                child.value["cumulative_product_count"],
+                self._subtree_count(child),
+                f"{child.name} should count the products of all its PUCs",
+            )
+        self.assertTrue(ChemicalPucRollup.objects.filter(dsstox=self.dss).exists())
+
+    def _product_count(self):
+        rollups = ChemicalPucRollup.objects.for_chemical(self.dss.pk)
+        return sum(rollup.product_count for rollup in rollups)
+
+    def test_curation_drops_rollups(self):
+        before = self._product_count()
+        self.rawchem.dsstox = None
+        self.rawchem.save()
+        self.assertFalse(
+            ChemicalPucRollup.objects.filter(dsstox=self.dss).exists(),
+            "Uncurating a chemical should drop its rollups",
+        )
+        self.assertLess(self._product_count(), before)
+
+    def test_uberpuc_change_drops_rollups(self):
+        ChemicalPucRollup.objects.for_chemical(self.dss.pk)
+        ptp = ProductToPUC.objects.filter(
+            is_uber_puc=True,
+            product__documents__extractedtext__rawchem__dsstox=self.dss,
+        ).first()
+        puc = PUC.objects.filter(kind=ptp.puc.kind).exclude(pk=ptp.puc_id).last()
+        ptp.puc = puc
+        ptp.save()
+        self.assertFalse(ChemicalPucRollup.objects.filter(dsstox=self.dss).exists())
+        rollups = ChemicalPucRollup.objects.for_chemical(self.dss.pk)
+        self.assertIn(puc.pk, [rollup.puc_id for rollup in rollups])
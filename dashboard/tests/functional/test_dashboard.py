@@ -1,7 +1,7 @@
 import json
 import datetime
 
-from django.test import TestCase, tag
+from django.test import TestCase, override_settings, tag
 from django.urls import resolve, reverse
 from lxml import html
 
@@ -18,10 +18,12 @@ from dashboard.models import (
     DSSToxLookup,
     News,
 )
+from dashboard.stats import get_site_stats, refresh_site_stats
 from dashboard.tests.loader import load_model_objects, fixtures_standard
 
 
 @tag("loader")
+@override_settings(SITE_STATS_INVALIDATE_ON_SAVE=True)
 class DashboardTest(TestCase):
     def setUp(self):
         self.objects = load_model_objects()
@@ -215,6 +217,7 @@ class DashboardTest(TestCase):
             self.assertIn("body text " + str(i), response)
 
 
+@override_settings(SITE_STATS_INVALIDATE_ON_SAVE=True)
 class DashboardTestWithFixtures(TestCase):
     fixtures = fixtures_standard
 
@@ -304,3 +307,31 @@ class DashboardTestWithFixtures(TestCase):
             "The page should show %s Products linked to PUCs"
             % str(orm_prod_puc_count + 1),
         )
+
+    def test_stats_cached(self):
+        refresh_site_stats()
+        # the cached snapshot serves the statistics without counting again
+        with self.assertNumQueries(0):
+            self.client.get(reverse("grouptype_stats"))
+
+        # queryset updates skip the signals and wait for the next refresh
+        RawChem.objects.update(dsstox=None)
+        response_html = html.fromstring(self.client.get("/").content.decode("utf8"))
+        num_dss = int(response_html.xpath('//*[@name="dsstox"]')[0].text)
+        self.assertNotEqual(num_dss, 1)
+        refresh_site_stats()
+        response_html = html.fromstring(self.client.get("/").content.decode("utf8"))
+        num_dss = int(response_html.xpath('//*[@name="dsstox"]')[0].text)
+        self.assertEqual(num_dss, 1)
+
+    def test_stats_kept_on_save_by_default(self):
+        stats = refresh_site_stats()
+        with self.settings(SITE_STATS_INVALIDATE_ON_SAVE=False):
+            ProductToPUC.objects.create(
+                product=Product.objects.exclude(producttopuc__isnull=False).first(),
+                puc=PUC.objects.get(id=21),
+                classification_method_id="MA",
+            )
+            # the snapshot is served until the periodic refresh
+            with self.assertNumQueries(0):
+                self.assertEqual(stats["counts"], get_site_stats()["counts"])
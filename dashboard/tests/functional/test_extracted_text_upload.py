@@ -9,6 +9,7 @@ from django.core.files import File
 from celery.result import AsyncResult
 from celery_djangotest.integration import TransactionTestCase
 
+from dashboard.forms.data_group import ExtractFileFormSet
 from dashboard.models import (
     ExtractedText,
     DataDocument,
@@ -273,6 +274,36 @@ class UploadExtractedFileTest(TempFileMixin, TransactionTestCase):
         dg = DataGroup.objects.get(pk=6)
         dg.delete()
 
+    def test_chem_upload_rolled_back(self):
+        req_data = {"extfile-extraction_script": 5}
+        req_data.update(self.mng_data)
+        files = {"extfile-bulkformsetfileupload": self.generate_valid_chem_csv()}
+        formset = ExtractFileFormSet(req_data, files, dgpk=6)
+        formset.chunk_size = 1
+        self.assertTrue(formset.is_valid())
+        rawchem_count = RawChem.objects.count()
+        text_count = ExtractedText.objects.count()
+        save_children = formset._save_children
+        saved_batches = []
+
+        def failing_save_children(rows, funcuses):
+            # the second batch fails after the first one was committed
+            if saved_batches:
+                raise RuntimeError("Lost connection")
+            saved_batches.append(save_children(rows, funcuses))
+            return saved_batches[-1]
+
+        formset._save_children = failing_save_children
+        with self.assertRaises(RuntimeError):
+            formset.save()
+        self.assertEqual(1, len(saved_batches[0]))
+        # the save removed the rows it had committed
+        self.assertEqual(rawchem_count, RawChem.objects.count())
+        self.assertEqual(text_count, ExtractedText.objects.count())
+        self.assertFalse(
+            DataDocument.objects.filter(raw_category="aerosol hairspray").exists()
+        )
+
     def test_chemical_presence_upload(self):
         # Delete the CPCat records that were loaded with the fixtures
         ExtractedCPCat.objects.all().delete()
@@ -1,5 +1,8 @@
+import io
+import json
 import os
 import shutil
+import zipfile
 
 from django.contrib.auth.models import User
 from django.test import TestCase, override_settings, tag
@@ -18,10 +21,12 @@ from dashboard.models import (
     HarmonizedMedium,
     ExtractedHHRec,
     ExtractedLMRec,
+    UnionExtractedLMHHRec,
 )
 from dashboard.tests.loader import fixtures_standard
 from dashboard.views.get_data import stats_by_dtxsids
 from factotum.settings import DOWNLOADS_ROOT
+from dashboard.exports import BULK_EXPORTS
 from dashboard.tasks import generate_bulk_download_file
 
 
@@ -259,24 +264,43 @@ class TestGetData(TestCase):
         )
         self.assertContains(response, countlink)
 
+    def read_csv_archive(self, response, filename, arcname):
+        """The CSV rows of a zipped download."""
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.get("Content-Disposition"), f'attachment; filename="{filename}"'
+        )
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as z:
+            return z.read(arcname).decode("utf-8-sig").splitlines()
+
     def test_download_functional_uses(self):
         response = self.client.get("/dl_functional_uses/")
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(
-            response,
+        rows = self.read_csv_archive(
+            response, "functional_uses.zip", "functional_uses.csv"
+        )
+        self.assertIn(
             "Sun Ingredient Disclosures,Composition,Sun_INDS_89,2018-04-07,ethylparabenzene,120-47-9,DTXSID9022528,ethylparaben,120-47-8,False,kayaking,fragrance",
+            rows,
         )
 
     def test_download_lp(self):
         response = self.client.get("/dl_lp_chemicals/")
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(
-            response,
+        rows = self.read_csv_archive(
+            response, "list_presence_chemicals.zip", "list_presence_chemicals.csv"
+        )
+        self.assertIn(
             "SIRI,List of Chemicals 2,,2018-09-27,Test Organization 254781,sd alcohol40-jj (ethanol),0000064-17-6,DTXSID9020584,ethanol,64-17-5,No,,,abrasive; flavor; slimicide",
+            rows,
         )
 
+    def _remove_bulk_exports(self):
+        for export in BULK_EXPORTS.values():
+            if os.path.exists(export.path):
+                os.remove(export.path)
+
     def test_download_co(self):
         # invoke task to generate file
+        self.addCleanup(self._remove_bulk_exports)
         generate_bulk_download_file.apply()
         response = self.client.get("/dl_co_chemicals/")
         self.assertEqual(response.status_code, 200)
@@ -284,3 +308,45 @@ class TestGetData(TestCase):
             response.get("Content-Disposition"),
             'attachment; filename="composition_chemicals.zip"',
         )
+
+    def test_download_prebuilt_functional_uses(self):
+        self.addCleanup(self._remove_bulk_exports)
+        live = self.client.get("/dl_functional_uses/")
+        live_rows = self.read_csv_archive(
+            live, "functional_uses.zip", "functional_uses.csv"
+        )
+
+        generate_bulk_download_file.apply()
+        response = self.client.get("/dl_functional_uses/")
+        self.assertEqual(
+            response.get("Content-Disposition"),
+            'attachment; filename="functional_uses.zip"',
+        )
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as z:
+            self.assertEqual(z.namelist(), ["functional_uses.csv", "manifest.json"])
+            rows = z.read("functional_uses.csv").decode("utf-8-sig").splitlines()
+            manifest = json.loads(z.read("manifest.json"))
+        self.assertEqual(rows[0], live_rows[0])
+        self.assertEqual(sorted(rows[1:]), sorted(live_rows[1:]))
+        self.assertEqual(manifest["rows"], len(rows) - 1)
+        self.assertEqual(
+            manifest["rows"], sum(part["rows"] for part in manifest["parts"])
+        )
+
+    def test_download_lm_hh(self):
+        response = self.client.get("/dl_lm_hh_chemicals/")
+        rows = self.read_csv_archive(
+            response, "lm_hh_chemicals.zip", "lm_hh_chemicals.csv"
+        )
+        self.assertTrue(rows[0].startswith("Data Source,Data Type,Data Document Title"))
+        self.assertEqual(len(rows) - 1, UnionExtractedLMHHRec.objects.count())
+
+        # the prebuilt download reads the same rows from the LM and HH tables
+        self.addCleanup(self._remove_bulk_exports)
+        generate_bulk_download_file.apply()
+        response = self.client.get("/dl_lm_hh_chemicals/")
+        prebuilt_rows = self.read_csv_archive(
+            response, "lm_hh_chemicals.zip", "lm_hh_chemicals.csv"
+        )
+        self.assertEqual(rows[0], prebuilt_rows[0])
+        self.assertEqual(sorted(rows[1:]), sorted(prebuilt_rows[1:]))
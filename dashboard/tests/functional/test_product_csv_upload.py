@@ -115,6 +115,13 @@ class UploadProductTest(TempFileMixin, TestCase):
             pre_pdcount + 5,
             "There should be 5 more ProductDocuments after the upload",
         )
+        # The bulk inserts still record who uploaded the rows
+        for product_document in ProductDocument.objects.filter(
+            document__in=self.docs
+        ).select_related("product", "created_by", "updated_by"):
+            for obj in (product_document, product_document.product):
+                self.assertEqual("Karyn", obj.created_by.username)
+                self.assertEqual("Karyn", obj.updated_by.username)
         # The first data_document_id in the csv should now have
         # two Products linked to it, including the new one
         resp = self.c.get(f"/datadocument/%s/" % self.docs[0].pk)
@@ -375,6 +375,11 @@ class TestProductPuc(TestCase):
         product = Product.objects.get(pk=11)
         tag_count = product.producttotag_set.count()
         self.assertEqual(tag_count, 5, "Product 11 should now be assigned to 5 Tags")
+        product_to_tag = product.producttotag_set.select_related("created_by").get(
+            tag_id=6
+        )
+        self.assertEqual("Karyn", product_to_tag.created_by.username)
+        self.assertEqual(product_to_tag.created_by_id, product_to_tag.updated_by_id)
 
     def test_bulk_product_tag_post_without_products(self):
         product_response_url = reverse("bulk_product_tag")
@@ -8,13 +8,25 @@ from django.contrib.messages import get_messages
 from dashboard.tests.loader import *
 from django.contrib.sessions.middleware import SessionMiddleware
 import requests
-from django.test import TestCase, RequestFactory
+from django.db import OperationalError
+from django.test import TestCase, RequestFactory, override_settings
+from unittest import mock
 from django.conf import settings
 
 import bs4
 import json
 
+from elastic.cache import clear_search_cache
 from elastic.models import QueryLog
+from elastic.querylog import query_log_writer
+from elastic.search import (
+    MAX_RESULT_WINDOW,
+    VALID_MODELS,
+    ElasticPaginator,
+    get_unique_count,
+    run_batched_query,
+    run_query,
+)
 from dashboard.views.search import search_model
 from dashboard.tests.elastic_factories import fetch_dashboard_logstash
 from dashboard.tests.factories import DataDocumentFactory, ProductFactory
@@ -141,6 +153,92 @@ class TestSearch(TestCase):
         self.assertEquals(counts["chemical"], 1)
         self.assertEquals(counts["puc"], 13)
 
+    def test_batched_query(self):
+        """
+        The batched query returns the same page, total and model counts as
+        the individual queries.
+        """
+        batched = run_batched_query(
+            "water", "datadocument", size=40, page=1, count_models=VALID_MODELS
+        )
+        single = run_query("water", "datadocument", size=40, page=1)
+        self.assertEqual(batched["total"], single["total"])
+        self.assertEqual(batched["facets"], single["facets"])
+        self.assertEqual(
+            [h["id"] for h in batched["hits"]], [h["id"] for h in single["hits"]]
+        )
+        self.assertEqual(
+            [h["num_product"] for h in batched["hits"]],
+            [h["num_product"] for h in single["hits"]],
+        )
+        for model in VALID_MODELS:
+            self.assertEqual(
+                batched["unique_counts"][model], get_unique_count("water", model)
+            )
+
+    def test_search_cache(self):
+        """
+        Repeating a search is served from the cache without querying
+        Elasticsearch, and facet order does not change the cache key.
+        """
+        facets = {"datadocument_grouptype": ["CO", "FU"]}
+        first = run_query("water", "datadocument", size=40, facets=facets)
+        with mock.patch("elasticsearch_dsl.Search.execute") as execute:
+            second = run_query(
+                "water",
+                "datadocument",
+                size=40,
+                facets={"datadocument_grouptype": ["FU", "CO"]},
+            )
+            self.assertFalse(execute.called)
+        self.assertEqual(
+            [h["id"] for h in first["hits"]], [h["id"] for h in second["hits"]]
+        )
+        self.assertEqual(first["total"], second["total"])
+
+    def test_paging_skips_aggregations(self):
+        """
+        Pages after the first one reuse the cached aggregations and only
+        search for hits, and paging stops at the result window.
+        """
+        first = run_batched_query("water", "datadocument", size=10, page=1)
+        # only the hits query is left to send, so no _msearch is needed
+        with mock.patch("elastic.cache.MultiSearch") as msearch:
+            second = run_batched_query("water", "datadocument", size=10, page=2)
+            self.assertFalse(msearch.called)
+        self.assertEqual(first["total"], second["total"])
+        self.assertEqual(first["facets"], second["facets"])
+        self.assertEqual(second["hits"].number, 2)
+
+        paginator = ElasticPaginator(MAX_RESULT_WINDOW * 5, "water", "datadocument")
+        self.assertEqual(len(paginator), MAX_RESULT_WINDOW)
+
+    def test_patch_highlights(self):
+        """
+        Whole-field highlights replace the source value and are keyed on
+        their friendly name, fragment highlights leave the source untouched.
+        """
+        hit = {
+            "id": 1,
+            "highlights": {
+                "truechem_name": ["<em>Water</em>"],
+                "product_longdescription": ["... pure <em>water</em> ..."],
+            },
+            "source": {
+                "truechem_name": "Water",
+                "product_longdescription": "A very long text about pure water.",
+            },
+        }
+        paginator = ElasticPaginator(1, "water", "product")
+        paginator.patch([hit])
+        self.assertTrue(hit["chemsearch"])
+        self.assertEqual(hit["source"]["truechem_name"], "<em>Water</em>")
+        self.assertEqual(
+            hit["source"]["product_longdescription"],
+            "A very long text about pure water.",
+        )
+        self.assertEqual(set(hit["highlights"]), {"True chemical name", "Description"})
+
     def test_facets(self):
         qs = self._get_query_str("water", {"product_brandname": ["3M"]})
         response = self.client.get("/search/product/" + qs)
@@ -184,6 +282,7 @@ class TestSearch(TestCase):
         response_html = response.content.decode("utf8")
         self.assertIn("<em>Benzoic acid</em>", response_html)
 
+    @override_settings(QUERY_LOG_ASYNC=False)
     def test_logging(self):
         query = "a wild and wonderful query"
         # Test selective logging
@@ -231,6 +330,31 @@ class TestSearch(TestCase):
             "Error should be thrown for query longer than 255 characters.",
         )
 
+    @override_settings(QUERY_LOG_ASYNC=True)
+    def test_logging_async(self):
+        """
+        The search view leaves the query log to the background writer.
+        """
+        qs = self._get_query_str("an asynchronously logged query")
+        with mock.patch.object(query_log_writer, "write") as write:
+            response = self.client.get("/search/product/" + qs)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(query_log_writer.flush(timeout=30))
+        entries = [e for call in write.call_args_list for e in call[0][0]]
+        self.assertEqual([e.query for e in entries], ["an asynchronously logged query"])
+
+    @override_settings(QUERY_LOG_ASYNC=False)
+    def test_logging_outage(self):
+        """
+        An unavailable query log database does not break search.
+        """
+        qs = self._get_query_str("water")
+        with mock.patch.object(
+            QueryLog.objects, "bulk_create", side_effect=OperationalError
+        ):
+            response = self.client.get("/search/product/" + qs)
+        self.assertEqual(response.status_code, 200)
+
     def test_chemical_captions(self):
         """
         Searching by chemical name should return the CAS without any highlights,
@@ -423,6 +547,7 @@ class TestSearch(TestCase):
         requests.post(
             f"http://{self.esurl}/dashboard/_refresh/", headers=self.auth_header
         )
+        clear_search_cache()
 
         # Unquoted search should return records with just "shampoo"
 
@@ -485,6 +610,7 @@ class TestSearch(TestCase):
         requests.post(
             f"http://{self.esurl}/dashboard/_refresh/", headers=self.auth_header
         )
+        clear_search_cache()
 
 
 class TestSearchView(TestCase):
@@ -521,6 +647,7 @@ class TestSearchView(TestCase):
         requests.post(
             f"http://{self.esurl}/dashboard/_refresh/", headers=self.auth_header
         )
+        clear_search_cache()
 
     def test_special_char_search(self):
         """
@@ -561,6 +688,7 @@ class TestSearchView(TestCase):
             requests.post(
                 f"http://{self.esurl}/dashboard/_refresh/", headers=self.auth_header
             )
+            clear_search_cache()
 
         # test the search terms
         for term in search_terms:
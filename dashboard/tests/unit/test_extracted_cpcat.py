@@ -2,7 +2,8 @@ from django.test import TestCase, tag
 from django.utils import timezone
 from django.contrib.auth.models import User
 from dashboard.tests.loader import load_model_objects
-from dashboard.models import ExtractedCPCat, DataDocument
+from bulkformsets import UniqueChecker
+from dashboard.models import ExtractedCPCat, DataDocument, DocumentType
 
 
 @tag("loader")
@@ -28,3 +29,36 @@ class CPCatTest(TestCase):
             extraction_script=self.objects.exscript,
         )
         self.assertEqual(cpc.__str__(), cpdoc.title)
+
+    def test_unique_checker(self):
+        docs = [
+            DataDocument.objects.create(
+                title="test CPCat document %d" % i,
+                data_group=self.objects.dg,
+                document_type=self.objects.dt,
+                filename="example%d.pdf" % i,
+            )
+            for i in range(2)
+        ]
+        # self.objects.doc already has an ExtractedText, docs[1] is repeated
+        checker = UniqueChecker(ExtractedCPCat)
+        for i, doc in enumerate([self.objects.doc, docs[0], docs[1], docs[1]]):
+            checker.add(
+                i,
+                ExtractedCPCat(
+                    data_document=doc, extraction_script=self.objects.exscript
+                ),
+            )
+        with self.assertNumQueries(1):
+            errors = checker.check()
+        self.assertEqual(sorted(errors), [0, 3])
+        self.assertIn("data_document", errors[0].message_dict)
+
+    def test_unique_checker_collation(self):
+        # strings are compared case insensitively, ignoring trailing spaces
+        checker = UniqueChecker(DocumentType, exclude=["code"])
+        for i, title in enumerate(["msds", "Brochure", "brochure ", "BROCHURE"]):
+            checker.add(i, DocumentType(title=title))
+        errors = checker.check()
+        self.assertEqual(sorted(errors), [0, 2, 3])
+        self.assertIn("title", errors[2].message_dict)
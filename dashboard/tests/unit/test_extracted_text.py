@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.test import TestCase, tag
 from django.utils import timezone
 from django.contrib.auth.models import User
@@ -5,7 +7,9 @@ from django.core.exceptions import ValidationError, ObjectDoesNotExist
 
 
 from dashboard.tests.loader import load_model_objects, fixtures_standard
-from dashboard.models import ExtractedText, QANotes
+from dashboard.models import ExtractedText, QANotes, QAProgress
+from dashboard.models.extracted_text import get_next_or_prev
+from dashboard.utils import sample_pks
 
 
 @tag("loader")
@@ -90,3 +94,63 @@ class ExtractedTestWithSeedData(TestCase):
                 et.is_approvable(),
                 "The record should not be approvable if the notes exist but are blank",
             )
+
+    def test_get_next_or_prev(self):
+        qs = ExtractedText.objects.filter(qa_checked=False).order_by("pk")
+        first, second, last = qs[0], qs[1], qs.last()
+        with self.assertNumQueries(1):
+            self.assertEqual(second, get_next_or_prev(qs, first, "next"))
+        self.assertEqual(first, get_next_or_prev(qs, second, "prev"))
+        # the ends wrap around
+        self.assertEqual(first, get_next_or_prev(qs, last, "next"))
+        self.assertEqual(last, get_next_or_prev(qs, first, "prev"))
+        # items outside of the query-set have no neighbors
+        self.assertFalse(get_next_or_prev(qs.exclude(pk=first.pk), first, "next"))
+
+    def test_sample_pks(self):
+        qs = ExtractedText.objects.all()
+        pks = sample_pks(qs, 5, seed=1)
+        self.assertEqual(5, len(set(pks)))
+        self.assertEqual(sorted(pks), pks)
+        self.assertTrue(qs.filter(pk__in=pks).count() == 5)
+        # the same seed draws the same sample
+        self.assertEqual(pks, sample_pks(qs, 5, seed=1))
+        # samples larger than the queryset hold every row
+        self.assertEqual(qs.count(), len(sample_pks(qs, qs.count() + 1)))
+
+    def test_qa_progress(self):
+        text = ExtractedText.objects.filter(qa_checked=False).first()
+        texts = ExtractedText.objects.filter(
+            extraction_script=text.extraction_script,
+            data_document__data_group=text.data_document.data_group,
+        )
+        QAProgress.objects.ensure_built()
+        progress = QAProgress.objects.get(
+            extraction_script=text.extraction_script,
+            data_group=text.data_document.data_group,
+        )
+        self.assertEqual(texts.count(), progress.extractedtext_count)
+        self.assertEqual(
+            texts.filter(qa_checked=True).count(), progress.qa_checked_count
+        )
+        # approving a document recounts its row
+        text.qa_checked = True
+        text.save()
+        progress.refresh_from_db()
+        self.assertEqual(
+            texts.filter(qa_checked=True).count(), progress.qa_checked_count
+        )
+
+    def test_qa_progress_concurrent_build(self):
+        count = QAProgress.objects._count
+
+        def racing_count(texts):
+            # another request builds the table in the meantime
+            QAProgress.objects.bulk_create(count(texts))
+            return count(texts)
+
+        with mock.patch.object(QAProgress.objects, "_count", racing_count):
+            QAProgress.objects.build()
+        self.assertEqual(
+            len(count(ExtractedText.objects.all())), QAProgress.objects.count()
+        )
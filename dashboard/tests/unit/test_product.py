@@ -1,7 +1,9 @@
+import crum
+from django.contrib.auth.models import User
 from django.test import TestCase
 
 from dashboard.tests.loader import fixtures_standard
-from dashboard.models import ExtractedText, DataDocument, Product
+from dashboard.models import ExtractedText, DataDocument, DuplicateProduct, Product
 
 
 class ProductTest(TestCase):
@@ -15,3 +17,25 @@ class ProductTest(TestCase):
         dd.first().products.add(p)
         rawchems = [r for r in p.rawchems]
         self.assertEqual(rawchems, [])
+
+    def test_bulk_create_products(self):
+        user = User.objects.get(username="Karyn")
+        with crum.impersonate(user):
+            products = Product.objects.bulk_create_products(
+                [Product(title="stub"), Product(title="upc", upc="2000000000000000")]
+            )
+            duplicates = DuplicateProduct.objects.bulk_create_products(
+                [DuplicateProduct(title="dupe", upc="dupe_upc", source_upc="1")]
+            )
+        stub = Product.objects.get(pk=products[0].pk)
+        self.assertEqual("stub_%d" % stub.pk, stub.upc)
+        self.assertEqual(stub.upc, products[0].upc)
+        self.assertEqual("2000000000000000", Product.objects.get(pk=products[1].pk).upc)
+        self.assertEqual("1", DuplicateProduct.objects.get(upc="dupe_upc").source_upc)
+        self.assertEqual(duplicates[0].pk, Product.objects.get(upc="dupe_upc").pk)
+        # the user fields are set as the pre_save signal would set them
+        for product in Product.objects.filter(pk__in=[p.pk for p in products]):
+            self.assertEqual(user.pk, product.created_by_id)
+            self.assertEqual(user.pk, product.updated_by_id)
+        dupe = DuplicateProduct.objects.get(pk=duplicates[0].pk)
+        self.assertEqual(user.pk, dupe.created_by_id)
@@ -1,3 +1,5 @@
+import crum
+from django.contrib.auth.models import User
 from django.db.utils import IntegrityError
 from django.test import TestCase, tag
 
@@ -37,6 +39,39 @@ class ProductToPUCTestWithSeedData(TestCase):
         ptp = ptps.get(is_uber_puc=True)
         self.assertTrue(ptp.classification_method_id == "MA")
 
+    def test_assign(self):
+        user = User.objects.get(username="Karyn")
+        # 1866 already has an MA uber PUC, so the MB assignment is not uber
+        with crum.impersonate(user):
+            product_ids = ProductToPUC.objects.assign(
+                [1866, 1866], PUC.objects.get(pk=185), classification_method_id="MB"
+            )
+        self.assertEqual([1866], product_ids)
+        ptp = ProductToPUC.objects.get(
+            product_id=1866, puc_id=185, classification_method_id="MB"
+        )
+        self.assertFalse(ptp.is_uber_puc)
+        self.assertEqual(user.pk, ptp.created_by_id)
+        self.assertEqual(user.pk, ptp.updated_by_id)
+        # assigning again skips the existing row
+        ProductToPUC.objects.assign([1866], ptp.puc, classification_method_id="MB")
+        self.assertEqual(
+            1,
+            ProductToPUC.objects.filter(
+                product_id=1866, puc_id=185, classification_method_id="MB"
+            ).count(),
+        )
+
+    def test_deferred_uber_pucs(self):
+        ptps = ProductToPUC.objects.filter(product_id=1866)
+        with ProductToPUC.objects.deferred_uber_pucs() as product_ids:
+            ptps.filter(is_uber_puc=True).delete()
+            # the uber PUC is not reassigned until the end of the block
+            self.assertFalse(ptps.filter(is_uber_puc=True).exists())
+            self.assertEqual({1866}, product_ids)
+        ptp = ptps.get(is_uber_puc=True)
+        self.assertEqual("MB", ptp.classification_method_id)
+
 
 @tag("loader", "puc")
 class ProductToPUCTest(TestCase):
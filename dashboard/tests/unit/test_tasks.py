@@ -1,15 +1,37 @@
+import io
 import os
 import shutil
+import zipfile
+from datetime import timedelta
 
+from django.core.cache import cache
+from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.test import TestCase
+from django.utils.timezone import now
 
 from dashboard.tests import factories
 from dashboard.tests.factories import ExtractedCompositionFactory
-from dashboard.tasks import provisional_sid_assignment, generate_bulk_download_file
+from dashboard.exports import (
+    BULK_EXPORTS,
+    EXPORT_PARTS_DIR,
+    create_parts_dir,
+    get_bulk_export,
+    stitch_export_parts,
+)
+from dashboard.forms import ChemicalCurationFormSet
+from dashboard.models import RawChem
+from dashboard.tasks import (
+    PROVISIONAL_ASSIGNMENT_MARK_KEY,
+    provisional_sid_assignment,
+    generate_bulk_download_file,
+)
 from factotum.settings import DOWNLOADS_ROOT
 
 
 class ProvisionalSidAssignmentTest(TestCase):
+    def setUp(self):
+        cache.delete(PROVISIONAL_ASSIGNMENT_MARK_KEY)
+
     def test_curates_rawchems(self):
         # Build data
         base_chem = ExtractedCompositionFactory()
@@ -101,14 +123,145 @@ class ProvisionalSidAssignmentTest(TestCase):
         self.assertEqual(target.dsstox, base_chem.dsstox)
         self.assertTrue(target.provisional)
 
+    def test_only_changed_pairs_reconsidered(self):
+        """Pairs untouched since the previous run are skipped until a full run."""
+        base_chem = ExtractedCompositionFactory()
+        target = ExtractedCompositionFactory(
+            is_curated=False,
+            raw_chem_name=base_chem.raw_chem_name,
+            raw_cas=base_chem.raw_cas,
+        )
+        RawChem.objects.filter(pk__in=[base_chem.pk, target.pk]).update(
+            updated_at=now() - timedelta(days=2)
+        )
+        cache.set(PROVISIONAL_ASSIGNMENT_MARK_KEY, now() - timedelta(days=1), None)
+
+        provisional_sid_assignment.apply()
+
+        target.refresh_from_db()
+        self.assertIsNone(target.dsstox)
+
+        # A newly saved chemical brings its pair back into consideration
+        new_target = ExtractedCompositionFactory(
+            is_curated=False,
+            raw_chem_name=base_chem.raw_chem_name,
+            raw_cas=base_chem.raw_cas,
+        )
+
+        provisional_sid_assignment.apply()
+
+        target.refresh_from_db()
+        new_target.refresh_from_db()
+        self.assertEqual(target.dsstox, base_chem.dsstox)
+        self.assertEqual(new_target.dsstox, base_chem.dsstox)
+
+    def test_curation_upload_reconsidered(self):
+        """Chemicals curated by a bulk upload bring their pairs back into
+        consideration."""
+        base_chem = ExtractedCompositionFactory(is_curated=False)
+        target = ExtractedCompositionFactory(
+            is_curated=False,
+            raw_chem_name=base_chem.raw_chem_name,
+            raw_cas=base_chem.raw_cas,
+        )
+        RawChem.objects.filter(pk__in=[base_chem.pk, target.pk]).update(
+            updated_at=now() - timedelta(days=2)
+        )
+        cache.set(PROVISIONAL_ASSIGNMENT_MARK_KEY, now() - timedelta(days=1), None)
+        dss = factories.TrueChemicalFactory()
+
+        csv_str = (
+            "external_id,rid,sid,true_chemical_name,true_cas\n"
+            f"{base_chem.pk},,{dss.sid},{dss.true_chemname},{dss.true_cas}\n"
+        )
+        files = {
+            "curate-bulkformsetfileupload": InMemoryUploadedFile(
+                io.StringIO(csv_str),
+                field_name="csv",
+                name="curation.csv",
+                content_type="text/csv",
+                size=len(csv_str),
+                charset="utf-8",
+            )
+        }
+        form_data = {
+            "curate-TOTAL_FORMS": 0,
+            "curate-INITIAL_FORMS": 0,
+            "curate-MAX_NUM_FORMS": "",
+        }
+        formset = ChemicalCurationFormSet(form_data, files)
+        self.assertTrue(formset.is_valid())
+        formset.save()
+
+        provisional_sid_assignment.apply()
+
+        target.refresh_from_db()
+        self.assertEqual(dss.pk, target.dsstox_id)
+        self.assertTrue(target.provisional)
+
+    def test_full_run(self):
+        base_chem = ExtractedCompositionFactory()
+        target = ExtractedCompositionFactory(
+            is_curated=False,
+            raw_chem_name=base_chem.raw_chem_name,
+            raw_cas=base_chem.raw_cas,
+        )
+        RawChem.objects.filter(pk__in=[base_chem.pk, target.pk]).update(
+            updated_at=now() - timedelta(days=2)
+        )
+        cache.set(PROVISIONAL_ASSIGNMENT_MARK_KEY, now() - timedelta(days=1), None)
+
+        provisional_sid_assignment.apply(kwargs={"full": True})
+
+        target.refresh_from_db()
+        self.assertEqual(target.dsstox, base_chem.dsstox)
+        self.assertIsNotNone(cache.get(PROVISIONAL_ASSIGNMENT_MARK_KEY))
+
 
 class GenerateBulkDownloadTest(TestCase):
+    def tearDown(self):
+        for export in BULK_EXPORTS.values():
+            if os.path.exists(export.path):
+                os.remove(export.path)
+
     def test_generate_bulk_download_file(self):
         # clear files
         path = DOWNLOADS_ROOT
         # invoke task
         factories.ExtractedCompositionFactory.create_batch(500)
-        generate_bulk_download_file.apply()
+        results = generate_bulk_download_file.apply().get()
+        self.assertEqual(set(results), set(BULK_EXPORTS))
         # verify files generated
-        self.assertTrue(os.path.exists(os.path.join(path, "composition_chemicals.csv")))
-        self.assertTrue(os.path.exists(os.path.join(path, "composition_chemicals.zip")))
+        zip_path = os.path.join(path, "composition_chemicals.zip")
+        self.assertTrue(os.path.exists(zip_path))
+        with zipfile.ZipFile(zip_path) as zip_file:
+            self.assertEqual(
+                zip_file.namelist(), ["composition_chemicals.csv", "manifest.json"]
+            )
+            with zip_file.open("composition_chemicals.csv") as csv_file:
+                lines = csv_file.read().decode("utf-8-sig").splitlines()
+        self.assertTrue(lines[0].startswith("Data Source,Data Document Title"))
+        manifest = results["composition"]
+        self.assertEqual(len(lines) - 1, manifest["rows"])
+        self.assertGreaterEqual(manifest["rows"], 500)
+        # no temporary files or parts are left behind
+        self.assertFalse([f for f in os.listdir(path) if f.endswith(".tmp")])
+        self.assertFalse(os.listdir(os.path.join(path, EXPORT_PARTS_DIR)))
+
+    def test_failed_build_parts_removed(self):
+        export = get_bulk_export("composition")
+        parts_dir = create_parts_dir(export)
+        missing_part = {"index": 0, "path": os.path.join(parts_dir, "missing.csv.gz")}
+        with self.assertRaises(FileNotFoundError):
+            stitch_export_parts(export, [missing_part], parts_dir)
+        self.assertFalse(os.path.exists(parts_dir))
+        # the parts of builds that failed without removing them are swept
+        stale_dir = create_parts_dir(export)
+        os.utime(stale_dir, (0, 0))
+        other_export_dir = create_parts_dir(get_bulk_export("functional_uses"))
+        os.utime(other_export_dir, (0, 0))
+        parts_dir = create_parts_dir(export)
+        self.assertFalse(os.path.exists(stale_dir))
+        self.assertTrue(os.path.exists(other_export_dir))
+        shutil.rmtree(other_export_dir)
+        shutil.rmtree(parts_dir)
@@ -482,6 +482,11 @@ urlpatterns = [
         views.download_functional_uses,
         name="download_functional_uses",
     ),
+    path(
+        "dl_lm_hh_chemicals/",
+        views.download_lm_hh_chemicals,
+        name="download_LMHH_chemicals",
+    ),
     path(
         "functional_use_categories/",
         views.functional_use_category_list,
@@ -1,10 +1,13 @@
 import os
+import random
 import uuid
 from collections.abc import MutableMapping
 import zipstream
 
+from crum import get_current_user
 from django.apps import apps
 from django import forms
+from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import FieldDoesNotExist
 from django.db import connection, transaction
 from django.db.models import Aggregate, Lookup, Field
@@ -418,6 +421,52 @@ def get_missing_ids(Model, ids):
     return list(ids_set - dbids_set)
 
 
+def sample_pks(queryset, size, seed=None):
+    """Draw a random sample of the primary keys of a queryset
+
+    The rows are counted and the positions of the sample are drawn in Python,
+    then the primary keys are streamed in primary key order to pick them out.
+    The database never sorts the rows randomly (ORDER BY RAND()) and the same
+    seed draws the same sample from the same rows.
+
+    Args:
+        queryset: the QuerySet to sample
+        size: the number of primary keys to draw
+
+    Optional args:
+        seed: the seed of the random number generator
+
+    Returns:
+        A list of primary keys in primary key order
+    """
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    count = queryset.count()
+    if size >= count:
+        return list(pks)
+    positions = set(random.Random(seed).sample(range(count), size))
+    return [pk for i, pk in enumerate(pks.iterator()) if i in positions]
+
+
+def populate_user_fields(instances, created=False):
+    """Set the user fields of CommonInfo instances saved in bulk
+
+    bulk_create and bulk_update skip the pre_save signal that fills in
+    ``created_by`` and ``updated_by``, so they are set to the current user here
+    in the same way.
+
+    Arguments:
+        instances (iterable): the CommonInfo instances
+        created (optional bool): set ``created_by`` too, for new instances
+    """
+    user = get_current_user()
+    if isinstance(user, AnonymousUser):
+        return
+    for instance in instances:
+        if created:
+            instance.created_by = user
+        instance.updated_by = user
+
+
 @transaction.atomic
 def inheritance_bulk_create(models):
     """A workaround for https://code.djangoproject.com/ticket/28821
@@ -26,6 +26,7 @@ from dashboard.models import (
     ExtractedHabitsAndPractices,
     RawChem,
     AuditLog,
+    AuditLogDiff,
     HarmonizedMedium,
 )
 
@@ -728,6 +729,13 @@ class CuratedChemicalDetailJson(FilterDatatableView):
         raw_chem_name = self.request.GET.get("raw_chem_name")
         raw_cas = self.request.GET.get("raw_cas")
 
+        # the periodic task may not have moved the latest changes yet
+        chem_ids = list(
+            RawChem.objects.filter(
+                dsstox__sid=sid, raw_chem_name=raw_chem_name, raw_cas=raw_cas
+            ).values_list("pk", flat=True)
+        )
+        AuditLogDiff.objects.expand(object_key__in=chem_ids, skip_locked=True)
         sid_log = (
             AuditLog.objects.filter(rawchem_id=OuterRef("pk"), field_name="sid")
             .order_by("-date_created")
@@ -1,9 +1,7 @@
 import csv
 import datetime
 
-from dateutil.relativedelta import relativedelta
-from django.db.models import Count, DateField, DateTimeField, F
-from django.db.models.functions import Trunc
+from django.db.models import Count, F
 from django.http import HttpResponse
 from django.shortcuts import render
 
@@ -11,28 +9,15 @@ from dashboard.models import (
     PUC,
     DataDocument,
     ExtractedListPresenceTag,
-    Product,
-    ProductToPUC,
-    RawChem,
     FunctionalUseCategory,
     News,
     HarmonizedMedium,
 )
+from dashboard.stats import get_site_stats
 
 
 def get_stats():
-    stats = {}
-    stats["datadocument_count"] = DataDocument.objects.count()
-    stats["product_count"] = Product.objects.count()
-    stats["chemical_count"] = RawChem.objects.count()
-    stats["product_with_puc_count"] = (
-        ProductToPUC.objects.values("product_id").distinct().count()
-    )
-    stats["curated_chemical_count"] = RawChem.objects.filter(
-        dsstox__isnull=False
-    ).count()
-    stats["dsstox_sid_count"] = RawChem.objects.values("dsstox__sid").distinct().count()
-    return stats
+    return get_site_stats()["counts"]
 
 
 def index(request):
@@ -97,59 +82,11 @@ def datadocument_count_by_date():
 
 
 def datadocument_count_by_month():
-    # GROUP BY issue solved with https://stackoverflow.com/questions/8746014/django-group-by-date-day-month-year
-    chart_start_datetime = datetime.datetime(
-        datetime.datetime.now().year - 1, min(12, datetime.datetime.now().month + 1), 1
-    )
-    document_stats = list(
-        DataDocument.objects.filter(created_at__gte=chart_start_datetime)
-        .annotate(
-            upload_month=(Trunc("created_at", "month", output_field=DateTimeField()))
-        )
-        .values("upload_month")
-        .annotate(document_count=(Count("id")))
-        .values("document_count", "upload_month")
-        .order_by("upload_month")
-    )
-    if len(document_stats) < 12:
-        for i in range(0, 12):
-            chart_month = chart_start_datetime + relativedelta(months=i)
-            if (
-                i + 1 > len(document_stats)
-                or document_stats[i]["upload_month"] != chart_month
-            ):
-                document_stats.insert(
-                    i, {"document_count": "0", "upload_month": chart_month}
-                )
-    return document_stats
+    return get_site_stats()["datadocument_count_by_month"]
 
 
 def product_with_puc_count_by_month():
-    # GROUP BY issue solved with https://stackoverflow.com/questions/8746014/django-group-by-date-day-month-year
-    chart_start_datetime = datetime.datetime(
-        datetime.datetime.now().year - 1, min(12, datetime.datetime.now().month + 1), 1
-    )
-    product_stats = list(
-        ProductToPUC.objects.filter(created_at__gte=chart_start_datetime)
-        .annotate(
-            puc_assigned_month=(Trunc("created_at", "month", output_field=DateField()))
-        )
-        .values("puc_assigned_month")
-        .annotate(product_count=Count("product", distinct=True))
-        .order_by("puc_assigned_month")
-    )
-
-    if len(product_stats) < 12:
-        for i in range(0, 12):
-            chart_month = chart_start_datetime + relativedelta(months=i)
-            if (
-                i + 1 > len(product_stats)
-                or product_stats[i]["puc_assigned_month"] != chart_month
-            ):
-                product_stats.insert(
-                    i, {"product_count": "0", "puc_assigned_month": chart_month}
-                )
-    return product_stats
+    return get_site_stats()["product_with_puc_count_by_month"]
 
 
 def download_PUCs(request):
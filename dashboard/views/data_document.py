@@ -1,8 +1,6 @@
-import os
-
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import JsonResponse, HttpResponseBadRequest, FileResponse, HttpResponse
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.views import View
@@ -16,6 +14,7 @@ from dashboard.forms.forms import (
     RawChemToFunctionalUseForm,
     RawChemToStatisticalValueForm,
 )
+from dashboard.exports import bulk_export_response, live_export_response
 from dashboard.forms.tag_forms import ExtractedHabitsAndPracticesTagForm
 from dashboard.utils import get_extracted_models, GroupConcat
 from dashboard.forms import (
@@ -39,6 +38,7 @@ from dashboard.models import (
     ExtractedComposition,
     RawChem,
     AuditLog,
+    AuditLogDiff,
     ExtractedHabitsAndPractices,
     ExtractedHabitsAndPracticesToTag,
     ExtractedFunctionalUse,
@@ -49,7 +49,6 @@ from dashboard.models import (
 )
 from django.forms import inlineformset_factory
 
-from factotum.settings import DOWNLOADS_ROOT
 
 CHEMICAL_FORMS = {
     "CO": ExtractedCompositionForm,
@@ -592,6 +591,8 @@ def habits_and_practices_tag_delete(request, doc_pk, chem_pk, tag_pk):
 
 def chemical_audit_log(request, pk):
     chemical = RawChem.objects.filter(pk=pk).select_subclasses().first()
+    # the periodic task may not have moved the latest changes yet
+    AuditLogDiff.objects.expand(object_key=pk, skip_locked=True)
     auditlog = AuditLog.objects.filter(rawchem_id=pk).order_by("-date_created")
 
     return render(
@@ -767,57 +768,16 @@ def download_document_chemicals(request, pk):
 
 
 def download_list_presence_chemicals(request):
-    chemicals = (
-        ExtractedListPresence.objects.all()
-        .annotate(tag_names=GroupConcat("tags__name", separator="; ", distinct=True))
-        .values(
-            "extracted_text__data_document__data_group__data_source__title",
-            "extracted_text__data_document__title",
-            "extracted_text__data_document__subtitle",
-            "extracted_text__doc_date",
-            "extracted_text__data_document__organization",
-            "raw_chem_name",
-            "raw_cas",
-            "dsstox__sid",
-            "dsstox__true_chemname",
-            "dsstox__true_cas",
-            "provisional",
-            "functional_uses__report_funcuse",
-            "functional_uses__category__title",
-            "tag_names",
-        )
-        .order_by("raw_chem_name")
-    )
-    filename = "list_presence_chemicals.csv"
-    return render_to_csv_response(
-        chemicals,
-        filename=filename,
-        append_datestamp=True,
-        field_header_map={
-            "extracted_text__data_document__data_group__data_source__title": "Data Source",
-            "extracted_text__data_document__title": "Data Document Title",
-            "extracted_text__data_document__subtitle": "Data Document Subtitle",
-            "extracted_text__doc_date": "Document Date",
-            "extracted_text__data_document__organization": "Organization",
-            "raw_chem_name": "Raw Chemical Name",
-            "raw_cas": "Raw CAS",
-            "dsstox__sid": "DTXSID",
-            "dsstox__true_chemname": "True Chemical Name",
-            "dsstox__true_cas": "True CAS",
-            "provisional": "Provisional",
-            "functional_uses__report_funcuse": "Reported Functional Use",
-            "functional_uses__category__title": "Harmonized Functional Use",
-            "tag_names": "Tags",
-        },
-        field_serializer_map={"provisional": (lambda f: ("Yes" if f == "1" else "No"))},
+    # stream the download live until the bulk download task has run
+    return bulk_export_response("list_presence") or live_export_response(
+        "list_presence"
     )
 
 
 def download_composition_chemicals(request):
-    filename = "composition_chemicals.zip"
-    filepath = os.path.join(DOWNLOADS_ROOT, filename)
-    if os.path.exists(filepath):
-        return FileResponse(open(filepath, "rb"), filename=filename, as_attachment=True)
+    response = bulk_export_response("composition")
+    if response is not None:
+        return response
     return HttpResponse(
         "Composition Data not available yet, please try again later.", status=404
     )
@@ -833,6 +793,8 @@ class DocumentAuditLog(BaseDatatableView):
         return super().get(request, *args, **kwargs)
 
     def get_initial_queryset(self):
+        # the periodic task may not have moved the latest changes yet
+        AuditLogDiff.objects.expand(extracted_text_id=self.pk, skip_locked=True)
         qs = (
             self.model.objects.filter(extracted_text_id=self.pk)
             .order_by("-date_created")
@@ -148,6 +148,7 @@ def data_group_detail(request, pk, template_name="data_group/datagroup_detail.ht
         if "extfile-submit" in request.POST:
             formset = ExtractFileFormSet(request.POST, request.FILES, dgpk=dg.pk)
             async_result = formset.enqueue(f"extfile_formset.{dg.pk}")
+            formset.close()
             return HttpResponseRedirect(
                 reverse("data_group_detail", args=[dg.pk])
                 + f"?task_id={async_result.id}"
@@ -206,6 +207,7 @@ def data_group_detail(request, pk, template_name="data_group/datagroup_detail.ht
                 errors = gather_errors(product_formset)
                 for e in errors:
                     messages.error(request, e)
+            product_formset.close()
             return redirect("data_group_detail", dg.pk)
         context["product_formset"] = ProductBulkCSVFormSet()
 
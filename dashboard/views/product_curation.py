@@ -41,7 +41,7 @@ from dashboard.forms import (
 )
 from django.core.paginator import Paginator
 from django.urls import reverse, reverse_lazy
-from dashboard.utils import gather_errors
+from dashboard.utils import gather_errors, populate_user_fields
 
 
 @login_required()
@@ -131,6 +131,12 @@ def detach_puc_from_product(request, pk):
     return redirect("product_detail", pk=p.pk)
 
 
+def get_product_ids(id_pks):
+    """The ids of the existing products in a comma separated list of ids."""
+    ids = {int(pk) for pk in id_pks.split(",") if pk.strip().isdigit()}
+    return list(Product.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+
 @login_required()
 def bulk_assign_tag_to_products(request):
     template_name = "product_curation/bulk_product_tag.html"
@@ -161,14 +167,17 @@ def bulk_assign_tag_to_products(request):
         if form.is_valid():
             assign_tag = PUCTag.objects.filter(id=form["tag"].value())
             tags = assumed_tags | assign_tag
-            product_ids = form["id_pks"].value().split(",")
-            for id in product_ids:
-                product = Product.objects.get(id=id)
-                # add the assumed tags to the update
-                for tag in tags:
-                    ProductToTag.objects.update_or_create(
-                        tag=tag, content_object=product
-                    )
+            product_ids = get_product_ids(form["id_pks"].value())
+            # add the assumed tags to the update, skipping existing ones
+            product_to_tags = [
+                ProductToTag(tag=tag, content_object_id=product_id)
+                for tag in tags
+                for product_id in product_ids
+            ]
+            populate_user_fields(product_to_tags, created=True)
+            ProductToTag.objects.bulk_create(
+                product_to_tags, batch_size=1000, ignore_conflicts=True
+            )
             puc_form = BulkPUCForm()
             form = BulkProductTagForm()
             tag = assign_tag[0]
@@ -243,15 +252,12 @@ def bulk_assign_puc_to_product(
     form = BulkProductPUCForm(request.POST or None)
     if form.is_valid():
         puc = PUC.objects.get(id=form["puc"].value())
-        product_ids = form["id_pks"].value().split(",")
-        for id in product_ids:
-            product = Product.objects.get(id=id)
-            ProductToPUC.objects.update_or_create(
-                puc=puc,
-                product=product,
-                classification_method_id="MB",
-                puc_assigned_usr=request.user,
-            )
+        product_ids = ProductToPUC.objects.assign(
+            get_product_ids(form["id_pks"].value()),
+            puc,
+            classification_method_id="MB",
+            puc_assigned_usr=request.user,
+        )
         messages.success(request, f"{len(product_ids)} products added to PUC - {puc}")
         queryparams = f"?q={q}" if q else f"?dg={datagroup_pk}&rc={rawcategory}"
         return HttpResponseRedirect(reverse("bulk_product_puc") + queryparams)
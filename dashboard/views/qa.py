@@ -7,7 +7,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Count, Q, Max, OuterRef, Exists
+from django.db.models import Count, Q, Max, OuterRef, Exists, Subquery, Sum
 from django.db.models.functions import Greatest, Coalesce
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render, redirect, get_object_or_404
@@ -33,24 +33,24 @@ from dashboard.models import (
     RawChem,
     AuditLog,
     GroupType,
+    QAProgress,
     weight_fraction_type,
 )
 
 
 @login_required()
 def qa_extractionscript_index(request, template_name="qa/extraction_script_index.html"):
-    extractedtext_count = Count("extractedtext__extraction_script")
-    qa_group_count = Count("extractedtext__qa_group")
-    qa_complete_count = Count("extractedtext", filter=Q(extractedtext__qa_checked=True))
+    QAProgress.objects.ensure_built()
+    extractedtext_count = Sum("qa_progress__extractedtext_count")
+    qa_group_count = Sum("qa_progress__qa_group_count")
+    qa_complete_count = Sum("qa_progress__qa_checked_count")
     percent_complete = (qa_complete_count / qa_group_count) * 100
     # defaults to composition type
     group_type_code = request.GET.get("group_type", "CO")
     group_type = GroupType.objects.filter(code=group_type_code).first()
     extraction_scripts = (
         Script.objects.filter(script_type="EX")
-        .filter(
-            extractedtext__data_document__data_group__group_type__code=group_type_code
-        )
+        .filter(qa_progress__data_group__group_type__code=group_type_code)
         .exclude(title="Manual (dummy)")
         .annotate(extractedtext_count=extractedtext_count)
         .annotate(percent_complete=percent_complete)
@@ -66,16 +66,19 @@ def qa_extractionscript_index(request, template_name="qa/extraction_script_index
 
 @login_required()
 def qa_chemicalpresence_index(request, template_name="qa/chemical_presence_index.html"):
+    QAProgress.objects.ensure_built()
+    datadocument_count = (
+        DataDocument.objects.filter(data_group=OuterRef("pk"))
+        .order_by()
+        .values("data_group")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
     datagroups = (
         DataGroup.objects.filter(group_type__code="CP")
-        .annotate(datadocument_count=Count("datadocument"))
-        .annotate(
-            approved_count=Count(
-                "datadocument__extractedtext",
-                filter=Q(datadocument__extractedtext__qa_checked=True),
-            )
-        )
-        .annotate(extracted_count=Count("datadocument__extractedtext"))
+        .annotate(datadocument_count=Subquery(datadocument_count))
+        .annotate(approved_count=Sum("qa_progress__qa_checked_count"))
+        .annotate(extracted_count=Sum("qa_progress__extractedtext_count"))
         .filter(extracted_count__gt=0)
     )
 
@@ -90,22 +93,14 @@ def qa_manual_composition_index(
         Script.objects.filter(title="Manual (dummy)", script_type="EX").first().id
     )
 
+    QAProgress.objects.ensure_built()
     datagroups = (
-        DataGroup.objects.filter(group_type__code="CO")
+        DataGroup.objects.filter(
+            group_type__code="CO", qa_progress__extraction_script_id=MANUAL_SCRIPT_ID
+        )
         .annotate(
-            datadocument_count=Count(
-                "datadocument__extractedtext",
-                filter=Q(
-                    datadocument__extractedtext__extraction_script__id=MANUAL_SCRIPT_ID
-                ),
-            ),
-            approved_count=Count(
-                "datadocument__extractedtext",
-                filter=Q(
-                    datadocument__extractedtext__extraction_script__id=MANUAL_SCRIPT_ID,
-                    datadocument__extractedtext__qa_checked=True,
-                ),
-            ),
+            datadocument_count=Sum("qa_progress__extractedtext_count"),
+            approved_count=Sum("qa_progress__qa_checked_count"),
         )
         .filter(datadocument_count__gt=0)
     )
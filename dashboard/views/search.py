@@ -5,8 +5,9 @@ from django.shortcuts import render
 from django.contrib import messages
 from django.http import HttpResponseRedirect
 
-from elastic.search import run_query, get_unique_count, FACETS, VALID_MODELS
+from elastic.search import run_batched_query, FACETS, VALID_MODELS
 from elastic.models import QueryLog
+from elastic.querylog import log_query
 
 
 def search_model(request, model, template_name="search/base.html"):
@@ -46,19 +47,23 @@ def search_model(request, model, template_name="search/base.html"):
     # Log the initial query
     # The default model is "product", the default page is 1, and the default has no facets.
     # Only this initial query will be logged.
-    if page == 1 and model == "product" and not facets:
+    fresh_search = page == 1 and model == "product" and not facets
+    if fresh_search:
         user_id = request.user.pk if request.user else None
-        QueryLog.objects.create(
-            query=decoded_q, application=QueryLog.FACTOTUM, user_id=user_id
-        )
-        # Get model counts for fresh search
-        get_model_counts(request, escaped_q)
+        log_query(decoded_q, user_id=user_id)
 
-    # In case counts are missing from session data, catch up
-    if not request.session.has_key("unique_counts"):
-        get_model_counts(request, escaped_q)
+    # Get model counts for fresh search, or in case counts are missing from
+    # session data, in the same request as the search itself
+    if fresh_search or not request.session.has_key("unique_counts"):
+        count_models = VALID_MODELS
+    else:
+        count_models = ()
 
-    result = run_query(escaped_q, model, size=40, facets=facets, page=page)
+    result = run_batched_query(
+        escaped_q, model, size=40, facets=facets, page=page, count_models=count_models
+    )
+    if count_models:
+        request.session["unique_counts"] = result["unique_counts"]
     context = {
         "encoded_q": encoded_q,
         "decoded_q": decoded_q,
@@ -69,17 +74,3 @@ def search_model(request, model, template_name="search/base.html"):
         "unique_counts": request.session["unique_counts"],
     }
     return render(request, template_name, context)
-
-
-def get_model_counts(request, decoded_q):
-    """
-    Get the unique count for each model and store results in session.
-    :param request: the request
-    :param decoded_q: the query string
-    :return: the unique counts
-    """
-    unique_counts = {}
-    for model in VALID_MODELS:
-        unique_counts[model] = get_unique_count(decoded_q, model)
-    request.session["unique_counts"] = unique_counts
-    return unique_counts
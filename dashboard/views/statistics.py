@@ -1,9 +1,8 @@
-from django.db.models import Count, Q
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.views import View
 
-from dashboard.models import GroupType
+from dashboard.stats import get_site_stats
 from dashboard.views.dashboard import get_stats
 
 
@@ -24,39 +23,27 @@ def grouptype_stats(request):
     Returns:
     json: { "data" : [[ title, documentcount (%), rawchemcount (%), curatedchemcount (%) ], [...], ], }
     """
-    grouptype_rows = GroupType.objects.annotate(
-        documentcount=Count("datagroup__datadocument", distinct=True),
-        rawchemcount=Count(
-            "datagroup__datadocument__extractedtext__rawchem", distinct=True
-        ),
-        curatedchemcount=Count(
-            "datagroup__datadocument__extractedtext__rawchem",
-            distinct=True,
-            filter=Q(
-                datagroup__datadocument__extractedtext__rawchem__dsstox_id__isnull=False
-            ),
-        ),
-    ).order_by("-documentcount")
+    grouptype_rows = get_site_stats()["grouptypes"]
 
     datadocument_total = rawchem_total = curatedchem_total = 0
-    for row in grouptype_rows:
-        datadocument_total += row.documentcount
-        rawchem_total += row.rawchemcount
-        curatedchem_total += row.curatedchemcount
+    for _, documentcount, rawchemcount, curatedchemcount in grouptype_rows:
+        datadocument_total += documentcount
+        rawchem_total += rawchemcount
+        curatedchem_total += curatedchemcount
 
     return JsonResponse(
         {
             "data": [
                 [
-                    row.title,
+                    title,
                     # Document count by grouptype with % total
-                    f"{row.documentcount} ({(row.documentcount / (datadocument_total or 1))*100:.2f}%)",
+                    f"{documentcount} ({(documentcount / (datadocument_total or 1))*100:.2f}%)",
                     # Raw chemical counts by grouptype with % total
-                    f"{row.rawchemcount} ({(row.rawchemcount / (rawchem_total or 1))*100:.2f}%)",
+                    f"{rawchemcount} ({(rawchemcount / (rawchem_total or 1))*100:.2f}%)",
                     # Curated chemical counts by grouptypes with % total
-                    f"{row.curatedchemcount} ({(row.curatedchemcount / (curatedchem_total or 1))*100:.2f}%)",
+                    f"{curatedchemcount} ({(curatedchemcount / (curatedchem_total or 1))*100:.2f}%)",
                 ]
-                for row in grouptype_rows
+                for title, documentcount, rawchemcount, curatedchemcount in grouptype_rows
             ]
         }
     )
@@ -0,0 +1,121 @@
+import hashlib
+import json
+
+from elasticsearch_dsl import MultiSearch
+from elasticsearch_dsl.connections import get_connection
+
+from django.conf import settings
+from django.core.cache import cache
+
+SEARCH_CACHE_PREFIX = "elastic:search"
+
+
+def get_index_generation(index, connection="default"):
+    """Get a token that changes whenever the documents in an index change.
+
+    The token is derived from the index uuid, document count and indexing
+    counters, so a logstash re-sync or a rebuilt index yields a new token and
+    orphans every cached response of the previous generation. The token itself
+    is cached for ``SEARCH_CACHE_GENERATION_TIMEOUT`` seconds.
+
+    Arguments:
+        index (str): a comma separated list of index names
+        connection (optional str): which Elasticsearch instance to use [default="default"]
+
+    Returns:
+        the generation token (str)
+    """
+    key = "%s:generation:%s:%s" % (SEARCH_CACHE_PREFIX, connection, index)
+    generation = cache.get(key)
+    if generation is None:
+        stats = get_connection(connection).indices.stats(
+            index=index, metric="docs,indexing"
+        )
+        parts = []
+        for name, data in sorted(stats["indices"].items()):
+            primaries = data["primaries"]
+            parts.append(
+                "%s:%s:%d:%d:%d"
+                % (
+                    name,
+                    data.get("uuid", ""),
+                    primaries["docs"]["count"],
+                    primaries["indexing"]["index_total"],
+                    primaries["indexing"]["delete_total"],
+                )
+            )
+        generation = hashlib.sha1(",".join(parts).encode()).hexdigest()[:12]
+        cache.set(key, generation, settings.SEARCH_CACHE_GENERATION_TIMEOUT)
+    return generation
+
+
+def get_cache_key(search, connection="default", generations=None):
+    """Build the cache key for a Search.
+
+    The key covers the index generation, the target indices and the full
+    request body, which in turn encodes the query, model, facets, fuzziness
+    and page of the search.
+
+    Arguments:
+        search (Search): the search to key
+        connection (optional str): which Elasticsearch instance to use [default="default"]
+        generations (optional dict): generation tokens already looked up, by index
+
+    Returns:
+        the cache key (str)
+    """
+    index = ",".join(search._index or ["_all"])
+    if generations is None:
+        generations = {}
+    if index not in generations:
+        generations[index] = get_index_generation(index, connection)
+    body = json.dumps(search.to_dict(), sort_keys=True, default=str)
+    digest = hashlib.sha1((index + body).encode()).hexdigest()
+    return "%s:%s:%s" % (SEARCH_CACHE_PREFIX, generations[index], digest)
+
+
+def execute_searches(searches, connection="default"):
+    """Execute several searches, serving what is possible from the cache.
+
+    Searches that are not cached are sent together in a single ``_msearch``
+    and their responses are cached for ``SEARCH_CACHE_TIMEOUT`` seconds.
+
+    Arguments:
+        searches (list): the Search objects to execute
+        connection (optional str): which Elasticsearch instance to use [default="default"]
+
+    Returns:
+        a list of raw response dictionaries in the order of ``searches``
+    """
+    generations = {}
+    keys = [get_cache_key(s, connection, generations) for s in searches]
+    responses = cache.get_many(keys)
+    missing = [(k, s) for k, s in zip(keys, searches) if k not in responses]
+    if len(missing) == 1:
+        key, search = missing[0]
+        fetched = {key: search.execute().to_dict()}
+    elif missing:
+        ms = MultiSearch(using=connection)
+        for _, search in missing:
+            ms = ms.add(search)
+        fetched = {k: r.to_dict() for (k, _), r in zip(missing, ms.execute())}
+    else:
+        fetched = {}
+    if fetched:
+        cache.set_many(fetched, settings.SEARCH_CACHE_TIMEOUT)
+        responses.update(fetched)
+    return [responses[k] for k in keys]
+
+
+def execute_search(search, connection="default"):
+    """Execute a single search, serving it from the cache when possible."""
+    return execute_searches([search], connection)[0]
+
+
+def clear_search_cache():
+    """Forget the cached index generations.
+
+    The next search looks the generations up again, so responses cached
+    before an index was modified are no longer served.
+    """
+    cache.delete_pattern("%s:generation:*" % SEARCH_CACHE_PREFIX)
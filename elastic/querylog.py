@@ -0,0 +1,105 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from elastic.models import QueryLog
+
+logger = logging.getLogger("django")
+
+
+class QueryLogWriter:
+    """Buffers QueryLog rows in memory and saves them from a background thread.
+
+    Rows are saved with ``bulk_create`` once ``batch_size`` rows are waiting or
+    ``flush_interval`` seconds after the first row of a batch arrived. Errors
+    while saving are logged and the batch is dropped, so an unavailable
+    query log database never reaches the request that logged the query.
+
+    Arguments:
+        batch_size (optional int): the maximum rows per INSERT [default=100]
+        flush_interval (optional float): the seconds to wait for a full batch [default=5]
+        max_size (optional int): the rows kept in memory before new ones are dropped [default=10000]
+    """
+
+    def __init__(self, batch_size=100, flush_interval=5, max_size=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def log(self, query, application=QueryLog.FACTOTUM, user_id=None):
+        """Record a query, in the background when QUERY_LOG_ASYNC is set."""
+        entry = QueryLog(query=query, application=application, user_id=user_id)
+        if not settings.QUERY_LOG_ASYNC:
+            self.write([entry])
+            return
+        self.start()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            logger.warning("Query log buffer is full, dropping query.")
+
+    def start(self):
+        """Start the writer thread, again in a forked worker process."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="querylog-writer", daemon=True
+                )
+                self._thread.start()
+
+    def flush(self, timeout=None):
+        """Wait until every buffered row has been written.
+
+        Returns:
+            True if the buffer was emptied before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def write(self, entries):
+        try:
+            QueryLog.objects.bulk_create(entries)
+        except Exception:
+            logger.error(
+                f"Could not save {len(entries)} query log entries.", exc_info=True
+            )
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.write(batch)
+            # don't hold a connection open while idle
+            connections.close_all()
+            for _ in batch:
+                self.queue.task_done()
+
+
+query_log_writer = QueryLogWriter()
+atexit.register(query_log_writer.flush, timeout=10)
+
+
+def log_query(query, user_id=None, application=QueryLog.FACTOTUM):
+    """Record a search query without waiting on the query log database."""
+    query_log_writer.log(query, application=application, user_id=user_id)
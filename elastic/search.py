@@ -1,11 +1,11 @@
 from elasticsearch_dsl import A, Search
 from elasticsearch_dsl.query import MultiMatch
-import re
 
 from django.conf import settings
 from django.core.paginator import Paginator
 from django.utils import html
 
+from elastic.cache import execute_search, execute_searches
 from elastic.search_documents import SearchDocuments
 
 FIELD_DICT = {
@@ -89,21 +89,69 @@ FRIENDLY_FIELDS = {
     "puc_description": "Description",
 }
 
+# Fields highlighted as a whole, so the highlight can stand in for the source value
+WHOLE_FIELD_HIGHLIGHTS = (
+    "rawchem_cas",
+    "rawchem_name",
+    "truechem_dtxsid",
+    "truechem_cas",
+    "truechem_name",
+    "datadocument_grouptype",
+    "datadocument_title",
+    "datadocument_subtitle",
+    "product_upc",
+    "product_manufacturer",
+    "product_brandname",
+    "product_title",
+    "puc_kind",
+    "puc_gencat",
+    "puc_gencatfacet",
+    "puc_prodfam",
+    "puc_prodtype",
+)
+
+# Long fields that are only shown as highlighted fragments
+FRAGMENT_HIGHLIGHTS = (
+    "product_shortdescription",
+    "product_longdescription",
+    "puc_description",
+)
+
 VALID_MODELS = {"product", "datadocument", "puc", "chemical", "tag"}
 
 TOTAL_COUNT_AGG = "unique_total_count"
 
 PHRASE_SLOP = 1
 
+# Elasticsearch's default index.max_result_window
+MAX_RESULT_WINDOW = 10000
+
 
 class ElasticPaginator:
-    """To be used with Django's paginator"""
+    """To be used with Django's paginator
+
+    Slices only run the hits query; the facets and the unique total are
+    known from the aggregations query that produced ``length``.
+    ``prefetched`` maps an offset to a list of hits already fetched from that
+    offset, so the page returned alongside a batched query is not re-queried.
+    """
 
-    def __init__(self, length, q, model, facets={}, fuzzy=False, connection="default"):
-        self.run_query = lambda size, offset: run_query(
+    def __init__(
+        self,
+        length,
+        q,
+        model,
+        facets={},
+        fuzzy=False,
+        connection="default",
+        prefetched={},
+    ):
+        self.run_query = lambda size, offset: run_hits_query(
             q, model, size, offset, facets, fuzzy, connection
         )
-        self.length = length
+        # from/size cannot page past the index's result window
+        self.length = min(length, MAX_RESULT_WINDOW)
+        self.prefetched = prefetched
 
     def __len__(self):
         return self.length
@@ -113,42 +161,39 @@ class ElasticPaginator:
             offset = s.start if s.start is not None else 0
             end = s.stop if s.stop is not None else self.length + 1
             size = end - offset
-            result = self.run_query(size, offset)["hits"]
+            result = self.get_hits(size, offset)
             self.patch(result)
             return result
 
         else:
             offset = s
             size = 1
-            result = self.run_query(size, offset)["hits"]
+            result = self.get_hits(size, offset)
             self.patch(result)
             return result[0]
 
+    def get_hits(self, size, offset):
+        prefetched = self.prefetched.get(offset)
+        if prefetched is not None and (
+            len(prefetched) >= size or offset + len(prefetched) >= self.length
+        ):
+            return prefetched[:size]
+        return self.run_query(size, offset)["hits"]
+
     def patch(self, result):
-        # see if chemical matched
         chemfields = set(FIELD_DICT["truechem_dtxsid"])
         for hit in result:
-            if chemfields & hit["highlights"].keys():
-                hit["chemsearch"] = True
-            else:
-                hit["chemsearch"] = False
-        # patch html
-        for hit in result:
+            # see if chemical matched
+            hit["chemsearch"] = bool(chemfields & hit["highlights"].keys())
+            friendly_highlights = {}
             for source_field, highlights in hit["highlights"].items():
-                for hightlight in highlights:
-                    stripped_highlight = re.escape(
-                        re.sub(r"(<em>)|(</em>)", "", hightlight)
-                    )
-                    original_field = hit["source"][source_field]
-                    hit["source"][source_field] = html.mark_safe(
-                        re.sub(stripped_highlight, hightlight, original_field)
-                    )
-        # patch friendly name
-        for hit in result:
-            for source_field in hit["highlights"].copy():
-                if source_field in FRIENDLY_FIELDS:
-                    friendly = FRIENDLY_FIELDS[source_field]
-                    hit["highlights"][friendly] = hit["highlights"].pop(source_field)
+                # patch html, whole-field highlights are the full source value
+                if source_field in WHOLE_FIELD_HIGHLIGHTS:
+                    hit["source"][source_field] = html.mark_safe(highlights[0])
+                # patch friendly name
+                friendly = FRIENDLY_FIELDS.get(source_field, source_field)
+                friendly_highlights[friendly] = highlights
+            hit["highlights"] = friendly_highlights
         return result
 
 
@@ -185,21 +230,154 @@ def run_query(
     if model == "tag":
         return SearchDocuments().searchTag(q, size, offset, page)
 
+    searches = [build_aggregations_query(q, model, facets, fuzzy, connection)]
+    # with a page the hits are fetched lazily by the paginator
+    if page is None:
+        searches.append(
+            build_hits_query(q, model, size, offset, facets, fuzzy, connection)
+        )
+    # execute the searches
+    responses = execute_searches(searches, connection)
+    result = parse_aggregations_response(responses[0])
+    if page is None:
+        result.update(parse_hits_response(responses[1], model))
+        result["took"] += responses[0]["took"]
+        # Request counts on associated buckets for this model id
+        attach_counts(result, get_id_field(model), connection)
+    else:
+        result["took"] /= 1000
+        # replace hits with paginator
+        espaginator = ElasticPaginator(
+            result["total"], q, model, facets, fuzzy, connection="default"
+        )
+        result["hits"] = Paginator(espaginator, size).get_page(page)
+    return result
+
+
+def run_hits_query(
+    q, model, size, offset=0, facets={}, fuzzy=False, connection="default"
+):
+    """Fetch one slice of hits without any aggregations.
+
+    Arguments are the same as ``run_query``.
+
+    Returns:
+        {
+        'hits': a list of results,
+        'took': time in seconds of search
+        }
+    """
+    s = build_hits_query(q, model, size, offset, facets, fuzzy, connection)
+    result = parse_hits_response(execute_search(s, connection), model)
+    return attach_counts(result, get_id_field(model), connection)
+
+
+def run_batched_query(
+    q,
+    model,
+    size,
+    page=1,
+    facets={},
+    fuzzy=False,
+    count_models=(),
+    connection="default",
+):
+    """Run a paginated Elasticsearch query and optional model counts in one request.
+
+    The page of hits, the facet aggregations, the unique total and the unique
+    count for each of ``count_models`` are sent together as a single
+    ``_msearch``, leaving out any response already in the search cache. The
+    aggregations do not depend on the page, so after the first page only the
+    hits are searched. The per-hit related-object counts depend on the ids
+    returned by that request, so they follow in one further ``search_counts``
+    request.
+
+    Arguments:
+        q (str): the string to search
+        model (str): one of VALID_MODELS
+        size (int): the number of objects per page
+        page (optional int): the Django paginator page to return [default=1]
+        facets (optional dict): a key, value pair to filter on [default={}]
+        fuzzy (optional bool): enable fuzzy search [default=False]
+        count_models (optional iterable): models to get unique counts for [default=()]
+        connection (optional str): which Elasticsearch instance to use [default="default"]
+
+    Returns:
+        {
+        'hits': a Django paginator page of results,
+        'facets': a dictionary of facets,
+        'took': time in seconds of search,
+        'total': total results found,
+        'unique_counts': a dictionary of unique counts keyed on count_models
+        }
+
+    """
+    validate_model(model)
+    for count_model in count_models:
+        validate_model(count_model)
+
+    offset = min((get_page_number(page) - 1) * size, MAX_RESULT_WINDOW - size)
+    if model == "tag":
+        searches = [SearchDocuments().build_search(q, size, page=page)]
+    else:
+        searches = [
+            build_aggregations_query(q, model, facets, fuzzy, connection),
+            build_hits_query(q, model, size, offset, facets, fuzzy, connection),
+        ]
+    main_count = len(searches)
+    count_models = list(count_models)
+    for count_model in count_models:
+        searches.append(build_unique_count_query(q, count_model, fuzzy, connection))
+    responses = execute_searches(searches, connection)
+
+    main_responses = responses[:main_count]
+    if model == "tag":
+        result = SearchDocuments().parse_response(main_responses[0], size, page=page)
+    else:
+        result = parse_aggregations_response(main_responses[0])
+        result.update(parse_hits_response(main_responses[1], model))
+        result["took"] += main_responses[0]["took"]
+        attach_counts(result, get_id_field(model), connection)
+        espaginator = ElasticPaginator(
+            result["total"],
+            q,
+            model,
+            facets,
+            fuzzy,
+            connection=connection,
+            prefetched={offset: result["hits"]},
+        )
+        result["hits"] = Paginator(espaginator, size).get_page(page)
+    result["unique_counts"] = {
+        count_model: parse_unique_count_response(response, count_model)
+        for count_model, response in zip(count_models, responses[main_count:])
+    }
+    return result
+
+
+def build_base_query(q, model, facets={}, fuzzy=False, connection="default"):
+    """Build the filtered multi-match Search shared by the hits and aggregations.
+
+    Arguments are the same as ``run_query``. The ``tag`` model is not
+    stored in the ``dashboard`` index and is not supported here.
+
+    Returns:
+        an elasticsearch_dsl Search
+    """
     # get index to search on based on ELASTICSEARCH setting and con
     index = settings.ELASTICSEARCH.get(connection, {}).get("INDEX", "dashboard")
     # get the search object
     s = Search(using=connection, index=index)
     # filter on the facets
-    for term, filter_array in facets.items():
+    for term, filter_array in sorted(facets.items()):
+        if isinstance(filter_array, (list, tuple, set)):
+            filter_array = sorted(filter_array)
         s = s.filter("terms", **{term: filter_array})
     # pull relevant fields
     id_field = get_id_field(model)
     fields = FIELD_DICT[id_field]
     # filter null id
     s = s.filter("exists", field=id_field)
-    # Enable highlighting
-    s = s.highlight_options(order="score")
-    s = s.highlight("*")
     # Determine if the search term was a quoted phrase
     quoted = q != q.strip('"') or q != q.strip("'")
     # add the query with optional fuzziness
@@ -225,6 +403,19 @@ def run_query(
                     query=q, fields=fields, type="most_fields", tie_breaker="0.5"
                 )
             )
+    return s
+
+
+def build_hits_query(
+    q, model, size, offset=0, facets={}, fuzzy=False, connection="default"
+):
+    """Build the collapsed and highlighted Search for one slice of hits."""
+    s = build_base_query(q, model, facets, fuzzy, connection)
+    id_field = get_id_field(model)
+    # Enable highlighting
+    s = s.highlight_options(order="score")
+    s = s.highlight(*WHOLE_FIELD_HIGHLIGHTS, number_of_fragments=0)
+    s = s.highlight(*FRAGMENT_HIGHLIGHTS)
     # collapse on id_field
     dict_update = {}
     inner_hits = []
@@ -232,11 +423,18 @@ def run_query(
         inner_hits.append({"name": f, "collapse": {"field": f}, "size": 0})
     dict_update.update({"collapse": {"field": id_field, "inner_hits": inner_hits}})
     # set the size of the result
-    if page is not None:
-        dict_update.update({"size": 0, "from": 0})
-    else:
-        dict_update.update({"size": size, "from": offset})
+    dict_update.update({"size": size, "from": offset})
+    # the unique total comes from the aggregations query
+    dict_update.update({"track_total_hits": False})
     s.update_from_dict(dict_update)
+    return s
+
+
+def build_aggregations_query(q, model, facets={}, fuzzy=False, connection="default"):
+    """Build the Search for the facets and unique total, which returns no hits."""
+    s = build_base_query(q, model, facets, fuzzy, connection)
+    id_field = get_id_field(model)
+    s = s.extra(size=0)
     # aggregate facets
     for facet in FACETS:
         a = A("terms", field=facet)
@@ -244,21 +442,40 @@ def run_query(
         s.aggs.bucket(facet, a)
     # add cardinal aggregation on id_field to get unique total count
     s.aggs.bucket(TOTAL_COUNT_AGG, A("cardinality", field=id_field))
-    # execute the search
-    response = s.execute().to_dict()
-    # gather the results
-    # hits
+    return s
+
+
+def parse_hits_response(response, model):
+    """Gather the hits from a ``build_hits_query`` response.
+
+    Returns:
+        {
+        'hits': a list of results,
+        'took': time in milliseconds of search
+        }
+    """
+    id_field = get_id_field(model)
     results_hits = []
-    buckets = []
     for h in response["hits"]["hits"]:
-        buckets.append(h["_source"][id_field])
         results_hits_object = {
             "id": h["_source"][id_field],
             "highlights": h["highlight"],
             "source": h["_source"],
         }
         results_hits.append(results_hits_object)
-    # available facets
+    return {"hits": results_hits, "took": response["took"]}
+
+
+def parse_aggregations_response(response):
+    """Gather the facets and unique total from a ``build_aggregations_query`` response.
+
+    Returns:
+        {
+        'facets': a dictionary of facets,
+        'took': time in milliseconds of search,
+        'total': total results found
+        }
+    """
     results_facets = {}
     response_aggs = response["aggregations"]
     for facet in FACETS:
@@ -271,13 +488,23 @@ def run_query(
             }
             results_facets_list.append(results_facets_object)
         results_facets[facet] = results_facets_list
-    # get unique total count
-    length = response_aggs[TOTAL_COUNT_AGG]["value"]
-    # Request counts on associated buckets for this model id
+    return {
+        "facets": results_facets,
+        "took": response["took"],
+        "total": response_aggs[TOTAL_COUNT_AGG]["value"],
+    }
+
+
+def attach_counts(result, id_field, connection="default"):
+    """Attach the associated object counts to each hit of a parsed result.
+
+    Converts ``result["took"]`` from milliseconds to seconds, adding the time
+    taken by the counts request.
+    """
+    buckets = [h["id"] for h in result["hits"]]
     stat_counts = search_counts(buckets, id_field, connection)
-    response["took"] += stat_counts["took"]
     # Attach counts with their corresponding object
-    for object in results_hits:
+    for object in result["hits"]:
         object.update(
             {
                 "num_rawchem": stat_counts["rawchem_id"][object["id"]],
@@ -287,18 +514,8 @@ def run_query(
                 "num_puc": stat_counts["puc_id"][object["id"]],
             }
         )
-    # replace hits with paginator
-    if page is not None:
-        espaginator = ElasticPaginator(
-            length, q, model, facets, fuzzy, connection="default"
-        )
-        results_hits = Paginator(espaginator, size).get_page(page)
-    return {
-        "hits": results_hits,
-        "facets": results_facets,
-        "took": response["took"] / 1000,
-        "total": length,
-    }
+    result["took"] = (result["took"] + stat_counts["took"]) / 1000
+    return result
 
 
 def search_counts(buckets, id_field, connection="default"):
@@ -321,13 +538,19 @@ def search_counts(buckets, id_field, connection="default"):
             ...
         }
     """
+    # nothing to count, so skip the round trip
+    if not buckets:
+        return_dict = {"took": 0}
+        for f in list(FIELD_DICT.keys()) + ["rawchem_id"]:
+            return_dict.update({f: {}})
+        return return_dict
     index = settings.ELASTICSEARCH.get(connection, {}).get("INDEX", "_all")
     s = Search(using=connection, index=index, extra={"size": 0})
     for f in list(FIELD_DICT.keys()) + ["rawchem_id"]:
-        a = A("terms", field=id_field, include=buckets, size=len(buckets) or 10)
+        a = A("terms", field=id_field, include=buckets, size=len(buckets))
         a.metric("count", "cardinality", field=f)
         s.aggs.bucket(f, a)
-    response = s.execute().to_dict()
+    response = execute_search(s, connection)
     # Sort results into a dict for easier matching.
     return_dict = {"took": response["took"]}
     for stat_key, stat_value in response["aggregations"].items():
@@ -342,13 +565,38 @@ def get_unique_count(q, model, fuzzy=False, connection="default"):
     # make sure the model is valid
     validate_model(model)
 
+    s = build_unique_count_query(q, model, fuzzy, connection)
+    # execute the search
+    response = execute_search(s, connection)
+    return parse_unique_count_response(response, model)
+
+
+def get_unique_counts(q, models=VALID_MODELS, fuzzy=False, connection="default"):
+    """Get the unique count for several models in a single ``_msearch``.
+
+    Returns:
+        a dictionary of unique counts keyed on model
+    """
+    models = list(models)
+    searches = []
+    for model in models:
+        validate_model(model)
+        searches.append(build_unique_count_query(q, model, fuzzy, connection))
+    return {
+        model: parse_unique_count_response(response, model)
+        for model, response in zip(models, execute_searches(searches, connection))
+    }
+
+
+def build_unique_count_query(q, model, fuzzy=False, connection="default"):
+    """Build the Search that counts the unique objects of a model matching q."""
+    if model == "tag":
+        return SearchDocuments().build_search(q, 0)
+
     # get index to search on based on ELASTICSEARCH setting and con
     index = settings.ELASTICSEARCH.get(connection, {}).get("INDEX", "dashboard")
     # get the search object
-    s = Search(using=connection, index=index)
-
-    if model == "tag":
-        return SearchDocuments().getTagCount(term=q)
+    s = Search(using=connection, index=index, extra={"size": 0})
 
     # pull relevant fields
     id_field = get_id_field(model)
@@ -381,13 +629,26 @@ def get_unique_count(q, model, fuzzy=False, connection="default"):
 
     # add cardinal aggregation on id_field to get unique total count
     s.aggs.bucket(TOTAL_COUNT_AGG, A("cardinality", field=id_field))
-    # execute the search
-    response = s.execute().to_dict()
+    return s
+
+
+def parse_unique_count_response(response, model):
+    """Read the unique count from a ``build_unique_count_query`` response."""
+    if model == "tag":
+        return response["hits"]["total"]["value"]
     # get unique total count
     response_aggs = response["aggregations"]
     return response_aggs[TOTAL_COUNT_AGG]["value"]
 
 
+def get_page_number(page):
+    """Coerce a Django paginator page argument to a positive int."""
+    try:
+        return max(int(page), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
 def validate_model(model):
     if model not in VALID_MODELS:
         raise ValueError("'model' must be one of " + str(VALID_MODELS))
@@ -1,19 +1,23 @@
 from django.core.paginator import Paginator
 
+from elastic.cache import execute_search
 from elastic.documents import ListPresenceTag
 
 
 class SearchDocuments:
-    def searchTag(self, term, size, offset=0, page=None):
-        search = (
+    def build_search(self, term, size, offset=0, page=None):
+        return (
             ListPresenceTag.search()
             .query("query_string", query=term, fields=["name", "definition"])
-            .extra(from_=0 if page else offset, size=1000 if page else size)
+            .extra(
+                from_=0 if page else offset,
+                size=1000 if page else size,
+                track_total_hits=True,
+            )
             .highlight("*")
         )
 
-        response = search.execute().to_dict()
-
+    def parse_response(self, response, size, page=None):
         # turn hits to result objects
         results_hits = []
         for h in response["hits"]["hits"]:
@@ -32,11 +36,16 @@ class SearchDocuments:
             "hits": results_hits,
             "facets": [],
             "took": response["took"] / 1000,
-            "total": search.count,
+            "total": response["hits"]["total"]["value"],
         }
 
+    def searchTag(self, term, size, offset=0, page=None):
+        search = self.build_search(term, size, offset, page)
+        response = execute_search(search)
+        return self.parse_response(response, size, page)
+
     def getTagCount(self, term):
         search = ListPresenceTag.search().query(
             "query_string", query=term, fields=["name", "definition"]
         )
-        return search.count
+        return search.count()
@@ -113,6 +113,11 @@ class MetaEnv(type):
         default = cls.SQL_DATABASE if cls.DEBUG else ""
         return cls._get("QUERY_LOG_DATABASE", default)
 
+    @property
+    def QUERY_LOG_ASYNC(cls):
+        default = True
+        return cls._get("QUERY_LOG_ASYNC", default) in cls.truevals
+
     @property
     def ELASTICSEARCH_HOST(cls):
         default = "localhost"
@@ -168,6 +173,40 @@ class MetaEnv(type):
         default = 60 * 60  # default to one hour
         return int(cls._get("CACHEOPS_DEFAULT_TIMEOUT", default))
 
+    @property
+    def SEARCH_CACHE_TIMEOUT(cls):
+        default = 60 * 60 * 24  # default to one day
+        return int(cls._get("SEARCH_CACHE_TIMEOUT", default))
+
+    @property
+    def SEARCH_CACHE_GENERATION_TIMEOUT(cls):
+        default = 30
+        return int(cls._get("SEARCH_CACHE_GENERATION_TIMEOUT", default))
+
+    @property
+    def PUC_ROLLUP_CACHE_TIMEOUT(cls):
+        default = 60 * 60 * 24  # default to one day
+        return int(cls._get("PUC_ROLLUP_CACHE_TIMEOUT", default))
+
+    @property
+    def SITE_STATS_CACHE_TIMEOUT(cls):
+        default = 60 * 60 * 24  # default to one day
+        return int(cls._get("SITE_STATS_CACHE_TIMEOUT", default))
+
+    @property
+    def SITE_STATS_INVALIDATE_ON_SAVE(cls):
+        default = False
+        return cls._get("SITE_STATS_INVALIDATE_ON_SAVE", default) in cls.truevals
+
+    @property
+    def AUDITLOG_DIFF_MODELS(cls):
+        default = ""
+        return [
+            model.strip().lower()
+            for model in cls._get("AUDITLOG_DIFF_MODELS", default).split(",")
+            if model.strip()
+        ]
+
     @property
     def CHROMEDRIVER_PATH(cls):
         chromedriver_in_path = shutil.which("chromedriver")
@@ -223,6 +262,16 @@ class MetaEnv(type):
         default = "0 4 * * *"
         return cls._get("GENERATE_BULK_DOWNLOAD_SCHEDULE", default, prefix=False)
 
+    @property
+    def SITE_STATS_SCHEDULE(cls):
+        default = "*/15 * * * *"
+        return cls._get("SITE_STATS_SCHEDULE", default, prefix=False)
+
+    @property
+    def AUDITLOG_DIFF_SCHEDULE(cls):
+        default = "* * * * *"
+        return cls._get("AUDITLOG_DIFF_SCHEDULE", default, prefix=False)
+
     @property
     def LOGSTASH_HOST(cls):
         default = "localhost"
@@ -0,0 +1,58 @@
+import gzip
+import os
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = """Exports the audit log entries older than a number of months to a
+            gzipped CSV file, then deletes all but the latest archived entry of
+            each object, field and action"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=12,
+            help="Archive the entries older than this many months (default 12)",
+        )
+        parser.add_argument(
+            "--before",
+            help="Archive the entries created before this date (YYYY-MM-DD), "
+            "instead of --months",
+        )
+        parser.add_argument(
+            "--output-dir",
+            default=os.path.join(settings.DOWNLOADS_ROOT, "auditlog"),
+            help="The directory to write the archive to",
+        )
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            try:
+                before = datetime.strptime(options["before"], "%Y-%m-%d")
+            except ValueError:
+                raise CommandError("--before must be a date formatted as YYYY-MM-DD")
+        else:
+            today = datetime.combine(datetime.today(), datetime.min.time())
+            before = today - relativedelta(months=options["months"])
+        os.makedirs(options["output_dir"], exist_ok=True)
+        path = os.path.join(
+            options["output_dir"],
+            f"auditlog_before_{before:%Y%m%d}_{datetime.now():%Y%m%d%H%M%S}.csv.gz",
+        )
+        with gzip.open(path, "wt", newline="") as f:
+            exported, deleted = AuditLog.objects.archive(before, f)
+        if not exported:
+            os.remove(path)
+            self.stdout.write(f"No audit log entries before {before:%Y-%m-%d}")
+            return
+        self.stdout.write(
+            f"Exported {exported} audit log entries to {path} "
+            f"and deleted {deleted} of them"
+        )
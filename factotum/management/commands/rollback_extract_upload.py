@@ -0,0 +1,25 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.forms.data_group import EXTRACT_UPLOAD_JOURNAL_KEY, ExtractFileFormSet
+
+
+class Command(BaseCommand):
+    help = """Rolls back the rows saved by an extract upload task that did not
+            finish, e.g. because its worker was lost, from the journal the task
+            kept in the cache"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("task_id", help="The id of the upload task")
+
+    def handle(self, *args, **options):
+        key = EXTRACT_UPLOAD_JOURNAL_KEY % options["task_id"]
+        journal = cache.get(key)
+        if journal is None:
+            raise CommandError(f"No upload journal found for {options['task_id']}")
+        ExtractFileFormSet.rollback_upload(journal)
+        cache.delete(key)
+        self.stdout.write(
+            f"Rolled back {len(journal['children'])} batches of rows and "
+            f"{len(journal['created_parents'])} extracted texts"
+        )
@@ -126,6 +126,8 @@ if env.QUERY_LOG_DATABASE != env.SQL_DATABASE:
         "PORT": env.SQL_PORT,
     }
 DATABASE_ROUTERS = ["factotum.routers.QueryLogRouter"]
+# Save search query logs from a background thread
+QUERY_LOG_ASYNC = env.QUERY_LOG_ASYNC
 
 ELASTICSEARCH = {
     "default": {
@@ -156,6 +158,18 @@ CACHEOPS = {
     # "dashboard.cumulativeproductsperpuc": {"ops": {"fetch", "get"}},
     # "dashboard.productsperpuc": {"ops": {"fetch", "get"}},
 }
+# Elasticsearch responses are cached until the index generation changes
+SEARCH_CACHE_TIMEOUT = env.SEARCH_CACHE_TIMEOUT
+SEARCH_CACHE_GENERATION_TIMEOUT = env.SEARCH_CACHE_GENERATION_TIMEOUT
+# Chemical PUC rollups are cached until a curation or PUC change drops them
+PUC_ROLLUP_CACHE_TIMEOUT = env.PUC_ROLLUP_CACHE_TIMEOUT
+# Site statistics are refreshed on SITE_STATS_SCHEDULE and, if enabled, also
+# dropped whenever a counted row is saved, so the next page view recounts them
+SITE_STATS_CACHE_TIMEOUT = env.SITE_STATS_CACHE_TIMEOUT
+SITE_STATS_INVALIDATE_ON_SAVE = env.SITE_STATS_INVALIDATE_ON_SAVE
+# The audit triggers of these models record a JSON diff per changed row, which
+# is moved into the audit log on AUDITLOG_DIFF_SCHEDULE (rerun migrate to apply)
+AUDITLOG_DIFF_MODELS = env.AUDITLOG_DIFF_MODELS
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 
@@ -201,6 +215,8 @@ CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_FILETASK_ROOT = os.path.join(BASE_DIR, "celeryfiles")
 PROVISIONAL_ASSIGNMENT_SCHEDULE = env.PROVISIONAL_ASSIGNMENT_SCHEDULE
 GENERATE_BULK_DOWNLOAD_SCHEDULE = env.GENERATE_BULK_DOWNLOAD_SCHEDULE
+SITE_STATS_SCHEDULE = env.SITE_STATS_SCHEDULE
+AUDITLOG_DIFF_SCHEDULE = env.AUDITLOG_DIFF_SCHEDULE
 
 PROMETHEUS_EXPORT_MIGRATIONS = False
 